@@ -1,29 +1,129 @@
 """Provides utility methods for invalidating various caches."""
 
+import threading
+import time
+
 from django.core.cache import cache
+from django.core.cache.backends.dummy import DummyCache
 from django.utils.hashcompat import md5_constructor
 from django.utils.http import urlquote
 
 
+NAMESPACE_GENERATION_TIMEOUT = 2592000
+"""The timeout of the generation of a namespace."""
+
+
+_deferred_invalidations = threading.local()
+"""private variable to store the namespaces to invalidate after the request is committed."""
+
+
 def info():
     """return the information about this cache."""
     return "%s" % type(cache)
 
 
-def delete(key, version=None):
+def delete(key, version=None, namespace=None):
     """proxy the call to django cache.delete."""
-    cache.delete(key, version)
+    cache.delete(_namespaced_key(key, namespace), version)
 
 
-def get_cache(key, default=None, version=None):
-    """proxy the call to django cache.get."""
-    value = cache.get(key, default, version)
+def delete_many(keys, version=None, namespace=None):
+    """proxy the call to django cache.delete_many."""
+    cache.delete_many([_namespaced_key(key, namespace) for key in keys], version)
+
+
+def get_cache(key, default=None, version=None, namespace=None):
+    """proxy the call to django cache.get. If a namespace is given, the key is only valid
+    for the current generation of the namespace."""
+    value = cache.get(_namespaced_key(key, namespace), default, version)
     return value
 
 
-def set_cache(key, value, timeout=None, version=None):
-    """proxy the call to django cache.set."""
-    cache.set(key, value, timeout, version)
+def set_cache(key, value, timeout=None, version=None, namespace=None):
+    """proxy the call to django cache.set. If a namespace is given, the key is only valid
+    for the current generation of the namespace."""
+    cache.set(_namespaced_key(key, namespace), value, timeout, version)
+
+
+def add_cache(key, value, timeout=None, version=None, namespace=None):
+    """proxy the call to django cache.add. Returns False if the key already exists."""
+    return cache.add(_namespaced_key(key, namespace), value, timeout, version)
+
+
+def incr(key, delta=1, version=None, namespace=None):
+    """proxy the call to django cache.incr. Raises ValueError if the key does not exist."""
+    return cache.incr(_namespaced_key(key, namespace), delta, version)
+
+
+def is_dummy():
+    """Returns True if the cache is the dummy cache, which caches nothing."""
+    return isinstance(cache, DummyCache)
+
+
+def namespace_generation(namespace):
+    """Returns the current generation of the namespace."""
+    key = _namespace_generation_key(namespace)
+    generation = cache.get(key)
+    if generation is None:
+        # start from the current time, so that a namespace whose generation was evicted
+        # never reuses an older generation.
+        cache.add(key, int(time.time() * 1000), NAMESPACE_GENERATION_TIMEOUT)
+        generation = cache.get(key)
+    return generation
+
+
+def invalidate_namespace(namespace):
+    """Makes all the keys of the namespace stale, by moving to a new generation of the
+    namespace. The stale keys are left to expire."""
+    key = _namespace_generation_key(namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), NAMESPACE_GENERATION_TIMEOUT)
+
+
+def invalidate_namespace_on_commit(namespace):
+    """Invalidates the namespace after the transaction of the current request is committed,
+    so that the keys of the namespace are not rebuilt from the uncommitted data by the other
+    requests. The namespace is invalidated right away outside a request."""
+    namespaces = getattr(_deferred_invalidations, "namespaces", None)
+    if namespaces is None:
+        invalidate_namespace(namespace)
+    else:
+        namespaces.add(namespace)
+
+
+def enable_deferred_invalidation():
+    """Starts deferring the namespace invalidations in the current thread, for the duration of
+    a request."""
+    _deferred_invalidations.namespaces = set()
+
+
+def flush_deferred_invalidation():
+    """Invalidates the deferred namespaces, once the transaction of the request is committed,
+    and stops deferring the namespace invalidations in the current thread."""
+    namespaces = getattr(_deferred_invalidations, "namespaces", None)
+    _deferred_invalidations.namespaces = None
+    for namespace in namespaces or ():
+        invalidate_namespace(namespace)
+
+
+def discard_deferred_invalidation():
+    """Discards the deferred namespaces, when the transaction of the request is rolled back,
+    and stops deferring the namespace invalidations in the current thread."""
+    _deferred_invalidations.namespaces = None
+
+
+def _namespaced_key(key, namespace):
+    """Returns the cache key of the key in the current generation of the namespace."""
+    if namespace is None:
+        return key
+    return "%s:%s:%s" % (namespace, namespace_generation(namespace), key)
+
+
+def _namespace_generation_key(namespace):
+    """Returns the cache key storing the generation of the namespace."""
+    return "namespace-generation:%s" % namespace
 
 
 def clear():
@@ -35,6 +135,16 @@ def invalidate_template_cache(fragment_name, *variables):
     """Invalidates the cache associated with a template.
     Credit: `djangosnippets.org/snippets/1593/ <http://djangosnippets.org/snippets/1593/>`_"""
 
+    delete(_template_cache_key(fragment_name, variables))
+
+
+def invalidate_template_caches(fragment_name, variables_list):
+    """Invalidates the caches associated with a template, one for each tuple of variables in
+    the variables_list, in a single cache call."""
+    delete_many([_template_cache_key(fragment_name, variables) for variables in variables_list])
+
+
+def _template_cache_key(fragment_name, variables):
+    """Returns the cache key of the template fragment for the tuple of variables."""
     args = md5_constructor(u':'.join([urlquote(var) for var in variables]))
-    cache_key = 'template.cache.%s.%s' % (fragment_name, args.hexdigest())
-    delete(cache_key)
+    return 'template.cache.%s.%s' % (fragment_name, args.hexdigest())
@@ -0,0 +1,26 @@
+"""A middleware class to invalidate the cache namespaces after the request is committed."""
+
+from apps.managers.cache_mgr import cache_mgr
+
+
+class DeferredInvalidationMiddleware(object):
+    """Defers the namespace invalidations of a request until its transaction is committed.
+    It is placed before the TransactionMiddleware, so that its process_response runs after the
+    TransactionMiddleware commits the request."""
+
+    def process_request(self, request):
+        """Start deferring the namespace invalidations."""
+        _ = request
+        cache_mgr.enable_deferred_invalidation()
+
+    def process_exception(self, request, exception):
+        """Discard the deferred namespace invalidations, the request is rolled back."""
+        _ = request
+        _ = exception
+        cache_mgr.discard_deferred_invalidation()
+
+    def process_response(self, request, response):
+        """Invalidate the deferred namespaces, the request is committed."""
+        _ = request
+        cache_mgr.flush_deferred_invalidation()
+        return response
@@ -0,0 +1 @@
+"""template tag module"""
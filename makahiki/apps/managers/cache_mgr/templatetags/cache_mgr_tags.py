@@ -0,0 +1,13 @@
+"""template tag definition for the cached template fragments"""
+from django import template
+from apps.managers.cache_mgr import cache_mgr
+
+register = template.Library()
+
+
+def namespace_generation(namespace):
+    """return the current generation of the cache namespace, to vary a cached template
+    fragment on, without supplying the view objects of the widget."""
+    return cache_mgr.namespace_generation(namespace)
+
+register.assignment_tag(namespace_generation)
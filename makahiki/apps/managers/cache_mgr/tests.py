@@ -1,7 +1,11 @@
 """Tests the cache_mgr module."""
 
+from django.core.cache import get_cache
+from django.template import Context, Template
+from django.templatetags import cache as cache_tags
 from django.test import TransactionTestCase
 from apps.managers.cache_mgr import cache_mgr
+from apps.managers.cache_mgr.middleware import DeferredInvalidationMiddleware
 from django.conf import settings
 
 
@@ -24,3 +28,92 @@ class BaseUnitTestCase(TransactionTestCase):
         cache_mgr.clear()
         self.assertEqual(cache_mgr.get_cache('test_key'), None,
                          "Test get the correct value from cache.")
+
+    def testNamespace(self):
+        """Tests invalidating the keys of a namespace."""
+        cache_mgr.set_cache('test_key', 'test_value', namespace='test')
+        cache_mgr.set_cache('other_key', 'other_value')
+
+        if settings.MAKAHIKI_USE_MEMCACHED:
+            self.assertEqual(cache_mgr.get_cache('test_key', namespace='test'), 'test_value',
+                             "Test get the correct value from the namespace.")
+        self.assertEqual(cache_mgr.get_cache('test_key'), None,
+                         "Test the namespaced key is not visible outside of the namespace.")
+
+        cache_mgr.invalidate_namespace('test')
+        self.assertEqual(cache_mgr.get_cache('test_key', namespace='test'), None,
+                         "Test the namespaced key is stale after the invalidation.")
+        if settings.MAKAHIKI_USE_MEMCACHED:
+            self.assertEqual(cache_mgr.get_cache('other_key'), 'other_value',
+                             "Test the keys outside of the namespace are kept.")
+
+    def testDeferredInvalidation(self):
+        """Tests that the namespace invalidations of a request are deferred until its
+        response, and discarded when the request fails."""
+        saved_cache = cache_mgr.cache
+        cache_mgr.cache = get_cache("django.core.cache.backends.locmem.LocMemCache")
+        middleware = DeferredInvalidationMiddleware()
+        try:
+            generation = cache_mgr.namespace_generation("test")
+            cache_mgr.invalidate_namespace_on_commit("test")
+            self.assertNotEqual(cache_mgr.namespace_generation("test"), generation,
+                "Test the namespace is invalidated right away outside a request.")
+
+            generation = cache_mgr.namespace_generation("test")
+            middleware.process_request(None)
+            cache_mgr.invalidate_namespace_on_commit("test")
+            cache_mgr.invalidate_namespace_on_commit("test")
+            self.assertEqual(cache_mgr.namespace_generation("test"), generation,
+                "Test the invalidation is deferred during the request.")
+            middleware.process_response(None, None)
+            self.assertEqual(cache_mgr.namespace_generation("test"), generation + 1,
+                "Test the namespace is invalidated once after the request.")
+
+            generation = cache_mgr.namespace_generation("test")
+            middleware.process_request(None)
+            cache_mgr.invalidate_namespace_on_commit("test")
+            middleware.process_exception(None, ValueError())
+            middleware.process_response(None, None)
+            self.assertEqual(cache_mgr.namespace_generation("test"), generation,
+                "Test the invalidation is discarded when the request fails.")
+        finally:
+            cache_mgr.discard_deferred_invalidation()
+            cache_mgr.cache = saved_cache
+
+    def testNamespaceGenerationTag(self):
+        """Tests that a template fragment cached on the namespace generation is rendered again
+        only after the namespace is invalidated, without looking up the view objects."""
+
+        class ViewObjects(dict):
+            """Counts the lookups of the view objects."""
+            lookups = 0
+
+            def __getitem__(self, key):
+                ViewObjects.lookups += 1
+                return dict.__getitem__(self, key)
+
+        template = Template('{% load cache cache_mgr_tags %}'
+                            '{% namespace_generation "test" as generation %}'
+                            '{% cache 60 test generation %}{{ view_objects.widget }}'
+                            '{% endcache %}')
+        context = Context({"view_objects": ViewObjects(widget="supplied")})
+
+        saved_cache = cache_mgr.cache
+        saved_fragment_cache = cache_tags.cache
+        cache_mgr.cache = cache_tags.cache = get_cache(
+            "django.core.cache.backends.locmem.LocMemCache")
+        try:
+            self.assertEqual(template.render(context), "supplied",
+                "Test the fragment is rendered.")
+            self.assertEqual(template.render(context), "supplied",
+                "Test the fragment is read from the cache.")
+            self.assertEqual(ViewObjects.lookups, 1,
+                "Test the view objects are not looked up when the fragment is cached.")
+
+            cache_mgr.invalidate_namespace("test")
+            template.render(context)
+            self.assertEqual(ViewObjects.lookups, 2,
+                "Test the fragment is rendered again after the invalidation.")
+        finally:
+            cache_mgr.cache = saved_cache
+            cache_tags.cache = saved_fragment_cache
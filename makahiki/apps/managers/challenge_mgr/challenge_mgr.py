@@ -1,9 +1,20 @@
 """The manager for challenge related settings."""
 
 import datetime
+import logging
+import os
+import sys
+import threading
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.template import loader, TemplateDoesNotExist, TemplateSyntaxError
+from django.utils import importlib
 from django.utils.text import capfirst
 from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr.models import ChallengeSetting, RoundSetting, PageSetting, \
@@ -20,6 +31,10 @@ _site_admin_models = {}
 """private variable to store the registered models for site admin page."""
 
 
+_supply_pool = {"pool": None, "lock": threading.Lock()}
+"""private variable to store the thread pool supplying the widgets concurrently."""
+
+
 _sys_admin_models = {}
 """private variable to store the registered models for sys admin page."""
 
@@ -129,12 +144,12 @@ def eval_page_unlock(user, page):
 
 def all_page_info(user):
     """Returns a list of all pages with their current lock state."""
-    all_pages = cache_mgr.get_cache("all_page_info-%s" % user.username)
+    all_pages = cache_mgr.get_cache("all_page_info-%s" % user.username, namespace="pages")
     if not all_pages:
         all_pages = PageInfo.objects.exclude(name="home").order_by("priority")
         for page in all_pages:
             page.is_unlock = eval_page_unlock(user, page)
-        cache_mgr.set_cache("all_page_info-%s" % user.username, all_pages, 1800)
+        cache_mgr.set_cache("all_page_info-%s" % user.username, all_pages, 1800, namespace="pages")
 
     return all_pages
 
@@ -156,7 +171,7 @@ def get_enabled_widgets(page_name):
 def get_all_enabled_widgets():
     """Returns the enabled widgets for each page, taking into account of the PageSetting
     and GameSetting."""
-    page_widgets = cache_mgr.get_cache("enabled_widgets")
+    page_widgets = cache_mgr.get_cache("enabled_widgets", namespace="pages")
     if page_widgets is None:
         page_setting = PageSetting.objects.filter(enabled=True).select_related("page", "game")
         page_widgets = {}
@@ -175,7 +190,7 @@ def get_all_enabled_widgets():
                 for gs in enabled_gs:
                     if gs.game.id == ps.game.id:
                         widgets.append(gs.widget)
-        cache_mgr.set_cache("enabled_widgets", page_widgets, 2592000)
+        cache_mgr.set_cache("enabled_widgets", page_widgets, 2592000, namespace="pages")
     return page_widgets
 
 
@@ -197,6 +212,226 @@ def available_widgets():
     return settings.INSTALLED_WIDGET_APPS
 
 
+class WidgetSupplyError(Exception):
+    """Raised when the supply of a widget fails with an error which the template engine would
+    otherwise silence as a missing variable."""
+    pass
+
+
+class LazyViewObjects(dict):
+    """The view_objects of a page. The view objects of a widget are supplied on their first
+    lookup, so that the supply of a widget which is not rendered is never called. The keys
+    which are set directly are stored as in a dictionary."""
+
+    def __init__(self, request, page_name):
+        super(LazyViewObjects, self).__init__()
+        self.request = request
+        self.page_name = page_name
+        self.suppliers = {}
+        self.timings = {}
+
+    def add_widget(self, widget, key=None):
+        """Adds the widget, whose view objects are supplied under the key on first lookup.
+        The key defaults to the widget name with the dots replaced by double underscores."""
+        if not key:
+            key = widget.replace(".", "__")
+        self.suppliers[key] = widget
+
+    def __getitem__(self, key):
+        if not dict.__contains__(self, key) and key in self.suppliers:
+            start = time.time()
+            try:
+                self[key] = supply_widget(self.request, self.page_name, self.suppliers[key])
+                self.timings[self.suppliers[key]] = time.time() - start
+            except (TypeError, AttributeError, KeyError, ValueError):
+                exc_info = sys.exc_info()
+                raise WidgetSupplyError(
+                    "%s: %s" % (self.suppliers[key], exc_info[1])), None, exc_info[2]
+        return dict.__getitem__(self, key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self.suppliers
+
+    def get(self, key, default=None):
+        """Returns the view objects of the key, supplying them if needed."""
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def supply_widget(request, page_name, widget):
+    """Returns the view objects supplied by the widget for the page.
+    The views module of the widget can declare SUPPLY_CACHE, a (scope, timeout) tuple where
+    the scope is "user", "team" or "global", to cache the supplied view objects for the
+    timeout in seconds, for the user, the team of the user, or everyone."""
+    page_views = importlib.import_module('apps.widgets.' + widget + '.views')
+    supply_cache = getattr(page_views, "SUPPLY_CACHE", None)
+    if not supply_cache:
+        return page_views.supply(request, page_name)
+
+    scope, timeout = supply_cache
+    if scope == "user":
+        scope_id = request.user.username
+    elif scope == "team":
+        scope_id = request.user.get_profile().team_id
+    else:
+        scope_id = ""
+    key = "supply-%s-%s-%s" % (widget, page_name, scope_id)
+
+    view_objects = cache_mgr.get_cache(key, namespace="supply")
+    if view_objects is None:
+        view_objects = page_views.supply(request, page_name)
+        cache_mgr.set_cache(key, view_objects, timeout, namespace="supply")
+    return view_objects
+
+
+class WidgetPlaceholder(dict):
+    """The view objects of a widget which has not been supplied within the time budget of the
+    page. It is empty, so that the page skips the widget as if it had nothing to show."""
+    pass
+
+
+def is_concurrent_widget(widget):
+    """Returns true if the widget can be supplied concurrently. The views module of the widget
+    opts in by declaring SUPPLY_CONCURRENT = True. Its supply must only read the database, and
+    must not depend on the uncommitted changes of the request, which are not visible to the
+    database connection of the worker thread."""
+    page_views = importlib.import_module('apps.widgets.' + widget + '.views')
+    return getattr(page_views, "SUPPLY_CONCURRENT", False)
+
+
+def is_eager_widget(widget):
+    """Returns true if the widget is supplied before the page is rendered, instead of on its
+    first lookup. The views module of the widget opts in by declaring SUPPLY_EAGER = True, when
+    its supply changes the state shown by the context processors or the other widgets."""
+    page_views = importlib.import_module('apps.widgets.' + widget + '.views')
+    return getattr(page_views, "SUPPLY_EAGER", False)
+
+
+def _get_supply_pool():
+    """Returns the thread pool supplying the widgets concurrently, shared by the requests of
+    the process. It has MAKAHIKI_SUPPLY_WORKERS threads."""
+    if _supply_pool["pool"] is None:
+        with _supply_pool["lock"]:
+            if _supply_pool["pool"] is None:
+                _supply_pool["pool"] = ThreadPool(settings.MAKAHIKI_SUPPLY_WORKERS)
+    return _supply_pool["pool"]
+
+
+def supply_widgets(request, page_name, widgets, time_budget):
+    """Supplies the view objects of the widgets for the page concurrently, within the time
+    budget in seconds. The widgets must be concurrent widgets, see is_concurrent_widget.
+    Returns a dict of widget to view objects and a dict of widget to supply time in seconds.
+    The widgets which have not been supplied within the time budget are reported with a
+    WidgetPlaceholder and a supply time of None."""
+    if not widgets:
+        return {}, {}
+
+    deadline = time.time() + time_budget
+
+    def supply(widget):
+        """Supply the view objects of a single widget and time it. The widgets still waiting
+        for a worker when the page gives up on them are not supplied."""
+        start = time.time()
+        if start >= deadline:
+            return None
+        try:
+            view_objects = supply_widget(request, page_name, widget)
+            _evaluate_querysets(view_objects)
+            return view_objects, time.time() - start
+        finally:
+            # each worker thread has its own database connection, which is not closed at
+            # the end of the request.
+            connection.close()
+
+    pool = _get_supply_pool()
+    results = [(widget, pool.apply_async(supply, (widget,))) for widget in widgets]
+
+    view_objects = {}
+    timings = {}
+    for widget, result in results:
+        try:
+            supplied = result.get(max(0, deadline - time.time()))
+        except TimeoutError:
+            # the supply keeps running on its worker, and its result is discarded.
+            supplied = None
+        if supplied is None:
+            view_objects[widget] = WidgetPlaceholder()
+            timings[widget] = None
+        else:
+            view_objects[widget], timings[widget] = supplied
+
+    return view_objects, timings
+
+
+def _evaluate_querysets(view_objects):
+    """Evaluates the querysets in the view objects, so that their queries run in the worker
+    thread instead of when the page renders them."""
+    if isinstance(view_objects, QuerySet):
+        len(view_objects)
+    elif isinstance(view_objects, dict):
+        for value in view_objects.values():
+            _evaluate_querysets(value)
+    elif isinstance(view_objects, (list, tuple)):
+        for value in view_objects:
+            _evaluate_querysets(value)
+
+
+def log_supply_timings(page_name, timings):
+    """Logs the supply time of the widgets of the page, with the widgets which timed out, to
+    the makahiki.supply logger."""
+    logger = logging.getLogger("makahiki.supply")
+    logger.info("supply %s %s" % (page_name, " ".join(
+        "%s=%s" % (widget, "timeout" if elapsed is None else "%.3f" % elapsed)
+        for widget, elapsed in sorted(timings.items()))))
+
+
+def get_template_names():
+    """Returns the names of the templates of the pages and of the installed widgets. The
+    index.html of a widget is named by its path, as it is included in the pages, and the
+    other templates of a widget are named relative to its templates directory. The pages
+    without page settings, such as admin, are not rendered from a page template."""
+    page_widgets = get_all_enabled_widgets()
+    names = ["%s.html" % page_name for page_name in pages() if page_name in page_widgets]
+    widgets = settings.INSTALLED_DEFAULT_WIDGET_APPS + settings.INSTALLED_WIDGET_APPS
+    for widget in sorted(set(widgets)):
+        widget_path = os.path.join("widgets", *widget.split("."))
+        template_dir = os.path.join(settings.PROJECT_ROOT, "apps", widget_path, "templates")
+        for root, _, files in os.walk(template_dir):
+            for name in files:
+                name = os.path.relpath(os.path.join(root, name), template_dir)
+                if name == "index.html":
+                    name = os.path.join(widget_path, "templates", name)
+                names.append(name)
+    return names
+
+
+def warm_templates():
+    """Loads and compiles the templates of the pages and the installed widgets, so that they
+    are kept by the cached template loader before the first requests. Returns a list of
+    (template name, error) of the templates which can not be loaded."""
+    errors = []
+    for name in get_template_names():
+        try:
+            loader.get_template(name)
+        except (TemplateDoesNotExist, TemplateSyntaxError) as error:
+            errors.append((name, error))
+    return errors
+
+
+def warm_template_cache():
+    """Precompiles the templates into the cached template loader when a worker starts, before
+    it serves its first request, if MAKAHIKI_TEMPLATE_CACHE is on. The templates which can not
+    be loaded are logged."""
+    if not settings.MAKAHIKI_TEMPLATE_CACHE:
+        return
+
+    logger = logging.getLogger("makahiki_logger")
+    for name, error in warm_templates():
+        logger.warning("template %s can not be precompiled: %s" % (name, error))
+
+
 def get_all_round_info():
     """Returns a dictionary containing all the round information.
     example: {"rounds": {"Round 1": {"start": start_date, "end": end_date,},},
@@ -1,5 +1,4 @@
 """Provides competition settings in the request context to be used within a template."""
-from django.utils import importlib
 import re
 from apps.managers.challenge_mgr import challenge_mgr
 from apps.managers.player_mgr.models import Profile
@@ -75,15 +74,12 @@ def competition(request):
 
 
 def _get_default_view_objects(request):
-    """Load the default widgets view objects for all pages."""
+    """Load the default widgets view objects for all pages. The view objects of a widget
+    are supplied when the template renders the widget."""
 
-    default_view_objects = {}
+    default_view_objects = challenge_mgr.LazyViewObjects(request, None)
     for widget in settings.INSTALLED_DEFAULT_WIDGET_APPS:
-
-        view_module_name = 'apps.widgets.' + widget + '.views'
-        page_views = importlib.import_module(view_module_name)
-        widget = widget.replace(".", "_")
-        default_view_objects[widget] = page_views.supply(request, None)
+        default_view_objects.add_widget(widget, widget.replace(".", "_"))
     return default_view_objects
 
 
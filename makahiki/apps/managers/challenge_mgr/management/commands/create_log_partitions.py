@@ -0,0 +1,26 @@
+"""Invocation:  python manage.py create_log_partitions [--days <days>]
+
+Create the daily partitions of the Makahiki log table on PostgreSQL for today and the following
+days (tomorrow by default), so that the log entries of the requests are written to an existing
+partition. The log entries of a day without a partition are written to the log table itself."""
+
+from optparse import make_option
+
+from apps.managers.log_mgr import log_mgr
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    option_list = MakahikiBaseCommand.option_list + (
+        make_option('--days', '-d', dest='days', default=2,
+                    help='number of days of partitions to create, starting today.'),
+        )
+
+    help = 'Create the daily partitions of the makahiki log table.'
+
+    def handle(self, *args, **options):
+        """handle create log partitions"""
+        partitions = log_mgr.create_log_partitions(int(options["days"]))
+        self.stdout.write("%d daily partitions of the makahiki log table created or found.\n" %
+                          len(partitions))
@@ -0,0 +1,27 @@
+"""Invocation:  python manage.py prune_log [--days <days>]
+
+Delete the Makahiki log entries older than the number of days (90 by default). On PostgreSQL
+the whole daily partitions of the log are dropped."""
+
+from optparse import make_option
+
+from apps.managers.log_mgr import log_mgr
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    option_list = MakahikiBaseCommand.option_list + (
+        make_option('--days', '-d', dest='days', default=90,
+                    help='number of days of log entries to keep.'),
+        )
+
+    help = 'Delete the makahiki log entries older than the number of days.'
+
+    def handle(self, *args, **options):
+        """handle prune log"""
+        days = int(options["days"])
+        dropped = log_mgr.prune(days)
+        self.stdout.write(
+            "makahiki log entries older than %d days deleted, %d daily partitions dropped.\n" % (
+            days, dropped))
@@ -0,0 +1,104 @@
+"""Invocation:  python manage.py template_cache <command> [<username>] [<iterations>]
+
+Maintains the compiled templates of the pages and the installed widgets.
+Possible commands are:
+
+  * warm : load and compile the templates of the pages and the installed widgets, and report
+    the templates which can not be loaded.
+  * benchmark : render every page for the user (default to the admin user) a number of times
+    (default to 10) with the uncached and then the cached template loaders, and report the
+    average render time of each page.
+
+"""
+
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.http import Http404
+from django.template import loader
+from django.test.client import RequestFactory
+from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+from apps.pages import views
+
+CACHED_LOADER = "django.template.loaders.cached.Loader"
+"""The cached template loader."""
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    help = "Maintain the compiled templates. Supported commands are : \n" \
+           "  warm\n" \
+           "  benchmark [<username>] [<iterations>]\n"
+
+    def handle(self, *args, **options):
+        """warm the templates or benchmark the page rendering."""
+
+        if len(args) == 0:
+            self.stdout.write(self.help)
+            return
+
+        operation = args[0]
+        if operation == "warm":
+            start = time.time()
+            errors = challenge_mgr.warm_templates()
+            for name, error in errors:
+                self.stdout.write("%s: %s\n" % (name, error))
+            self.stdout.write("templates compiled in %.1f ms, %d errors found.\n" % (
+                (time.time() - start) * 1000, len(errors)))
+        elif operation == "benchmark":
+            username = args[1] if len(args) > 1 else settings.ADMIN_USER
+            iterations = int(args[2]) if len(args) > 2 else 10
+            self.benchmark(User.objects.get(username=username), iterations)
+        else:
+            self.stdout.write("Invalid command. see help for supported commands.\n")
+
+    def benchmark(self, user, iterations):
+        """Reports the average render time of each page with the uncached and the cached
+        template loaders."""
+        template_loaders = settings.TEMPLATE_LOADERS
+        uncached = template_loaders
+        if template_loaders[0][0] == CACHED_LOADER:
+            uncached = template_loaders[0][1]
+
+        # pages without page settings, such as admin, are not rendered by the page view.
+        page_widgets = challenge_mgr.get_all_enabled_widgets()
+        try:
+            for page_name in challenge_mgr.pages():
+                if not page_name in page_widgets:
+                    self.stdout.write("%s: not available.\n" % page_name)
+                    continue
+
+                timings = []
+                for page_loaders in (uncached, ((CACHED_LOADER, uncached),)):
+                    settings.TEMPLATE_LOADERS = page_loaders
+                    loader.template_source_loaders = None
+                    timings.append(self.render_time(user, page_name, iterations))
+
+                if None in timings:
+                    self.stdout.write("%s: not available.\n" % page_name)
+                else:
+                    self.stdout.write("%s: uncached %.1f ms, cached %.1f ms\n" % (
+                        page_name, timings[0], timings[1]))
+        finally:
+            settings.TEMPLATE_LOADERS = template_loaders
+            loader.template_source_loaders = None
+
+    def render_time(self, user, page_name, iterations):
+        """Returns the average time in ms to render the page for the user, or None if the
+        page is not available to the user. The page is rendered once before timing, so that
+        the data caches are warm for both loaders."""
+        request = RequestFactory().get("/%s/" % page_name)
+        request.user = user
+        request.session = {}
+
+        try:
+            if views.index(request).status_code != 200:
+                return None
+        except Http404:
+            return None
+
+        start = time.time()
+        for _ in range(iterations):
+            views.index(request)
+        return (time.time() - start) * 1000 / iterations
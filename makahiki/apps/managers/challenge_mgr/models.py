@@ -263,6 +263,11 @@ class PageInfo(models.Model):
     def __unicode__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Custom save method."""
+        super(PageInfo, self).save(*args, **kwargs)
+        cache_mgr.invalidate_namespace("pages")
+
 
 class PageSetting(models.Model):
     """Defines widgets in a page."""
@@ -295,7 +300,7 @@ class PageSetting(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method."""
         super(PageSetting, self).save(*args, **kwargs)
-        cache_mgr.delete("enabled_widgets")
+        cache_mgr.invalidate_namespace("pages")
 
 
 class GameInfo(models.Model):
@@ -320,7 +325,7 @@ class GameInfo(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method."""
         super(GameInfo, self).save(*args, **kwargs)
-        cache_mgr.delete("enabled_widgets")
+        cache_mgr.invalidate_namespace("pages")
 
 
 class GameSetting(models.Model):
@@ -349,4 +354,4 @@ class GameSetting(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method."""
         super(GameSetting, self).save(*args, **kwargs)
-        cache_mgr.delete("enabled_widgets")
+        cache_mgr.invalidate_namespace("pages")
@@ -1,9 +1,11 @@
 """Tests the challenge_mgr module."""
 
 import datetime
+import time
 from django.contrib.auth.models import User
 
 from django.test import TransactionTestCase
+from django.test.client import RequestFactory
 from django.core.urlresolvers import reverse
 
 from apps.managers.challenge_mgr import challenge_mgr
@@ -55,3 +57,89 @@ class BaseUnitTestCase(TransactionTestCase):
         current_round = challenge_mgr.get_round_name()
         self.assertTrue(current_round is None,
             "Test that there is no current round.")
+
+    def testLazyViewObjects(self):
+        """Tests that the view objects of a widget are supplied on their first lookup."""
+        request = RequestFactory().get("/learn/")
+        request.user = User.objects.create_user("user", "user@test.com")
+
+        view_objects = challenge_mgr.LazyViewObjects(request, "learn")
+        view_objects.add_widget("help.faq")
+        view_objects["widget_templates"] = []
+        self.assertTrue("help__faq" in view_objects,
+            "Test that the widget is in the view objects.")
+        self.assertFalse(dict.__contains__(view_objects, "help__faq"),
+            "Test that the widget is not supplied before its lookup.")
+
+        self.assertEqual(list(view_objects["help__faq"]["faqs"]), [],
+            "Test that the widget is supplied on lookup.")
+        self.assertTrue(dict.__contains__(view_objects, "help__faq"),
+            "Test that the supplied view objects are kept.")
+        self.assertEqual(view_objects.get("widget_templates"), [],
+            "Test that the keys set directly are returned.")
+        self.assertEqual(view_objects.get("unknown"), None,
+            "Test that a missing key returns the default.")
+
+    def testSupplyWidgets(self):
+        """Tests that the widgets missing the time budget are replaced by placeholders."""
+        request = RequestFactory().get("/learn/")
+        request.user = User.objects.create_user("user", "user@test.com")
+
+        def supply_widget(request, page_name, widget):
+            """Supply the widgets slowly, except for the fast one."""
+            _ = request
+            if widget != "fast":
+                time.sleep(2)
+            return {"page_name": page_name}
+
+        original = challenge_mgr.supply_widget
+        challenge_mgr.supply_widget = supply_widget
+        try:
+            view_objects, timings = challenge_mgr.supply_widgets(
+                request, "learn", ["fast", "slow"], time_budget=0.5)
+        finally:
+            challenge_mgr.supply_widget = original
+
+        self.assertEqual(view_objects["fast"], {"page_name": "learn"},
+            "Test that the fast widget is supplied.")
+        self.assertTrue(timings["fast"] < 0.5,
+            "Test that the supply time of the fast widget is recorded.")
+        self.assertTrue(isinstance(view_objects["slow"], challenge_mgr.WidgetPlaceholder),
+            "Test that the slow widget is replaced by a placeholder.")
+        self.assertFalse(view_objects["slow"],
+            "Test that the placeholder is skipped by the page.")
+        self.assertEqual(timings["slow"], None,
+            "Test that the slow widget is reported as timed out.")
+
+    def testEvaluateQuerysets(self):
+        """Tests that the querysets of the supplied view objects are evaluated."""
+        User.objects.create_user("user", "user@test.com")
+        view_objects = {"users": User.objects.all(),
+                        "standings": {"Round 1": [User.objects.all()]}}
+
+        challenge_mgr._evaluate_querysets(view_objects)
+        self.assertNotEqual(view_objects["users"]._result_cache, None,
+            "Test that the queryset is evaluated.")
+        self.assertNotEqual(view_objects["standings"]["Round 1"][0]._result_cache, None,
+            "Test that the nested queryset is evaluated.")
+
+    def testSupplyTimings(self):
+        """Tests that the supply time of the widgets supplied on lookup is recorded."""
+        request = RequestFactory().get("/learn/")
+        request.user = User.objects.create_user("user", "user@test.com")
+
+        view_objects = challenge_mgr.LazyViewObjects(request, "learn")
+        view_objects.add_widget("help.faq")
+        self.assertEqual(view_objects.timings, {},
+            "Test that no widget is timed before it is supplied.")
+        view_objects.get("help__faq")
+        self.assertTrue("help.faq" in view_objects.timings,
+            "Test that the supply time of the widget is recorded.")
+        self.assertTrue(challenge_mgr.is_concurrent_widget("help.faq"),
+            "Test that the faq widget can be supplied concurrently.")
+        self.assertTrue(challenge_mgr.is_concurrent_widget("scoreboard"),
+            "Test that the scoreboard widget can be supplied concurrently.")
+        self.assertTrue(challenge_mgr.is_eager_widget("quests"),
+            "Test that the quests widget is supplied before the page is rendered.")
+        self.assertFalse(challenge_mgr.is_eager_widget("help.faq"),
+            "Test that the faq widget is supplied on lookup.")
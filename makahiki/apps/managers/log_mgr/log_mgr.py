@@ -1,15 +1,186 @@
 """log manager module provides methods to operate on log records."""
 import datetime
 import logging
+import Queue
+import atexit
+import threading
 from django.conf import settings
+from django.db import connection, transaction, DatabaseError
+from django.db.transaction import TransactionManagementError
 from apps.managers.log_mgr.models import MakahikiLog
 
 
+LOG_QUEUE_SIZE = 10000
+"""The maximum number of log entries waiting to be written. Entries beyond it are dropped."""
+
+LOG_BATCH_SIZE = 200
+"""The number of log entries which triggers a write."""
+
+LOG_FLUSH_INTERVAL = 5
+"""The maximum number of seconds a log entry waits before being written."""
+
+_log_queue = Queue.Queue(LOG_QUEUE_SIZE)
+"""private variable to store the log entries waiting to be written."""
+
+_log_writer = {"thread": None, "dropped": 0, "errors": set(), "lock": threading.Lock()}
+"""private variable to store the log writer thread, the number of dropped entries and the types
+of the errors already logged."""
+
+_log_partitions = set()
+"""private variable to store the names of the daily log partitions known to exist."""
+
+
 def clear():
     """clear the log content from the log table."""
     MakahikiLog.objects.all().delete()
 
 
+def prune(days):
+    """Delete the log entries older than the number of days. On PostgreSQL, where the log
+    table is partitioned by day, the old partitions are dropped as a whole. Returns the number
+    of partitions dropped."""
+    cutoff = datetime.date.today() - datetime.timedelta(days=days)
+    table = connection.ops.quote_name(MakahikiLog._meta.db_table)
+    cursor = connection.cursor()
+
+    dropped = 0
+    if _uses_partitions():
+        for date, name in log_partitions().items():
+            if date < cutoff:
+                cursor.execute("DROP TABLE %s" % connection.ops.quote_name(name))
+                _log_partitions.discard(name)
+                dropped += 1
+        # the entries written before the partitions existed.
+        cursor.execute("DELETE FROM ONLY %s WHERE request_time < %%s" % table, [cutoff])
+    else:
+        cursor.execute("DELETE FROM %s WHERE request_time < %%s" % table, [cutoff])
+    transaction.commit_unless_managed()
+    return dropped
+
+
+def log_partitions():
+    """Returns a dict of date to the table name of the daily partitions of the log table."""
+    if not _uses_partitions():
+        return {}
+
+    prefix = MakahikiLog._meta.db_table + "_"
+    cursor = connection.cursor()
+    cursor.execute("SELECT tablename FROM pg_tables WHERE tablename LIKE %s",
+                   [prefix + "%"])
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        try:
+            date = datetime.datetime.strptime(name[len(prefix):], "%Y%m%d").date()
+        except ValueError:
+            continue
+        partitions[date] = name
+    return partitions
+
+
+def create_log_partitions(days=2):
+    """Create the daily partitions of the log table for today and the following days, so that
+    the log entries are written to an existing partition. Run by a scheduled task, outside of
+    any request. Returns the list of the table names of the partitions."""
+    if not _uses_partitions():
+        return []
+
+    today = datetime.date.today()
+    return [ensure_log_partition(today + datetime.timedelta(days=day)) for day in range(days)]
+
+
+def ensure_log_partition(date):
+    """Create the daily partition of the log table for the date, if it does not exist yet.
+    The partition inherits the log table, so the queries on MakahikiLog include its entries.
+    The partition is created and committed in its own transaction, so it must not be called
+    inside a managed transaction, such as the transaction of a request.
+    Returns the table name of the partition."""
+    name = _log_partition_name(date)
+    if name in _log_partitions:
+        return name
+
+    if transaction.is_managed():
+        raise TransactionManagementError(
+            "The log partition %s can not be created in a managed transaction." % name)
+
+    if not date in log_partitions():
+        quote = connection.ops.quote_name
+        cursor = connection.cursor()
+        try:
+            cursor.execute(
+                "CREATE TABLE %s (PRIMARY KEY (id), "
+                "CHECK (request_time >= %%s AND request_time < %%s)) INHERITS (%s)" % (
+                    quote(name), quote(MakahikiLog._meta.db_table)),
+                [date, date + datetime.timedelta(days=1)])
+            cursor.execute("CREATE INDEX %s ON %s (request_time)" % (
+                quote(name + "_request_time"), quote(name)))
+            cursor.execute("CREATE INDEX %s ON %s (remote_user, request_time)" % (
+                quote(name + "_remote_user_request_time"), quote(name)))
+            transaction.commit_unless_managed()
+        except DatabaseError:
+            # another process created the partition first.
+            transaction.rollback_unless_managed()
+            if not date in log_partitions():
+                raise
+
+    # only cached once the partition is committed.
+    _log_partitions.add(name)
+    return name
+
+
+def _log_partition_name(date):
+    """Returns the table name of the daily partition of the log table for the date."""
+    return "%s_%s" % (MakahikiLog._meta.db_table, date.strftime("%Y%m%d"))
+
+
+def _existing_log_partition(date):
+    """Returns the table name of the daily partition of the log table for the date, or None
+    if the partition does not exist. The partitions are never created here, as the log
+    entries may be written inside the transaction of a request."""
+    name = _log_partition_name(date)
+    if not name in _log_partitions:
+        _log_partitions.update(log_partitions().values())
+        if not name in _log_partitions:
+            return None
+    return name
+
+
+def _uses_partitions():
+    """Returns true if the log table is partitioned by day, using PostgreSQL table
+    inheritance."""
+    return connection.vendor == "postgresql"
+
+
+def _insert_logs(logs):
+    """Insert the log entries, into the daily partitions of the log table if it is
+    partitioned and the partition of the day exists."""
+    if not _uses_partitions():
+        MakahikiLog.objects.bulk_create(logs)
+        return
+
+    days = {}
+    for log in logs:
+        date = log.request_time.date() if log.request_time else None
+        days.setdefault(date, []).append(log)
+
+    fields = [f for f in MakahikiLog._meta.local_fields if f.attname != "id"]
+    quote = connection.ops.quote_name
+    cursor = connection.cursor()
+    for date, day_logs in days.items():
+        partition = _existing_log_partition(date) if date else None
+        if partition is None:
+            # written to the log table itself, until the partition of the day is created.
+            MakahikiLog.objects.bulk_create(day_logs)
+            continue
+
+        cursor.executemany("INSERT INTO %s (%s) VALUES (%s)" % (
+            quote(partition),
+            ", ".join([quote(f.column) for f in fields]),
+            ", ".join(["%s"] * len(fields))),
+            [[f.get_db_prep_save(getattr(log, f.attname), connection=connection)
+              for f in fields] for log in day_logs])
+    transaction.commit_unless_managed()
+
+
 def write_log_entry(request, response_status_code, path=None, exception=None):
     """Write a log entry corresponding to the passed request.
     if path is provided, it override the request.path."""
@@ -51,8 +222,88 @@ def write_log_entry(request, response_status_code, path=None, exception=None):
             logger.error(entry)
         else:
             logger.info(entry)
+    elif settings.MAKAHIKI_LOG_WRITE_BEHIND:
+        queue_log_entry(log)
     else:
-        log.save()
+        _insert_logs([log])
+
+
+def queue_log_entry(log):
+    """Queue the log entry to be written in a batch by the log writer thread. The entry is
+    dropped and counted if the queue is full."""
+    try:
+        _log_queue.put_nowait(log)
+    except Queue.Full:
+        with _log_writer["lock"]:
+            _log_writer["dropped"] += 1
+
+    if _log_writer["thread"] is None:
+        with _log_writer["lock"]:
+            if _log_writer["thread"] is None:
+                thread = threading.Thread(target=_write_log_entries, name="log_mgr writer")
+                thread.daemon = True
+                thread.start()
+                _log_writer["thread"] = thread
+
+
+def dropped_log_entries():
+    """Returns the number of log entries dropped because the queue was full."""
+    return _log_writer["dropped"]
+
+
+def flush():
+    """Write all the queued log entries. Returns the number of entries written."""
+    logs = []
+    while True:
+        try:
+            logs.append(_log_queue.get_nowait())
+        except Queue.Empty:
+            break
+    _write_batch(logs)
+    return len(logs)
+
+
+# write the entries still queued when the process exits.
+atexit.register(flush)
+
+
+def _write_log_entries():
+    """Write the queued log entries in batches, once LOG_BATCH_SIZE entries are queued or
+    the oldest entry waited LOG_FLUSH_INTERVAL seconds. Runs in the log writer thread."""
+    while True:
+        logs = [_log_queue.get()]
+        deadline = datetime.datetime.today() + datetime.timedelta(seconds=LOG_FLUSH_INTERVAL)
+        while len(logs) < LOG_BATCH_SIZE:
+            timeout = (deadline - datetime.datetime.today()).total_seconds()
+            if timeout <= 0:
+                break
+            try:
+                logs.append(_log_queue.get(timeout=timeout))
+            except Queue.Empty:
+                break
+        _write_batch(logs)
+
+
+def _write_batch(logs):
+    """Write the log entries with a single bulk insert. Entries which could not be written
+    are counted as dropped, and the error is logged the first time it occurs."""
+    if not logs:
+        return
+    try:
+        _insert_logs(logs)
+    except Exception as e:
+        with _log_writer["lock"]:
+            _log_writer["dropped"] += len(logs)
+            first = not e.__class__ in _log_writer["errors"]
+            _log_writer["errors"].add(e.__class__)
+        if first:
+            # logged once per type of error, as the writes keep failing while the database
+            # is unavailable.
+            logging.getLogger("makahiki_logger").exception(
+                "%d log entries dropped, further %s errors are only counted." % (
+                    len(logs), e.__class__.__name__))
+        # do not reuse a connection left in a failed state.
+        connection.close()
 
 
 def get_request_headers(log, request, response_status_code, path):
@@ -62,7 +313,7 @@ def get_request_headers(log, request, response_status_code, path):
 
     log.request_time = datetime.datetime.today()
     log.remote_ip = header("REMOTE_ADDR", "no-ip")
-    log.remote_user = get_username(request)
+    log.remote_user = u"%s" % get_username(request)
     log.request_method = request.method
     log.request_url = path or request.get_full_path()
     log.response_status = response_status_code
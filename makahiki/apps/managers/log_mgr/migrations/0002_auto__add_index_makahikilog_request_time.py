@@ -0,0 +1,44 @@
+# encoding: utf-8
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        
+        # Adding index on 'MakahikiLog', fields ['request_time']
+        db.create_index('log_mgr_makahikilog', ['request_time'])
+
+        # Adding index on 'MakahikiLog', fields ['remote_user', 'request_time']
+        db.create_index('log_mgr_makahikilog', ['remote_user', 'request_time'])
+
+
+    def backwards(self, orm):
+        
+        # Removing index on 'MakahikiLog', fields ['remote_user', 'request_time']
+        db.delete_index('log_mgr_makahikilog', ['remote_user', 'request_time'])
+
+        # Removing index on 'MakahikiLog', fields ['request_time']
+        db.delete_index('log_mgr_makahikilog', ['request_time'])
+
+
+    models = {
+        'log_mgr.makahikilog': {
+            'Meta': {'object_name': 'MakahikiLog'},
+            'http_referer': ('django.db.models.fields.CharField', [], {'max_length': '1000', 'null': 'True', 'blank': 'True'}),
+            'http_user_agent': ('django.db.models.fields.CharField', [], {'max_length': '300', 'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'level': ('django.db.models.fields.CharField', [], {'max_length': '10', 'null': 'True', 'blank': 'True'}),
+            'post_content': ('django.db.models.fields.TextField', [], {'null': 'True', 'blank': 'True'}),
+            'remote_ip': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'remote_user': ('django.db.models.fields.CharField', [], {'db_index': 'True', 'max_length': '30', 'null': 'True', 'blank': 'True'}),
+            'request_method': ('django.db.models.fields.CharField', [], {'max_length': '10', 'null': 'True', 'blank': 'True'}),
+            'request_time': ('django.db.models.fields.DateTimeField', [], {'null': 'True', 'db_index': 'True', 'blank': 'True'}),
+            'request_url': ('django.db.models.fields.CharField', [], {'max_length': '1000', 'null': 'True', 'blank': 'True'}),
+            'response_status': ('django.db.models.fields.IntegerField', [], {'null': 'True', 'blank': 'True'})
+        }
+    }
+
+    complete_apps = ['log_mgr']
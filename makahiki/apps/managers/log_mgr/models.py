@@ -3,9 +3,10 @@ from django.db import models
 
 
 class MakahikiLog(models.Model):
-    """a simple log record table."""
+    """a simple log record table. On PostgreSQL, the entries are stored in daily partitions
+    inheriting this table, created ahead of time by the create_log_partitions task."""
     level = models.CharField(max_length=10, blank=True, null=True)
-    request_time = models.DateTimeField(blank=True, null=True)
+    request_time = models.DateTimeField(blank=True, null=True, db_index=True)
     remote_ip = models.CharField(max_length=20, blank=True, null=True)
     remote_user = models.CharField(max_length=30, blank=True, null=True, db_index=True)
     request_method = models.CharField(max_length=10, blank=True, null=True)
@@ -0,0 +1,10 @@
+"""Celery Task definitions for the log manager."""
+
+from celery.task import task
+from apps.managers.log_mgr import log_mgr
+
+
+@task
+def create_log_partitions():
+    """create the daily partitions of the log table for today and tomorrow."""
+    log_mgr.create_log_partitions()
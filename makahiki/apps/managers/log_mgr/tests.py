@@ -0,0 +1,151 @@
+"""Tests the log_mgr module."""
+
+import datetime
+import logging
+import Queue
+from django.db import connection, transaction, DatabaseError
+from django.db.transaction import TransactionManagementError
+from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+from django.utils import unittest
+from apps.managers.log_mgr import log_mgr
+from apps.managers.log_mgr.models import MakahikiLog
+
+
+class LogManagerTestCase(TransactionTestCase):
+    """Tests the log manager."""
+
+    def testPrune(self):
+        """Tests that the log entries older than the number of days are deleted."""
+        now = datetime.datetime.today()
+        MakahikiLog.objects.create(remote_user="old",
+                                   request_time=now - datetime.timedelta(days=10))
+        MakahikiLog.objects.create(remote_user="new", request_time=now)
+
+        log_mgr.prune(5)
+        self.assertEqual([log.remote_user for log in MakahikiLog.objects.all()], ["new"],
+            "Test that only the log entries older than 5 days are deleted.")
+
+    def testWriteBehind(self):
+        """Tests that the queued log entries are written when flushed."""
+        # no writer thread is started, the entries are only written by flush.
+        log_mgr._log_writer["thread"] = "test"
+        try:
+            with self.settings(MAKAHIKI_LOG_WRITE_BEHIND=True, MAKAHIKI_USE_LOGFILE=False):
+                log_mgr.write_log_entry(RequestFactory().get("/home/"), 200)
+                log_mgr.write_log_entry(RequestFactory().get("/learn/"), 200)
+            self.assertEqual(MakahikiLog.objects.count(), 0,
+                "Test that the log entries are queued.")
+            self.assertEqual(log_mgr.flush(), 2, "Test that the queued entries are flushed.")
+            self.assertEqual(sorted(log.request_url for log in MakahikiLog.objects.all()),
+                ["/home/", "/learn/"], "Test that the queued entries are written.")
+            self.assertEqual(log_mgr.flush(), 0, "Test that the queue is empty.")
+        finally:
+            log_mgr._log_writer["thread"] = None
+
+    def testDroppedEntries(self):
+        """Tests that the entries which can not be queued or written are counted as dropped,
+        and that the write errors are logged once per type."""
+        dropped = log_mgr.dropped_log_entries()
+        log_queue = log_mgr._log_queue
+        log_mgr._log_queue = Queue.Queue(1)
+        log_mgr._log_writer["thread"] = "test"
+        try:
+            log_mgr.queue_log_entry(MakahikiLog(request_url="/home/"))
+            log_mgr.queue_log_entry(MakahikiLog(request_url="/learn/"))
+            self.assertEqual(log_mgr.dropped_log_entries(), dropped + 1,
+                "Test that the entry beyond the queue size is dropped.")
+            self.assertEqual(log_mgr.flush(), 1, "Test that the queued entry is written.")
+        finally:
+            log_mgr._log_queue = log_queue
+            log_mgr._log_writer["thread"] = None
+
+        class FailingInsert(object):
+            """Fails to insert the log entries, and records the logged errors."""
+            def __init__(self):
+                self.records = []
+
+            def __call__(self, logs):
+                raise DatabaseError("database is unavailable")
+
+            def emit(self, record):
+                """record the logged error."""
+                self.records.append(record)
+
+        failing = FailingInsert()
+        handler = logging.Handler()
+        handler.emit = failing.emit
+        logger = logging.getLogger("makahiki_logger")
+        logger.addHandler(handler)
+        insert_logs = log_mgr._insert_logs
+        log_mgr._insert_logs = failing
+        log_mgr._log_writer["errors"].discard(DatabaseError)
+        try:
+            log_mgr._write_batch([MakahikiLog(), MakahikiLog()])
+            log_mgr._write_batch([MakahikiLog()])
+        finally:
+            log_mgr._insert_logs = insert_logs
+            logger.removeHandler(handler)
+
+        self.assertEqual(log_mgr.dropped_log_entries(), dropped + 4,
+            "Test that the entries which failed to be written are dropped.")
+        self.assertEqual(len(failing.records), 1,
+            "Test that the write error is logged once.")
+        self.assertTrue("DatabaseError" in failing.records[0].getMessage(),
+            "Test that the type of the error is logged.")
+
+    @unittest.skipUnless(connection.vendor == "postgresql",
+                         "The log table is only partitioned on PostgreSQL.")
+    def testPartitionRouting(self):
+        """Tests that the log entries are written to the partition of their day, if it exists,
+        and that the old partitions are dropped by prune."""
+        today = datetime.date.today()
+        old_day = today - datetime.timedelta(days=10)
+        now = datetime.datetime.today()
+        table = MakahikiLog._meta.db_table
+        cursor = connection.cursor()
+
+        partitions = log_mgr.create_log_partitions()
+        try:
+            self.assertEqual(len(partitions), 2,
+                "Test that the partitions of today and tomorrow are created.")
+            log_mgr._insert_logs([
+                MakahikiLog(remote_user="today", request_time=now),
+                MakahikiLog(remote_user="unpartitioned",
+                            request_time=now - datetime.timedelta(days=20))])
+
+            cursor.execute("SELECT remote_user FROM %s" % partitions[0])
+            self.assertEqual(cursor.fetchall(), [("today",)],
+                "Test that the log entry of today is written to the partition of today.")
+            cursor.execute("SELECT remote_user FROM ONLY %s" % table)
+            self.assertEqual(cursor.fetchall(), [("unpartitioned",)],
+                "Test that the log entry of a day without partition is written to the table.")
+            self.assertEqual(MakahikiLog.objects.count(), 2,
+                "Test that the log table includes the entries of the partitions.")
+
+            partitions.append(log_mgr.ensure_log_partition(old_day))
+            self.assertEqual(log_mgr.prune(5), 1, "Test that the old partition is dropped.")
+            self.assertFalse(old_day in log_mgr.log_partitions(),
+                "Test that the old partition no longer exists.")
+            self.assertEqual([log.remote_user for log in MakahikiLog.objects.all()], ["today"],
+                "Test that the old log entries are deleted.")
+        finally:
+            for name in partitions:
+                cursor.execute("DROP TABLE IF EXISTS %s" % name)
+                log_mgr._log_partitions.discard(name)
+            transaction.commit_unless_managed()
+
+    @unittest.skipUnless(connection.vendor == "postgresql",
+                         "The log table is only partitioned on PostgreSQL.")
+    def testPartitionInTransaction(self):
+        """Tests that a partition is not created inside a managed transaction."""
+        day = datetime.date.today() + datetime.timedelta(days=30)
+        transaction.enter_transaction_management()
+        transaction.managed(True)
+        try:
+            self.assertRaises(TransactionManagementError, log_mgr.ensure_log_partition, day)
+        finally:
+            transaction.rollback()
+            transaction.leave_transaction_management()
+        self.assertFalse(day in log_mgr.log_partitions(),
+            "Test that the partition is not created.")
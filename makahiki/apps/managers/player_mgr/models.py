@@ -53,9 +53,21 @@ class Profile(models.Model):
         verbose_name = 'profile'
         verbose_name_plural = 'profiles'
 
+    def __init__(self, *args, **kwargs):
+        """Remember the team of the player, to detect team changes on save."""
+        super(Profile, self).__init__(*args, **kwargs)
+        self._saved_team_id = self.team_id
+
     def __unicode__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        """Custom save method to move the points of the player when the team is changed."""
+        super(Profile, self).save(*args, **kwargs)
+        if self._saved_team_id != self.team_id:
+            score_mgr.player_change_team(self, self._saved_team_id)
+            self._saved_team_id = self.team_id
+
     def user_link(self):
         """return the user first_name."""
         return '<a href="%s/%d/">%s</a>' % ("/admin/auth/user", self.user.pk, self.user.username)
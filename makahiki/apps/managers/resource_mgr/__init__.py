@@ -1 +1,5 @@
 """resource manager package."""
+
+# importing resource_mgr connects the signals maintaining the ResourceRoundTotal.
+from apps.managers.resource_mgr import resource_mgr
+_ = resource_mgr
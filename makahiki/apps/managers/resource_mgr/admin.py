@@ -18,7 +18,8 @@ admin.site.register(WaterUsage, UsageAdmin)
 
 class ResourceSettingsAdmin(admin.ModelAdmin):
     """Administrator display list: team, date, and energy."""
-    list_display = ["name", "unit", "winning_order", ]
+    list_display = ["name", "unit", "winning_order", "hourly_rollup", "daily_rollup",
+                    "reading_retention_days", "hourly_retention_days", "daily_retention_days"]
 
 admin.site.register(ResourceSetting, ResourceSettingsAdmin)
 challenge_mgr.register_sys_admin_model("Resource Settings", ResourceSetting)
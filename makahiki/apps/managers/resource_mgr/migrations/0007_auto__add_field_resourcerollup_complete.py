@@ -0,0 +1,116 @@
+# encoding: utf-8
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        
+        # Adding field 'ResourceRollup.complete'
+        db.add_column('resource_mgr_resourcerollup', 'complete', self.gf('django.db.models.fields.BooleanField')(default=False), keep_default=False)
+
+
+    def backwards(self, orm):
+        
+        # Deleting field 'ResourceRollup.complete'
+        db.delete_column('resource_mgr_resourcerollup', 'complete')
+
+
+    models = {
+        'resource_mgr.energyusage': {
+            'Meta': {'ordering': "('-date', 'team')", 'unique_together': "(('date', 'team'),)", 'object_name': 'EnergyUsage'},
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'date': ('django.db.models.fields.DateField', [], {'default': 'datetime.date(2012, 8, 20)'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'manual_meter_reading': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'time': ('django.db.models.fields.TimeField', [], {'default': 'datetime.time(20, 45, 58, 737170)'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'usage': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        'resource_mgr.resourceblackoutdate': {
+            'Meta': {'object_name': 'ResourceBlackoutDate'},
+            'date': ('django.db.models.fields.DateField', [], {}),
+            'description': ('django.db.models.fields.CharField', [], {'max_length': '20', 'null': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'})
+        },
+        'resource_mgr.resourcereading': {
+            'Meta': {'ordering': "('resource', 'team', 'timestamp')", 'object_name': 'ResourceReading'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '20'}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'timestamp': ('django.db.models.fields.DateTimeField', [], {'db_index': 'True'}),
+            'usage': ('django.db.models.fields.IntegerField', [], {})
+        },
+        'resource_mgr.resourcerollup': {
+            'Meta': {'ordering': "('resource', 'team', 'period', 'start')", 'unique_together': "(('resource', 'team', 'period', 'start'),)", 'object_name': 'ResourceRollup'},
+            'complete': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'period': ('django.db.models.fields.CharField', [], {'max_length': '10'}),
+            'readings': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '20'}),
+            'start': ('django.db.models.fields.DateTimeField', [], {'db_index': 'True'}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'usage': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        'resource_mgr.resourceroundtotal': {
+            'Meta': {'unique_together': "(('resource', 'team', 'round_name'),)", 'object_name': 'ResourceRoundTotal'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'resource': ('django.db.models.fields.CharField', [], {'max_length': '20'}),
+            'round_name': ('django.db.models.fields.CharField', [], {'max_length': "'30'"}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'total': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        'resource_mgr.resourcesetting': {
+            'Meta': {'unique_together': "(('name',),)", 'object_name': 'ResourceSetting'},
+            'daily_retention_days': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'daily_rollup': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'hourly_retention_days': ('django.db.models.fields.IntegerField', [], {'default': '120'}),
+            'hourly_rollup': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '20'}),
+            'reading_retention_days': ('django.db.models.fields.IntegerField', [], {'default': '14'}),
+            'unit': ('django.db.models.fields.CharField', [], {'max_length': '20'}),
+            'winning_order': ('django.db.models.fields.CharField', [], {'max_length': '10'})
+        },
+        'resource_mgr.wasteusage': {
+            'Meta': {'ordering': "('-date', 'team')", 'unique_together': "(('date', 'team'),)", 'object_name': 'WasteUsage'},
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'date': ('django.db.models.fields.DateField', [], {'default': 'datetime.date(2012, 8, 20)'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'manual_meter_reading': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'time': ('django.db.models.fields.TimeField', [], {'default': 'datetime.time(20, 45, 58, 737170)'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'usage': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        'resource_mgr.waterusage': {
+            'Meta': {'ordering': "('-date', 'team')", 'unique_together': "(('date', 'team'),)", 'object_name': 'WaterUsage'},
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'date': ('django.db.models.fields.DateField', [], {'default': 'datetime.date(2012, 8, 20)'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'manual_meter_reading': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'team': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Team']"}),
+            'time': ('django.db.models.fields.TimeField', [], {'default': 'datetime.time(20, 45, 58, 737170)'}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'usage': ('django.db.models.fields.IntegerField', [], {'default': '0'})
+        },
+        'team_mgr.group': {
+            'Meta': {'object_name': 'Group'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '200'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'null': 'True', 'db_index': 'True'})
+        },
+        'team_mgr.team': {
+            'Meta': {'object_name': 'Team'},
+            'group': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['team_mgr.Group']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'logo': ('django.db.models.fields.files.ImageField', [], {'max_length': '1024', 'null': 'True', 'blank': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'slug': ('django.db.models.fields.SlugField', [], {'max_length': '50', 'null': 'True', 'db_index': 'True'})
+        }
+    }
+
+    complete_apps = ['resource_mgr']
@@ -31,6 +31,26 @@ class ResourceSetting(models.Model):
         choices=WINNING_ORDER_CHOICE,
         help_text="The winning order.",
     )
+    hourly_rollup = models.BooleanField(
+        default=True,
+        help_text="Keep the hourly rollups of the readings of the resource.",
+    )
+    daily_rollup = models.BooleanField(
+        default=True,
+        help_text="Keep the daily rollups of the readings of the resource.",
+    )
+    reading_retention_days = models.IntegerField(
+        default=14,
+        help_text="The number of days the raw readings are kept. 0 keeps them forever.",
+    )
+    hourly_retention_days = models.IntegerField(
+        default=120,
+        help_text="The number of days the hourly rollups are kept. 0 keeps them forever.",
+    )
+    daily_retention_days = models.IntegerField(
+        default=0,
+        help_text="The number of days the daily rollups are kept. 0 keeps them forever.",
+    )
 
     class Meta:
         """Meta"""
@@ -52,6 +72,104 @@ class ResourceBlackoutDate(models.Model):
         help_text="The description of the date.")
 
 
+class ResourceReading(models.Model):
+    """A raw reading of the cumulative usage of a resource by a team, since midnight.
+    Readings are only appended, and pruned according to the ResourceSetting retention."""
+    resource = models.CharField(
+        choices=ResourceSetting.RESOURCE_CHOICE,
+        max_length=20,
+        help_text="The name of the resource.",
+    )
+    team = models.ForeignKey(Team)
+    timestamp = models.DateTimeField(
+        db_index=True,
+        help_text="The time of the reading.")
+    usage = models.IntegerField(
+        help_text="The usage since midnight, in the unit defined in ResourceSetting.")
+
+    class Meta:
+        """Meta"""
+        ordering = ("resource", "team", "timestamp")
+
+
+class ResourceRollup(models.Model):
+    """The readings of a resource by a team downsampled to an hour or a day."""
+
+    PERIOD_CHOICE = (
+        ("hourly", "hourly"),
+        ("daily", "daily"),)
+
+    resource = models.CharField(
+        choices=ResourceSetting.RESOURCE_CHOICE,
+        max_length=20,
+        help_text="The name of the resource.",
+    )
+    team = models.ForeignKey(Team)
+    period = models.CharField(
+        choices=PERIOD_CHOICE,
+        max_length=10,
+        help_text="The period of the rollup.",
+    )
+    start = models.DateTimeField(
+        db_index=True,
+        help_text="The start of the hour or the day of the rollup.")
+    usage = models.IntegerField(
+        default=0,
+        help_text="The usage since midnight at the end of the period once complete, "
+                  "otherwise the latest usage read in the period.")
+    readings = models.IntegerField(
+        default=0,
+        help_text="The number of readings in the period.")
+    complete = models.BooleanField(
+        default=False,
+        help_text="True once a reading at or after the end of the period is recorded, the "
+                  "usage being then interpolated at the end of the period.")
+
+    class Meta:
+        """Meta"""
+        unique_together = (("resource", "team", "period", "start"),)
+        ordering = ("resource", "team", "period", "start")
+
+
+class ResourceRoundTotal(models.Model):
+    """The total usage of a resource by a team up to the end of a round. It is the
+    materialized aggregate of the resource usage, maintained by resource_mgr."""
+    resource = models.CharField(
+        choices=ResourceSetting.RESOURCE_CHOICE,
+        max_length=20,
+        help_text="The name of the resource.",
+    )
+    team = models.ForeignKey(Team)
+    round_name = models.CharField(
+        max_length="30",
+        help_text="The name of the round")
+    total = models.IntegerField(
+        default=0,
+        help_text="The total usage up to the end of the round.")
+
+    class Meta:
+        """Meta"""
+        unique_together = (("resource", "team", "round_name"),)
+
+
+class RoundTotalBuild(models.Model):
+    """Marks the round totals of a resource, or of the goals of a resource, as built for a
+    round. The totals of a round which are not built are aggregated on each use instead."""
+    name = models.CharField(
+        max_length=30,
+        help_text="The name of the totals, such as energy or energy_goal.")
+    round_name = models.CharField(
+        max_length="30",
+        help_text="The name of the round")
+    build_time = models.DateTimeField(
+        auto_now_add=True,
+        help_text="The time the totals were built.")
+
+    class Meta:
+        """Meta"""
+        unique_together = (("name", "round_name"),)
+
+
 class ResourceUsage(models.Model):
     """abstract resource usage model."""
     team = models.ForeignKey(Team)
@@ -1,18 +1,46 @@
 """Provides services for a specific sustainability "resource" such as energy or water."""
 
 import datetime
+import time
+from multiprocessing import TimeoutError
+from multiprocessing.pool import ThreadPool
 from xml.etree.ElementTree import ParseError
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction, IntegrityError
+from django.db.models import F
 from django.db.models.aggregates import Sum
+from django.db.models.signals import pre_save, post_save, post_delete
 import requests
-from requests.exceptions import Timeout
+from requests.exceptions import Timeout, RequestException
 from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.challenge_mgr.models import RoundSetting
 from apps.managers.team_mgr.models import Team
 from apps.managers.resource_mgr.models import EnergyUsage, WaterUsage, ResourceSetting, \
-    WasteUsage, ResourceBlackoutDate
+    WasteUsage, ResourceBlackoutDate, ResourceReading, ResourceRollup, ResourceRoundTotal, \
+    RoundTotalBuild
 from xml.etree import ElementTree
-from django.template.defaultfilters import slugify
+
+
+WATTDEPOT_TIMEOUT = 5
+"""Seconds to wait for a single WattDepot response."""
+
+WATTDEPOT_RETRIES = 2
+"""Number of times a failed WattDepot request is retried."""
+
+WATTDEPOT_BACKOFF = 0.5
+"""Seconds to wait before the first retry, doubled on each following retry."""
+
+WATTDEPOT_MAX_WORKERS = 10
+"""Maximum number of concurrent WattDepot requests."""
+
+WATTDEPOT_TIME_BUDGET = 300
+"""Seconds an energy usage update may spend polling WattDepot, well within the hourly
+polling interval."""
+
+READING_MAX_GAP = datetime.timedelta(hours=2)
+"""The maximum interval between two readings to interpolate the usage at the end of the
+rollups between them."""
 
 
 def get_resource_setting(name):
@@ -34,6 +62,11 @@ def is_blackout(date):
     return ResourceBlackoutDate.objects.filter(date=date).exists()
 
 
+def get_blackout_dates():
+    """Returns the set of all the Resource Blackout dates."""
+    return set(ResourceBlackoutDate.objects.values_list("date", flat=True))
+
+
 def team_resource_data(date, team, resource):
     """Returns the latest data for the specified resource on the current date."""
 
@@ -58,7 +91,13 @@ def team_resource_usage(date, team, resource):
 
 
 def team_hourly_energy_usage(date, hour, team):
-    """Returns the latest usage of the specified resource for the current date and hour."""
+    """Returns the latest usage of the specified resource for the current date and hour.
+    The usage is read from the local rollups, and only fetched from WattDepot if the
+    rollup is not available."""
+    usage = team_hourly_usage(date, hour, team, "energy")
+    if usage is not None:
+        return usage
+
     session = requests.session()
     start_time = date.strftime("%Y-%m-%dT00:00:00")
     end_time = date.strftime("%Y-%m-%dT") + "%.2d:00:00" % hour
@@ -66,40 +105,262 @@ def team_hourly_energy_usage(date, hour, team):
     return get_energy_usage(session, team.name)
 
 
-def get_energy_usage(session, source):
-    """Return the energy usage from wattdepot."""
-    rest_url = "%s/wattdepot/sources/%s/energy/" % (
-        challenge_mgr.get_challenge().wattdepot_server_url, source)
+def get_energy_usage(session, source, server_url=None, timeout=WATTDEPOT_TIMEOUT,
+                     retries=0, deadline=None, params=None, default=0):
+    """Return the energy usage from wattdepot, or default if it can not be fetched.
+    params, if given, overrides the startTime and endTime params of the session.
+    Failed requests are retried up to retries times with an exponential backoff,
+    but not past the deadline (a time.time() value) if one is given."""
+    if server_url is None:
+        server_url = challenge_mgr.get_challenge().wattdepot_server_url
+    rest_url = "%s/wattdepot/sources/%s/energy/" % (server_url, source)
 
     # comment out for debug
     #import sys
     #session.config['verbose'] = sys.stderr
 
-    session.timeout = 5
-
+    attempt = 0
+    while True:
+        try:
+            response = session.get(url=rest_url, params=params, timeout=timeout)
+            return _parse_energy_usage(response.text)
+
+        except Timeout:
+            print 'team %s energy usage update error with connection timeout.' % source
+        except RequestException as exception:
+            print 'team %s energy usage update error : %s' % (source, exception)
+        except ParseError as exception:
+            print 'team %s energy usage update with ParseError : %s' % (source, exception)
+            return default
+
+        backoff = WATTDEPOT_BACKOFF * (2 ** attempt)
+        attempt += 1
+        if attempt > retries or (deadline and time.time() + backoff + timeout > deadline):
+            return default
+        time.sleep(backoff)
+
+
+def _parse_energy_usage(text):
+    """Returns the energy consumed, in kWh, from the WattDepot energy XML response."""
+    usage = 0
+    property_elements = ElementTree.XML(text).findall(".//Property")
+    for p in property_elements:
+        key_value = p.getchildren()
+        if key_value and key_value[0].text == "energyConsumed":
+            usage = key_value[1].text
+
+    return int(round(float(usage) / 1000))
+
+
+def fetch_energy_usage(sources, start_time, end_time, max_workers=WATTDEPOT_MAX_WORKERS,
+                       time_budget=WATTDEPOT_TIME_BUDGET):
+    """Fetch the energy usage of the sources from WattDepot concurrently.
+    Returns a dict of source name to a (usage, latency in seconds) tuple, as returned by
+    fetch_energy_windows."""
+    results = fetch_energy_windows([(source, start_time, end_time) for source in sources],
+                                   max_workers=max_workers, time_budget=time_budget)
+    return dict((window[0], result) for window, result in results.items())
+
+
+def fetch_energy_windows(windows, max_workers=WATTDEPOT_MAX_WORKERS,
+                         time_budget=WATTDEPOT_TIME_BUDGET):
+    """Fetch the energy usage of the (source, start_time, end_time) windows from WattDepot
+    concurrently. Returns a dict of window to a (usage, latency in seconds) tuple. Windows
+    which have failed are reported with a usage of None and the latency of the failure, and
+    windows which have not been answered within the time budget are reported with a usage
+    and a latency of None. A time_budget of None waits for all the windows."""
+    if not windows:
+        return {}
+
+    server_url = challenge_mgr.get_challenge().wattdepot_server_url
+    deadline = time.time() + time_budget if time_budget is not None else None
+    workers = max(1, min(max_workers, len(windows)))
+
+    # one session shared by all the workers, so connections to the server are reused.
+    session = requests.session(config={'pool_maxsize': workers})
+
+    def fetch(window):
+        """Fetch the usage of a single window and time it."""
+        source, start_time, end_time = window
+        start = time.time()
+        usage = get_energy_usage(session, source, server_url=server_url,
+                                 retries=WATTDEPOT_RETRIES, deadline=deadline,
+                                 params={'startTime': start_time, 'endTime': end_time},
+                                 default=None)
+        return window, usage, time.time() - start
+
+    results = dict((window, (None, None)) for window in windows)
+    pool = ThreadPool(workers)
     try:
-        response = session.get(url=rest_url)
-
-        #print response.text
-        usage = 0
-        property_elements = ElementTree.XML(response.text).findall(".//Property")
-        for p in property_elements:
-            key_value = p.getchildren()
-            if key_value and key_value[0].text == "energyConsumed":
-                usage = key_value[1].text
-
-        return int(round(float(usage) / 1000))
-
-    except Timeout:
-        print 'team %s energy usage update error with connection timeout.' % source
-    except ParseError as exception:
-        print 'team %s energy usage update with ParseError : %s' % (source, exception)
+        pending = pool.imap_unordered(fetch, windows)
+        for _ in windows:
+            try:
+                window, usage, latency = pending.next(
+                    max(0, deadline - time.time()) if deadline else None)
+            except TimeoutError:
+                break
+            results[window] = (usage, latency)
+    finally:
+        pool.terminate()
+
+    return results
+
+
+def record_reading(resource, team, timestamp, usage):
+    """Append a reading of the usage of the resource by the team since midnight, and roll
+    it up into the hourly and daily rollups enabled in the resource setting.
+    The rollup of the period of the reading keeps the latest usage read in the period. The
+    rollups of the periods ending between the previous reading and this one are completed
+    with the usage interpolated at the end of the period, if the readings are no more than
+    READING_MAX_GAP apart."""
+    previous = list(ResourceReading.objects.filter(
+        resource=resource, team=team, timestamp__lt=timestamp).order_by(
+        "-timestamp").values_list("timestamp", "usage")[:1])
+    ResourceReading.objects.create(resource=resource, team=team, timestamp=timestamp,
+                                   usage=usage)
+
+    resource_setting = get_resource_setting(resource)
+    periods = []
+    if resource_setting.hourly_rollup:
+        periods.append(("hourly", datetime.timedelta(hours=1)))
+    if resource_setting.daily_rollup:
+        periods.append(("daily", datetime.timedelta(days=1)))
+
+    midnight = datetime.datetime.combine(timestamp.date(), datetime.time())
+    for period, _ in periods:
+        if period == "hourly":
+            start = timestamp.replace(minute=0, second=0, microsecond=0)
+        else:
+            start = midnight
+        _rollup_reading(resource, team, period, start, usage)
+
+    if previous and timestamp - previous[0][0] <= READING_MAX_GAP:
+        for boundary, boundary_usage in _boundary_usages(previous[0], (timestamp, usage)):
+            for period, length in periods:
+                if period == "hourly" or boundary.time() == datetime.time():
+                    _complete_rollup(resource, team, period, boundary - length,
+                                     boundary_usage)
+
+
+def _boundary_usages(previous, current):
+    """Returns the list of (boundary, usage) of the hour boundaries after the previous
+    reading and up to the current reading, both (timestamp, usage) tuples. The usage since
+    midnight at a boundary is interpolated linearly between the readings. As the usage is
+    read since midnight, the rate of the usage across midnight is the rate of the usage
+    read after midnight."""
+    (start, start_usage), (end, end_usage) = previous, current
+    midnight = datetime.datetime.combine(end.date(), datetime.time())
+    if start < midnight:
+        if end == midnight:
+            return []
+        rate = float(end_usage) / (end - midnight).total_seconds()
+    else:
+        rate = float(end_usage - start_usage) / (end - start).total_seconds()
 
-    return 0
+    usages = []
+    boundary = start.replace(minute=0, second=0, microsecond=0) + datetime.timedelta(hours=1)
+    while boundary <= end:
+        if start < midnight < boundary:
+            usage = rate * (boundary - midnight).total_seconds()
+        else:
+            usage = start_usage + rate * (boundary - start).total_seconds()
+        usages.append((boundary, int(round(usage))))
+        boundary += datetime.timedelta(hours=1)
+    return usages
+
+
+def _rollup_reading(resource, team, period, start, usage):
+    """Roll the usage up into the rollup of the period starting at start."""
+    rollup, _ = ResourceRollup.objects.get_or_create(resource=resource, team=team,
+                                                     period=period, start=start)
+    if not rollup.complete:
+        # the usage is cumulative over the day, so the latest reading is the largest one.
+        rollup.usage = max(rollup.usage, usage)
+    rollup.readings += 1
+    rollup.save()
+
+
+def _complete_rollup(resource, team, period, start, usage):
+    """Complete the rollup of the period starting at start with the usage at its end."""
+    rollup, _ = ResourceRollup.objects.get_or_create(resource=resource, team=team,
+                                                     period=period, start=start)
+    rollup.usage = usage
+    rollup.complete = True
+    rollup.save()
+
+
+def team_hourly_usage(date, hour, team, resource):
+    """Returns the usage of the resource by the team on the date, from midnight up to the
+    hour (1 to 24), from the local rollups. Returns None if the rollup is not available or
+    not complete."""
+    if hour == 24:
+        usages = team_usage_series(team, resource, date, date + datetime.timedelta(days=1),
+                                   "daily", complete=True)
+    else:
+        start = datetime.datetime.combine(date, datetime.time(hour=hour - 1))
+        usages = team_usage_series(team, resource, start,
+                                   start + datetime.timedelta(hours=1), "hourly",
+                                   complete=True)
+    if usages:
+        return usages[0][1]
+    else:
+        return None
 
 
-def update_energy_usage():
-    """Update the energy usage from WattDepot server."""
+def team_usage_series(team, resource, start, end, period="hourly", complete=False):
+    """Returns the list of (start, usage) of the hourly or daily rollups of the resource
+    by the team, which start in the [start, end) range. Only the complete rollups are
+    returned if complete is True."""
+    rollups = ResourceRollup.objects.filter(
+        resource=resource, team=team, period=period, start__gte=start, start__lt=end)
+    if complete:
+        rollups = rollups.filter(complete=True)
+    return list(rollups.values_list("start", "usage"))
+
+
+def team_readings(team, resource, start, end):
+    """Returns the list of (timestamp, usage) of the raw readings of the resource by the
+    team in the [start, end) range."""
+    return list(ResourceReading.objects.filter(
+        resource=resource, team=team,
+        timestamp__gte=start, timestamp__lt=end).values_list("timestamp", "usage"))
+
+
+def get_usage_rollups(resource, teams, start, end, period="hourly"):
+    """Returns a dict of (team name, start) to the usage at the end of the complete hourly
+    or daily rollups of the resource by the teams, which start in the [start, end) range."""
+    rollups = ResourceRollup.objects.filter(
+        resource=resource, team__in=teams, period=period, complete=True,
+        start__gte=start, start__lt=end).values_list("team__name", "start", "usage")
+    return dict(((name, rollup_start), usage) for name, rollup_start, usage in rollups)
+
+
+def prune_resource_store(resource, now=None):
+    """Delete the readings and rollups of the resource older than the retention periods
+    defined in the resource setting."""
+    if now is None:
+        now = datetime.datetime.today()
+    resource_setting = get_resource_setting(resource)
+
+    if resource_setting.reading_retention_days:
+        ResourceReading.objects.filter(
+            resource=resource,
+            timestamp__lt=now - datetime.timedelta(
+                days=resource_setting.reading_retention_days)).delete()
+
+    for period, days in (("hourly", resource_setting.hourly_retention_days),
+                         ("daily", resource_setting.daily_retention_days)):
+        if days:
+            ResourceRollup.objects.filter(
+                resource=resource, period=period,
+                start__lt=now - datetime.timedelta(days=days)).delete()
+
+
+def update_energy_usage(max_workers=WATTDEPOT_MAX_WORKERS, time_budget=WATTDEPOT_TIME_BUDGET):
+    """Update the energy usage from WattDepot server.
+    The teams are polled concurrently by up to max_workers threads, and the update gives up
+    on the teams which have not answered within time_budget seconds. The teams whose fetch
+    has failed are reported separately from the ones which have not answered."""
 
     challenge_mgr.init()
     date = datetime.datetime.today()
@@ -110,11 +371,20 @@ def update_energy_usage():
     start_time = date.strftime("%Y-%m-%dT00:00:00")
     end_time = date.strftime("%Y-%m-%dT%H:%M:%S")
 
-    s = requests.session()
-    s.params = {'startTime': start_time, 'endTime': end_time}
+    teams = dict((team.name, team) for team in Team.objects.all())
+    results = fetch_energy_usage(teams.keys(), start_time, end_time,
+                                 max_workers=max_workers, time_budget=time_budget)
+
+    for name, (usage, latency) in sorted(results.items()):
+        team = teams[name]
+        if latency is None:
+            print 'team %s energy usage update skipped, no response within %d seconds.' % (
+                team, time_budget)
+            continue
+        if usage is None:
+            print 'team %s energy usage update failed after %.2fs.' % (team, latency)
+            continue
 
-    for team in Team.objects.all():
-        usage = get_energy_usage(s, team.name)
         if usage:
             try:
                 latest_usage = EnergyUsage.objects.get(team=team, date=date.date())
@@ -124,7 +394,12 @@ def update_energy_usage():
             latest_usage.time = date.time()
             latest_usage.usage = usage
             latest_usage.save()
-            print 'team %s energy usage updated at %s.' % (team, date)
+            record_reading("energy", team, date, usage)
+            print 'team %s energy usage updated at %s (fetched in %.2fs).' % (
+                team, date, latency)
+
+    prune_resource_store("energy")
+    return results
 
 
 def update_fake_water_usage():
@@ -146,8 +421,11 @@ def update_fake_water_usage():
             water.time = date.time()
             water.usage = actual_usage * count
             water.save()
+            record_reading("water", team, date, int(water.usage))
             print 'team %s fake water usage updated at %s.' % (team, date)
 
+    prune_resource_store("water")
+
 
 def _get_resource_usage(name):
     """Returns the resource usage object by name, or None if not found."""
@@ -164,30 +442,165 @@ def _get_resource_usage(name):
 def resource_ranks(name, round_name=None):
     """Return the ranking of resource use for all teams."""
 
-    cache_key = "%s_ranks-%s" % (name, slugify(round_name))
-    ranks = cache_mgr.get_cache(cache_key)
-    if ranks is None:
-        resource_usage = _get_resource_usage(name)
+    resource_setting = get_resource_setting(name)
 
-        resource_setting = get_resource_setting(name)
-        if resource_setting.winning_order == "Ascending":
-            ordering = "total"
-        else:
-            ordering = "-total"
+    round_info = challenge_mgr.get_round_info(round_name)
+    if not round_info:
+        return None
 
-        round_info = challenge_mgr.get_round_info(round_name)
-        if not round_info:
-            return None
+    totals = _get_round_totals(name, round_info["name"])
+    ranks = [{"team__name": team_name, "total": total} for team_name, total in totals]
+    ranks.sort(key=lambda rank: rank["total"],
+               reverse=resource_setting.winning_order != "Ascending")
+    return ranks
 
-        usage_ranks = resource_usage.objects.filter(
-            date__lte=round_info["end"].date).values("team__name").annotate(
-                total=Sum("usage")).order_by(ordering)
 
-        ranks = []
-        for rank in usage_ranks:
-            ranks.append(rank)
-        cache_mgr.set_cache(cache_key, ranks, 3600)
-    return ranks
+def _get_round_totals(name, round_name):
+    """Returns the list of (team name, total usage) of the resource up to the end of the
+    round. The totals of a round which are not built yet are aggregated from the resource
+    usage table, without being stored."""
+    if is_round_total_built(name, round_name):
+        return list(ResourceRoundTotal.objects.filter(
+            resource=name, round_name=round_name).values_list("team__name", "total"))
+
+    return [(usage_total["team__name"], usage_total["total"] or 0)
+            for usage_total in _aggregate_round_totals(name, round_name)]
+
+
+def _aggregate_round_totals(name, round_name):
+    """Returns the total usage of the resource of all teams up to the end of the round,
+    aggregated from the resource usage table."""
+    resource_usage = _get_resource_usage(name)
+    round_end = challenge_mgr.get_all_round_info_from_cache()["rounds"][round_name]["end"]
+    # the default ordering of the usage would split the totals by date.
+    return resource_usage.objects.filter(date__lte=round_end.date()).values(
+        "team", "team__name").annotate(total=Sum("usage")).order_by()
+
+
+def rebuild_round_totals(name, round_name):
+    """Rebuilds the total usage of the resource of all teams up to the end of the round,
+    from the resource usage table, and marks them built. Returns the number of totals
+    created."""
+    RoundTotalBuild.objects.filter(name=name, round_name=round_name).delete()
+    claim_round_total_build(name, round_name)
+    return _build_round_totals(name, round_name)
+
+
+def rebuild_all_round_totals():
+    """Rebuilds the round totals of all the resources for all the rounds.
+    Returns the number of totals created."""
+    count = 0
+    for round_name in challenge_mgr.get_all_round_info_from_cache()["rounds"]:
+        for name in ("energy", "water", "waste"):
+            count += rebuild_round_totals(name, round_name)
+    return count
+
+
+def _build_round_totals(name, round_name):
+    """Replaces the round totals of the resource with the aggregated totals."""
+    usage_totals = list(_aggregate_round_totals(name, round_name))
+    ResourceRoundTotal.objects.filter(resource=name, round_name=round_name).delete()
+    ResourceRoundTotal.objects.bulk_create([
+        ResourceRoundTotal(resource=name, team_id=usage_total["team"], round_name=round_name,
+                           total=usage_total["total"] or 0)
+        for usage_total in usage_totals])
+    return len(usage_totals)
+
+
+def is_round_total_built(name, round_name):
+    """Returns True if the round totals of the name are built for the round."""
+    return RoundTotalBuild.objects.filter(name=name, round_name=round_name).exists()
+
+
+def claim_round_total_build(name, round_name):
+    """Marks the round totals of the name as built for the round, the caller building them
+    in the same transaction. Returns False if they are already marked, such as by a
+    concurrent build."""
+    sid = transaction.savepoint()
+    try:
+        RoundTotalBuild.objects.create(name=name, round_name=round_name)
+    except IntegrityError:
+        transaction.savepoint_rollback(sid)
+        return False
+    transaction.savepoint_commit(sid)
+    return True
+
+
+def _update_round_totals(name, changes):
+    """Applies the changes, a list of (team_id, date, usage delta), to the total usage of the
+    resource of the rounds ending on or after the date. The totals of a round which have not
+    been built yet are built from the current resource usage table instead."""
+    rounds = challenge_mgr.get_all_round_info_from_cache()["rounds"]
+    for round_name, round_info in rounds.items():
+        if not is_round_total_built(name, round_name):
+            if claim_round_total_build(name, round_name):
+                _build_round_totals(name, round_name)
+            continue
+
+        for team_id, date, delta in changes:
+            if delta and date <= round_info["end"].date():
+                if not ResourceRoundTotal.objects.filter(
+                    resource=name, team=team_id, round_name=round_name).update(
+                    total=F("total") + delta):
+                    ResourceRoundTotal.objects.create(resource=name, team_id=team_id,
+                                                      round_name=round_name, total=delta)
+
+    # the resource leaders may have changed, once the changes are committed.
+    cache_mgr.invalidate_namespace_on_commit("leaders")
+
+
+def _resource_name(sender):
+    """Returns the resource name of the resource usage model."""
+    return {EnergyUsage: "energy", WaterUsage: "water", WasteUsage: "waste"}[sender]
+
+
+def _resource_usage_pre_save(sender, instance=None, **kwargs):
+    """Remembers the previous usage of the resource usage being saved."""
+    _ = kwargs
+    instance.previous_usage = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk).values_list("team", "date", "usage")
+        if previous:
+            instance.previous_usage = previous[0]
+
+
+def _resource_usage_saved(sender, instance=None, **kwargs):
+    """Moves the total usage of the team from the previous usage to the saved usage."""
+    _ = kwargs
+    changes = []
+    if instance.previous_usage:
+        team_id, date, usage = instance.previous_usage
+        changes.append((team_id, date, -usage))
+    changes.append((instance.team_id, instance.date, instance.usage))
+    _update_round_totals(_resource_name(sender), changes)
+
+
+def _resource_usage_deleted(sender, instance=None, **kwargs):
+    """Removes the deleted usage from the total usage of the team."""
+    _ = kwargs
+    _update_round_totals(_resource_name(sender),
+                         [(instance.team_id, instance.date, -instance.usage)])
+
+
+def _round_setting_changed(sender, **kwargs):
+    """Rebuilds the round totals with the new rounds."""
+    _ = sender
+    _ = kwargs
+    # the signal is sent before RoundSetting.save clears the cached rounds.
+    cache_mgr.delete("rounds")
+    ResourceRoundTotal.objects.all().delete()
+    RoundTotalBuild.objects.exclude(name__endswith="_goal").delete()
+    if RoundSetting.objects.exists():
+        rebuild_all_round_totals()
+    cache_mgr.invalidate_namespace("leaders")
+
+
+for usage_model in (EnergyUsage, WaterUsage, WasteUsage):
+    pre_save.connect(_resource_usage_pre_save, sender=usage_model)
+    post_save.connect(_resource_usage_saved, sender=usage_model)
+    post_delete.connect(_resource_usage_deleted, sender=usage_model)
+post_save.connect(_round_setting_changed, sender=RoundSetting)
+post_delete.connect(_round_setting_changed, sender=RoundSetting)
 
 
 def resource_team_rank_info(team, resource):
@@ -1,12 +1,47 @@
 """Energy scoreboard Test"""
 import datetime
+import threading
+import time
+from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+from SocketServer import ThreadingMixIn
 
 from django.test import TransactionTestCase
+from apps.managers.challenge_mgr import challenge_mgr
 from apps.managers.resource_mgr import resource_mgr
-from apps.managers.resource_mgr.models import EnergyUsage
+from apps.managers.challenge_mgr.models import RoundSetting
+from apps.managers.resource_mgr.models import EnergyUsage, ResourceReading, ResourceRollup, \
+    ResourceRoundTotal, RoundTotalBuild
 from apps.utils import test_utils
 
 
+class StubWattDepotServer(ThreadingMixIn, HTTPServer):
+    """A local WattDepot server answering the requests in parallel."""
+    daemon_threads = True
+
+
+class StubWattDepotHandler(BaseHTTPRequestHandler):
+    """Answers every energy request with 12345 Wh, except for the "slow" source which
+    takes longer than the test time budget to answer and the "broken" source which answers
+    with an invalid response."""
+
+    def do_GET(self):
+        """Return the energy XML of the requested source."""
+        if "/sources/slow/" in self.path:
+            time.sleep(5)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/xml")
+        self.end_headers()
+        if "/sources/broken/" in self.path:
+            self.wfile.write("<SensorData>")
+            return
+        self.wfile.write("<SensorData><Properties><Property><Key>energyConsumed</Key>"
+                         "<Value>12345.0</Value></Property></Properties></SensorData>")
+
+    def log_message(self, *args):
+        """Do not log requests."""
+        pass
+
+
 class ResourceManagerTestCase(TransactionTestCase):
     """ResourceManager Test"""
 
@@ -30,3 +65,128 @@ class ResourceManagerTestCase(TransactionTestCase):
         usage = resource_mgr.team_resource_usage(date=date, team=self.team, resource="energy")
         self.assertEqual(rank, 1, "The team should be first rank.")
         self.assertEqual(usage, 100, "The team usage is not correct.")
+
+    def testResourceRanks(self):
+        """Test that the resource ranks follow the changes of the usage."""
+        usage = EnergyUsage(team=self.team, date=datetime.date.today(),
+                            time=datetime.time(hour=15), usage=100)
+        usage.save()
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 100,
+                         "The team total should include the new usage.")
+
+        usage.usage = 150
+        usage.save()
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 150,
+                         "The team total should follow the updated usage.")
+
+        EnergyUsage(team=self.team, date=datetime.date.today() - datetime.timedelta(days=1),
+                    time=datetime.time(hour=15), usage=50).save()
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 200,
+                         "The team total should sum the usage of all days.")
+
+        usage.delete()
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 50,
+                         "The team total should not include the deleted usage.")
+
+    def testRoundTotals(self):
+        """Test that the round totals are aggregated without being stored until they are
+        built, and rebuilt when the rounds change."""
+        EnergyUsage(team=self.team, date=datetime.date.today(),
+                    time=datetime.time(hour=15), usage=100).save()
+        RoundTotalBuild.objects.all().delete()
+        ResourceRoundTotal.objects.all().delete()
+
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 100,
+                         "The team total should be aggregated from the usage.")
+        self.assertEqual(ResourceRoundTotal.objects.count(), 0,
+                         "The totals should not be built when they are read.")
+
+        EnergyUsage(team=self.team, date=datetime.date.today() - datetime.timedelta(days=1),
+                    time=datetime.time(hour=15), usage=50).save()
+        self.assertTrue(resource_mgr.is_round_total_built("energy", "Round 1"),
+                        "The totals should be built when the usage changes.")
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 150,
+                         "The built team total should include all the usage.")
+
+        ResourceRoundTotal.objects.all().update(total=0)
+        round_setting = RoundSetting.objects.get(name="Round 1")
+        round_setting.save()
+        self.assertEqual(resource_mgr.resource_ranks("energy")[0]["total"], 150,
+                         "The team total should be rebuilt when the rounds change.")
+
+    def testResourceStore(self):
+        """Test the readings and rollups of the local resource store."""
+        date = datetime.date.today() - datetime.timedelta(days=1)
+        for hour, minute, usage in ((9, 10, 10), (9, 30, 15), (10, 30, 30), (23, 30, 80)):
+            timestamp = datetime.datetime.combine(date, datetime.time(hour=hour, minute=minute))
+            resource_mgr.record_reading("energy", self.team, timestamp, usage)
+
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 10, self.team, "energy"), 23,
+                         "The usage up to 10:00 should be interpolated between the readings.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 11, self.team, "energy"), None,
+                         "The rollup is not complete without a reading after 11:00.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 24, self.team, "energy"), None,
+                         "The rollup of the day is not complete before midnight.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 5, self.team, "energy"), None,
+                         "There is no rollup for the hour.")
+        self.assertEqual(len(resource_mgr.team_usage_series(
+            self.team, "energy", date, date + datetime.timedelta(days=1))), 3,
+            "There should be an hourly rollup for each hour with readings.")
+
+        resource_mgr.prune_resource_store(
+            "energy", now=datetime.datetime.today() + datetime.timedelta(days=30))
+        self.assertEqual(ResourceReading.objects.count(), 0,
+                         "The readings should be pruned after the retention period.")
+        self.assertEqual(ResourceRollup.objects.count(), 4,
+                         "The rollups should be kept.")
+
+    def testHourlyReadings(self):
+        """Test that the rollups hold the usage at the end of their period with hourly
+        readings taken five minutes past the hour."""
+        date = datetime.date.today() - datetime.timedelta(days=2)
+        readings = ((date, 9, 12), (date, 10, 24), (date, 11, 36), (date, 23, 100),
+                    (date + datetime.timedelta(days=1), 0, 10))
+        for day, hour, usage in readings:
+            timestamp = datetime.datetime.combine(day, datetime.time(hour=hour, minute=5))
+            resource_mgr.record_reading("energy", self.team, timestamp, usage)
+
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 10, self.team, "energy"), 23,
+                         "The usage up to 10:00 should be interpolated at 10:00.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 11, self.team, "energy"), 35,
+                         "The usage up to 11:00 should be interpolated at 11:00.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 24, self.team, "energy"), 210,
+                         "The usage of the day should be extrapolated to midnight.")
+        self.assertEqual(resource_mgr.team_hourly_usage(date, 23, self.team, "energy"), None,
+                         "The rollups are not completed across a gap in the readings.")
+
+    def testUpdateEnergyUsage(self):
+        """Test polling the energy usage concurrently from a stub WattDepot server."""
+        server = StubWattDepotServer(("127.0.0.1", 0), StubWattDepotHandler)
+        thread = threading.Thread(target=server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        challenge = challenge_mgr.get_challenge()
+        challenge.wattdepot_server_url = "http://127.0.0.1:%d" % server.server_port
+        challenge.save()
+
+        try:
+            results = resource_mgr.fetch_energy_usage(
+                [self.team.name, "slow", "broken"], "2012-01-01T00:00:00",
+                "2012-01-01T12:00:00",
+                time_budget=2)
+            self.assertEqual(results[self.team.name][0], 12, "The team usage is not correct.")
+            self.assertTrue(results[self.team.name][1] is not None,
+                            "The team fetch latency should be reported.")
+            self.assertEqual(results["slow"], (None, None),
+                             "The slow source should be skipped.")
+            self.assertEqual(results["broken"][0], None,
+                             "The broken source should not report a usage.")
+            self.assertTrue(results["broken"][1] is not None,
+                            "The broken source should be reported as failed, not skipped.")
+
+            resource_mgr.update_energy_usage()
+            usage = EnergyUsage.objects.get(team=self.team).usage
+            self.assertEqual(usage, 12, "The team usage should be updated.")
+        finally:
+            server.shutdown()
@@ -2,7 +2,8 @@
 from django.contrib import admin
 from apps.managers.challenge_mgr import challenge_mgr
 
-from apps.managers.score_mgr.models import ScoreSetting, ScoreboardEntry, PointsTransaction
+from apps.managers.score_mgr.models import ScoreSetting, ScoreboardEntry, PointsTransaction, \
+    TeamScoreboardEntry
 
 
 class PointsTransactionAdmin(admin.ModelAdmin):
@@ -19,6 +20,13 @@ class ScoreboardEntryAdmin(admin.ModelAdmin):
 admin.site.register(ScoreboardEntry, ScoreboardEntryAdmin)
 
 
+class TeamScoreboardEntryAdmin(admin.ModelAdmin):
+    """TeamScoreboardEntry administrator interface definition."""
+    list_display = ["round_name", "team", "points", "last_awarded_submission"]
+
+admin.site.register(TeamScoreboardEntry, TeamScoreboardEntryAdmin)
+
+
 class ScoreSettingAdmin(admin.ModelAdmin):
     """PointsTransaction administrator interface definition."""
     list_display = ["setup_points", "referral_bonus_points", "active_threshold_points",
@@ -30,3 +38,4 @@ admin.site.register(ScoreSetting, ScoreSettingAdmin)
 challenge_mgr.register_site_admin_model("Challenge", ScoreSetting)
 challenge_mgr.register_sys_admin_model("Logs", PointsTransaction)
 challenge_mgr.register_sys_admin_model("Logs", ScoreboardEntry)
+challenge_mgr.register_sys_admin_model("Logs", TeamScoreboardEntry)
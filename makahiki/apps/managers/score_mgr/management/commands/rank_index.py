@@ -0,0 +1,45 @@
+"""Invocation:  python manage.py rank_index <command> [<round_name>]
+
+Maintains the in-cache player rank index of the round (default to the current round).
+Possible commands are:
+
+  * rebuild : rebuild the rank index from the scoreboard entries.
+  * check : compare the ranks from the rank index against the ranks computed from the
+    scoreboard entries, and report any player whose ranks differ.
+
+There is no rank index when the cache is disabled or the round has too many entries, in which
+case the ranks are computed from the scoreboard entries directly.
+
+"""
+
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+from apps.managers.score_mgr import score_mgr
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    help = "Maintain the player rank index. Supported commands are : \n" \
+           "  rebuild [<round_name>]\n" \
+           "  check [<round_name>]\n"
+
+    def handle(self, *args, **options):
+        """rebuild or check the rank index."""
+
+        if len(args) == 0:
+            self.stdout.write(self.help)
+            return
+
+        operation = args[0]
+        round_name = args[1] if len(args) > 1 else None
+
+        if operation == "rebuild":
+            count = score_mgr.rebuild_rank_index(round_name)
+            self.stdout.write("rank index rebuilt with %d entries.\n" % count)
+        elif operation == "check":
+            mismatches = score_mgr.check_rank_index(round_name)
+            for profile, index_rank, sql_rank, index_team_rank, sql_team_rank in mismatches:
+                self.stdout.write("%s: rank %d (expected %d), team rank %d (expected %d)\n" % (
+                    profile, index_rank, sql_rank, index_team_rank, sql_team_rank))
+            self.stdout.write("%d inconsistent entries found.\n" % len(mismatches))
+        else:
+            self.stdout.write("Invalid command. see help for supported commands.\n")
@@ -0,0 +1,27 @@
+"""Invocation:  python manage.py reconcile_scoreboard [<round_name>]
+
+Recomputes the player scoreboard entries of the round (default to the current round) from the
+points transactions, and corrects any entry that differs. The team scoreboard and the rank
+index of the round are rebuilt afterwards."""
+
+from django.core.management.base import CommandError
+from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+from apps.managers.score_mgr import score_mgr
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    help = "Reconcile the scoreboard from the points transactions. Usage: \n" \
+           "  reconcile_scoreboard [<round_name>]\n"
+
+    def handle(self, *args, **options):
+        """reconcile the scoreboard of the round."""
+        round_name = args[0] if len(args) > 0 else challenge_mgr.get_round_name()
+        if not round_name:
+            raise CommandError("There is no current round, specify the round to reconcile.")
+        if not round_name in challenge_mgr.get_all_round_info()["rounds"]:
+            raise CommandError("%s is not a round of the challenge." % round_name)
+
+        count = score_mgr.reconcile_scoreboard(round_name)
+        self.stdout.write("%d scoreboard entries corrected.\n" % count)
@@ -63,6 +63,29 @@ class ScoreboardEntry(models.Model):
     class Meta:
         """meta"""
         unique_together = (("profile", "round_name",),)
+        # the rank queries use the (round_name, points, last_awarded_submission) index,
+        # created by the migration 0006.
+        ordering = ("round_name",)
+
+
+class TeamScoreboardEntry(models.Model):
+    """Defines the model that tracks team scores. It is the materialized aggregate of the
+    ScoreboardEntry of the team members, maintained by score_mgr."""
+
+    team = models.ForeignKey("team_mgr.Team", editable=False)
+    round_name = models.CharField(
+        max_length="30", editable=False,
+        help_text="The name of the round")
+    points = models.IntegerField(
+        default=0, editable=False, db_index=True,
+        help_text="Points for this round")
+    last_awarded_submission = models.DateTimeField(
+        null=True, blank=True, editable=False,
+        help_text="Last award time of the team members")
+
+    class Meta:
+        """meta"""
+        unique_together = (("team", "round_name",),)
         ordering = ("round_name",)
 
 
@@ -1,11 +1,17 @@
 """The manager for defining and managing scores."""
+import bisect
+import calendar
 import datetime
+import time
 
-from django.db.models import Q
+from django.db.models import Q, F
 from django.core.exceptions import ObjectDoesNotExist
 from django.db.models.aggregates import Sum, Max
+from django.db.models.signals import pre_delete
+from django.template.defaultfilters import slugify
 from apps.managers.challenge_mgr import challenge_mgr
-from apps.managers.score_mgr.models import ScoreboardEntry, PointsTransaction, ScoreSetting
+from apps.managers.score_mgr.models import ScoreboardEntry, PointsTransaction, ScoreSetting, \
+    TeamScoreboardEntry
 from apps.managers.cache_mgr import cache_mgr
 
 
@@ -69,6 +75,51 @@ def player_rank(profile, round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
+    index = _get_rank_index(round_name)
+    if index is None:
+        return player_rank_sql(profile, round_name)
+    return _index_rank(index["entries"], index["keys"].get(profile.pk))
+
+
+def player_rank_in_team(profile, round_name=None):
+    """Returns user's rank in his team."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    index = _get_rank_index(round_name)
+    if index is not None and profile.pk in index["keys"] and \
+            index["profile_teams"][profile.pk] != profile.team_id:
+        # the player changed team since the index was built.
+        _invalidate_rank_index(round_name)
+        index = None
+
+    if index is None:
+        return player_rank_in_team_sql(profile, round_name)
+    return _index_rank(index["teams"].get(profile.team_id, []), index["keys"].get(profile.pk))
+
+
+def player_rank_sql(profile, round_name=None):
+    """Returns the user round overall rank computed directly from the ScoreboardEntry table.
+    Used to check the consistency of the rank index."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    return _sql_rank(ScoreboardEntry.objects.filter(round_name=round_name), profile, round_name)
+
+
+def player_rank_in_team_sql(profile, round_name=None):
+    """Returns the user's rank in his team computed directly from the ScoreboardEntry table.
+    Used to check the consistency of the rank index."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    return _sql_rank(ScoreboardEntry.objects.filter(round_name=round_name,
+                                                    profile__team=profile.team),
+                     profile, round_name)
+
+
+def _sql_rank(entries, profile, round_name):
+    """Returns the rank of the profile among the entries, using aggregate queries."""
     entry = None
     try:
         entry = ScoreboardEntry.objects.get(profile=profile, round_name=round_name)
@@ -77,11 +128,10 @@ def player_rank(profile, round_name=None):
 
     # Check if the user has done anything.
     if entry and entry.last_awarded_submission:
-        return ScoreboardEntry.objects.filter(
+        return entries.filter(
             Q(points__gt=entry.points) |
             Q(points=entry.points,
               last_awarded_submission__gt=entry.last_awarded_submission),
-            round_name=round_name,
             ).count() + 1
 
     if entry:
@@ -90,43 +140,259 @@ def player_rank(profile, round_name=None):
         points = 0
 
     # Users who have not done anything yet are assumed to be last.
-    return ScoreboardEntry.objects.filter(
-        points__gt=points,
-        round_name=round_name,
-        ).count() + 1
+    return entries.filter(points__gt=points).count() + 1
 
 
-def player_rank_in_team(profile, round_name=None):
-    """Returns user's rank in his team."""
+def rebuild_rank_index(round_name=None):
+    """Rebuilds the rank index of the round from the ScoreboardEntry table.
+    Returns the number of entries in the index, or 0 if the ranks of the round are computed
+    with the SQL queries."""
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    team = profile.team
-    entry = None
+    if cache_mgr.is_dummy():
+        return 0
+
+    _invalidate_rank_index(round_name)
+    cached = _rebuild_rank_index(round_name)
+    if cached is None or cached[1] is None:
+        return 0
+    return len(cached[1]["entries"])
+
+
+def check_rank_index(round_name=None):
+    """Compares the ranks from the rank index against the ranks computed from the
+    ScoreboardEntry table. Returns a list of (profile, index_rank, sql_rank, index_team_rank,
+    sql_team_rank) tuples for the profiles whose ranks differ."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    if _get_rank_index(round_name) is None:
+        # the ranks are computed with the SQL queries.
+        return []
+
+    mismatches = []
+    entries = ScoreboardEntry.objects.filter(round_name=round_name).select_related("profile")
+    for entry in entries:
+        profile = entry.profile
+        ranks = (player_rank(profile, round_name),
+                 player_rank_sql(profile, round_name),
+                 player_rank_in_team(profile, round_name),
+                 player_rank_in_team_sql(profile, round_name))
+        if ranks[0] != ranks[1] or ranks[2] != ranks[3]:
+            mismatches.append((profile,) + ranks)
+    return mismatches
+
+
+_NO_SUBMISSION = float("inf")
+"""the submission component of the rank key for entries without an awarded submission."""
+
+RANK_INDEX_TIMEOUT = 3600
+"""Seconds the rank index of a round is kept in the cache."""
+
+RANK_INDEX_MAX_ENTRIES = 10000
+"""The maximum number of entries in the rank index of a round, which keeps the pickled index
+well within the 1MB value limit of memcached. Larger rounds are ranked with the SQL queries."""
+
+RANK_INDEX_LOCK_TIMEOUT = 10
+"""Seconds after which the lock of a rank index expires, in case its holder died."""
+
+_local_rank_indexes = {}
+"""private variable to store the (version, index) of each round last read by this process."""
+
+
+def _rank_index_cache_key(round_name):
+    """Returns the cache key of the rank index of the round."""
+    return "scoreboard_rank_index-%s" % slugify(round_name)
+
+
+def _rank_index_version_key(round_name):
+    """Returns the cache key of the version of the rank index of the round."""
+    return "scoreboard_rank_index_version-%s" % slugify(round_name)
+
+
+def _rank_index_lock_key(round_name):
+    """Returns the cache key of the lock of the rank index of the round."""
+    return "scoreboard_rank_index_lock-%s" % slugify(round_name)
+
+
+def _rank_key(profile_id, points, last_awarded_submission):
+    """Returns the sort key of a scoreboard entry in the rank index.
+    The key sorts by points descending, then by last awarded submission descending.
+    Entries without a submission are sorted after the others with the same points."""
+    if last_awarded_submission:
+        submission = -(calendar.timegm(last_awarded_submission.timetuple()) +
+                       last_awarded_submission.microsecond / 1000000.0)
+    else:
+        submission = _NO_SUBMISSION
+    return (-points, submission, profile_id)
+
+
+def _build_rank_index(round_name):
+    """Builds the rank index of the round from the ScoreboardEntry table in one query.
+    The index is a dictionary containing:
+      entries: the sorted rank keys of all entries in the round.
+      teams: the sorted rank keys of the entries of each team, keyed by team id.
+      keys: the rank key of each profile, keyed by profile id.
+      profile_teams: the team id of each profile, keyed by profile id."""
+    index = {"entries": [], "teams": {}, "keys": {}, "profile_teams": {}}
+    entries = ScoreboardEntry.objects.filter(round_name=round_name).values_list(
+        "profile", "profile__team", "points", "last_awarded_submission")
+    for profile_id, team_id, points, last in entries:
+        key = _rank_key(profile_id, points, last)
+        index["entries"].append(key)
+        index["teams"].setdefault(team_id, []).append(key)
+        index["keys"][profile_id] = key
+        index["profile_teams"][profile_id] = team_id
+
+    index["entries"].sort()
+    for keys in index["teams"].values():
+        keys.sort()
+    return index
+
+
+def _get_rank_index(round_name):
+    """Returns the rank index of the round, or None if the ranks must be computed with the
+    SQL queries: when the cache is disabled, when the round has more than
+    RANK_INDEX_MAX_ENTRIES entries, or while another process holds the lock of the index.
+    The cached index is stored with the version of the index it was built for, and is only
+    valid while the version is current. The index is read from the cache only when the
+    version has changed since this process last read it, otherwise a lookup only reads the
+    version."""
+    if cache_mgr.is_dummy():
+        return None
+
+    version = cache_mgr.get_cache(_rank_index_version_key(round_name))
+    cached = _local_rank_indexes.get(round_name)
+    if version is None or cached is None or cached[0] != version:
+        cached = cache_mgr.get_cache(_rank_index_cache_key(round_name))
+        if version is None or cached is None or cached[0] != version:
+            cached = _rebuild_rank_index(round_name)
+            if cached is None:
+                return None
+        _local_rank_indexes[round_name] = cached
+    return cached[1]
+
+
+def _rebuild_rank_index(round_name):
+    """Builds the rank index of the round and stores it in the cache for the current version.
+    Returns the (version, index) tuple, where the index is None if the round has too many
+    entries, or None if another process holds the lock of the index."""
+    if not _lock_rank_index(round_name):
+        return None
+
     try:
-        entry = ScoreboardEntry.objects.get(profile=profile, round_name=round_name)
-    except ObjectDoesNotExist:
+        version_key = _rank_index_version_key(round_name)
+        version = cache_mgr.get_cache(version_key)
+        if version is None:
+            # start from the current time, so that an evicted version is never reused.
+            cache_mgr.add_cache(version_key, int(time.time() * 1000), RANK_INDEX_TIMEOUT * 24)
+            version = cache_mgr.get_cache(version_key)
+
+        index = _build_rank_index(round_name)
+        if len(index["entries"]) > RANK_INDEX_MAX_ENTRIES:
+            index = None
+        cache_mgr.set_cache(_rank_index_cache_key(round_name), (version, index),
+                            RANK_INDEX_TIMEOUT)
+        return version, index
+    finally:
+        _unlock_rank_index(round_name)
+
+
+def _change_rank_index(round_name, change):
+    """Applies the change function to the cached rank index of the round, under the lock of
+    the index, and stores it for the next version. If the lock is held by another process,
+    the index is invalidated instead, so that no change is lost."""
+    if cache_mgr.is_dummy():
+        return
+
+    if not _lock_rank_index(round_name):
+        _invalidate_rank_index(round_name)
+        return
+
+    try:
+        version = cache_mgr.get_cache(_rank_index_version_key(round_name))
+        cached = cache_mgr.get_cache(_rank_index_cache_key(round_name))
+        if version is None or cached is None or cached[0] != version or cached[1] is None:
+            # the index is rebuilt on its next lookup.
+            return
+
+        index = cached[1]
+        change(index)
+        cache_mgr.set_cache(_rank_index_cache_key(round_name), (version + 1, index),
+                            RANK_INDEX_TIMEOUT)
+        # an invalidation since the version was read moves the version past version + 1,
+        # which leaves the stored index stale.
+        _invalidate_rank_index(round_name)
+    finally:
+        _unlock_rank_index(round_name)
+
+
+def _invalidate_rank_index(round_name):
+    """Makes the cached rank index of the round stale, by moving to its next version."""
+    try:
+        cache_mgr.incr(_rank_index_version_key(round_name))
+    except ValueError:
+        # there is no version, hence no valid index.
         pass
 
-    if entry and entry.last_awarded_submission:
-        return ScoreboardEntry.objects.filter(
-            Q(points__gt=entry.points) |
-            Q(points=entry.points,
-              last_awarded_submission__gt=entry.last_awarded_submission),
-            profile__team=team,
-            round_name=round_name,
-            ).count() + 1
 
-    if entry:
-        points = entry.points
-    else:
-        points = 0
+def _lock_rank_index(round_name):
+    """Acquires the lock of the rank index of the round. Returns False if it is held."""
+    return cache_mgr.add_cache(_rank_index_lock_key(round_name), True, RANK_INDEX_LOCK_TIMEOUT)
+
 
-    return ScoreboardEntry.objects.filter(
-        points__gt=points,
-        profile__team=team,
-        round_name=round_name,
-        ).count() + 1
+def _unlock_rank_index(round_name):
+    """Releases the lock of the rank index of the round."""
+    cache_mgr.delete(_rank_index_lock_key(round_name))
+
+
+def _index_rank(keys, key):
+    """Returns the 1-based rank of the key in the sorted keys. A missing key is ranked after
+    everyone with more than zero points."""
+    if key and key[1] != _NO_SUBMISSION:
+        # count the entries with more points, or the same points but a later submission.
+        return bisect.bisect_left(keys, key[:2]) + 1
+
+    # Users who have not done anything yet are assumed to be last.
+    points = key[0] if key else 0
+    return bisect.bisect_left(keys, (points, -_NO_SUBMISSION)) + 1
+
+
+def _index_insert(index, profile_id, team_id, key):
+    """Inserts the key of the profile into the rank index."""
+    bisect.insort(index["entries"], key)
+    bisect.insort(index["teams"].setdefault(team_id, []), key)
+    index["keys"][profile_id] = key
+    index["profile_teams"][profile_id] = team_id
+
+
+def _index_remove(index, profile_id):
+    """Removes the key of the profile from the rank index, if it exists."""
+    key = index["keys"].pop(profile_id, None)
+    team_id = index["profile_teams"].pop(profile_id, None)
+    if key:
+        _remove_sorted(index["entries"], key)
+        _remove_sorted(index["teams"].get(team_id, []), key)
+
+
+def _remove_sorted(keys, key):
+    """Removes the key from the sorted list of keys, if it exists."""
+    position = bisect.bisect_left(keys, key)
+    if position < len(keys) and keys[position] == key:
+        del keys[position]
+
+
+def _update_rank_index(profile, entry):
+    """Updates the cached rank index for the changed scoreboard entry of the profile.
+    The index is built on its next lookup if it is not cached."""
+    def change(index):
+        """move the entry of the profile to its new key."""
+        _index_remove(index, profile.pk)
+        _index_insert(index, profile.pk, profile.team_id,
+                      _rank_key(profile.pk, entry.points, entry.last_awarded_submission))
+
+    _change_rank_index(entry.round_name, change)
 
 
 def player_points(profile, round_name=None):
@@ -203,6 +469,72 @@ def player_add_points(profile, points, transaction_date, message, related_object
     cache_mgr.invalidate_template_cache("RIB", profile.user.username)
 
 
+def bulk_add_points(profiles, points, transaction_date, message, related_object=None):
+    """Adds the same amount of points to all the profiles, such as a team award. Uses a
+    constant number of queries for the transactions and scoreboard entries, instead of
+    several queries per profile in player_add_points. The points are expected to be positive.
+    Returns the number of profiles awarded."""
+    profiles = list(profiles)
+    if not profiles:
+        return 0
+
+    # Create the transactions first.
+    transactions = []
+    for profile in profiles:
+        transaction = PointsTransaction(
+            user_id=profile.user_id,
+            points=points,
+            transaction_date=transaction_date,
+            message=message,
+            )
+        if related_object:
+            transaction.related_object = related_object
+        transactions.append(transaction)
+    PointsTransaction.objects.bulk_create(transactions)
+
+    # update the scoreboard entries
+    round_name = challenge_mgr.get_round_name(transaction_date)
+    _bulk_update_scoreboard_entries(profiles, round_name, points, transaction_date)
+
+    # update the team scoreboard entries
+    team_counts = {}
+    for profile in profiles:
+        if profile.team_id:
+            team_counts[profile.team_id] = team_counts.get(profile.team_id, 0) + 1
+    for team_id, count in team_counts.items():
+        _update_team_scoreboard_entry(team_id, round_name, points * count, transaction_date)
+
+    _bulk_update_rank_index(profiles, round_name, points, transaction_date)
+    _standings_changed()
+
+    # Invalidate info bar cache.
+    cache_mgr.invalidate_template_caches("RIB",
+                                         [(profile.user.username,) for profile in profiles])
+
+    for profile in profiles:
+        if profile.referring_user_id and not profile.referrer_awarded:
+            profile._award_possible_referral_bonus()
+
+    return len(profiles)
+
+
+def _bulk_update_scoreboard_entries(profiles, round_name, points, transaction_date):
+    """Adds the points to the ScoreboardEntry of the profiles in the round, creating the
+    missing entries."""
+    profile_ids = [profile.pk for profile in profiles]
+    existing_ids = set(ScoreboardEntry.objects.filter(
+        profile__in=profile_ids, round_name=round_name).values_list("profile", flat=True))
+    ScoreboardEntry.objects.bulk_create([
+        ScoreboardEntry(profile_id=profile_id, round_name=round_name)
+        for profile_id in profile_ids if profile_id not in existing_ids])
+
+    entries = ScoreboardEntry.objects.filter(profile__in=profile_ids, round_name=round_name)
+    entries.update(points=F("points") + points)
+    entries.filter(Q(last_awarded_submission__isnull=True) |
+                   Q(last_awarded_submission__lt=transaction_date)).update(
+        last_awarded_submission=transaction_date)
+
+
 def player_remove_points(profile, points, transaction_date, message, related_object=None):
     """Removes points from the user.
     If the submission date is the same as the last_awarded_submission
@@ -252,20 +584,28 @@ def _update_scoreboard_entry(profile, points, transaction_date):
 
 
 def _update_round_scoreboard_entry(profile, round_name, points, transaction_date):
-    """update the round scoreboard entry for the transaction."""
-    entry, _ = ScoreboardEntry.objects.get_or_create(profile=profile, round_name=round_name)
-    entry.points += points
+    """update the round scoreboard entry for the transaction. The points and the
+    last_awarded_submission are updated in the database with conditional updates, so that
+    concurrent transactions of the same player do not overwrite each other."""
+    ScoreboardEntry.objects.get_or_create(profile=profile, round_name=round_name)
+    entries = ScoreboardEntry.objects.filter(profile=profile, round_name=round_name)
+    entries.update(points=F("points") + points)
 
     # update the last_awarded_submission
     if points > 0:
-        if not entry.last_awarded_submission or transaction_date > entry.last_awarded_submission:
-            entry.last_awarded_submission = transaction_date
+        entries.filter(Q(last_awarded_submission__isnull=True) |
+                       Q(last_awarded_submission__lt=transaction_date)).update(
+            last_awarded_submission=transaction_date)
     else:
-        if entry.last_awarded_submission == transaction_date:
-            # Need to find the previous update.
-            entry.last_awarded_submission = _last_submitted_before(profile.user, transaction_date)
+        # Need to find the previous update.
+        entries.filter(last_awarded_submission=transaction_date).update(
+            last_awarded_submission=_last_submitted_before(profile.user, transaction_date))
 
-    entry.save()
+    if profile.team_id:
+        _update_team_scoreboard_entry(profile.team_id, round_name, points, transaction_date)
+
+    _update_rank_index(profile, entries.get())
+    _standings_changed()
 
 
 def _last_submitted_before(user, transaction_date):
@@ -311,24 +651,22 @@ def team_rank(team, round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    aggregate = ScoreboardEntry.objects.filter(
-        profile__team=team,
-        round_name=round_name).aggregate(points=Sum("points"), last=Max("last_awarded_submission"))
-
-    points = aggregate["points"] or 0
-    last_awarded_submission = aggregate["last"]
-    # Group by teams, filter out other rounds, and annotate.
-    annotated_teams = ScoreboardEntry.objects.values("profile__team").filter(
-        round_name=round_name).annotate(team_points=Sum("points"),
-                                        last_awarded=Max("last_awarded_submission"))
+    points = 0
+    last_awarded_submission = None
+    entry = _team_scoreboard_entry(team, round_name)
+    if entry:
+        points = entry.points
+        last_awarded_submission = entry.last_awarded_submission
 
-    count = annotated_teams.filter(team_points__gt=points).count()
+    entries = TeamScoreboardEntry.objects.filter(round_name=round_name)
     # If there was a submission, tack that on to the count.
     if last_awarded_submission:
-        count = count + annotated_teams.filter(
-            team_points=points,
-            last_awarded_submission__gt=last_awarded_submission
-        ).count()
+        count = entries.filter(
+            Q(points__gt=points) |
+            Q(points=points, last_awarded_submission__gt=last_awarded_submission)
+            ).count()
+    else:
+        count = entries.filter(points__gt=points).count()
 
     return count + 1
 
@@ -338,9 +676,11 @@ def team_points(team, round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    dictionary = ScoreboardEntry.objects.filter(profile__team=team,
-                                                round_name=round_name).aggregate(Sum("points"))
-    return dictionary["points__sum"] or 0
+    entry = _team_scoreboard_entry(team, round_name)
+    if entry:
+        return entry.points
+    else:
+        return 0
 
 
 def team_points_leader(round_name=None):
@@ -348,11 +688,10 @@ def team_points_leader(round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    entry = ScoreboardEntry.objects.values("profile__team").filter(round_name=round_name).annotate(
-        points=Sum("points"),
-        last=Max("last_awarded_submission")).order_by("-points", "-last")
-    if entry:
-        return entry[0]["profile__team"]
+    entries = TeamScoreboardEntry.objects.filter(round_name=round_name).order_by(
+        "-points", "-last_awarded_submission").values_list("team", flat=True)[:1]
+    if entries:
+        return entries[0]
     else:
         return None
 
@@ -364,15 +703,13 @@ def team_points_leaders(num_results=None, round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    entries = ScoreboardEntry.objects.filter(
-        round_name=round_name, profile__team__isnull=False).values(
-        "profile__team__name").annotate(
-            points=Sum("points"),
-            last=Max("last_awarded_submission")).order_by("-points", "-last")
+    entries = TeamScoreboardEntry.objects.filter(round_name=round_name).order_by(
+        "-points", "-last_awarded_submission").values_list("team__name", "points")
+    if num_results:
+        entries = entries[:num_results]
+
     if entries:
-        if num_results:
-            entries = entries[:num_results]
-        return entries
+        return [{"profile__team__name": name, "points": points} for name, points in entries]
     else:
         return None
 
@@ -382,16 +719,208 @@ def team_points_leaders_in_group(group, num_results=None, round_name=None):
     if not round_name:
         round_name = challenge_mgr.get_round_name()
 
-    results = group.team_set.filter(
-        profile__scoreboardentry__round_name=round_name).annotate(
-        points=Sum("profile__scoreboardentry__points"),
-        last=Max("profile__scoreboardentry__last_awarded_submission")).order_by(
-        "-points", "-last")
+    entries = TeamScoreboardEntry.objects.filter(
+        team__group=group, round_name=round_name).select_related("team").order_by(
+        "-points", "-last_awarded_submission")
     if num_results:
-        results = results[:num_results]
+        entries = entries[:num_results]
+
+    results = []
+    for entry in entries:
+        team = entry.team
+        team.points = entry.points
+        team.last = entry.last_awarded_submission
+        results.append(team)
     return results
 
 
+def _team_scoreboard_entry(team, round_name):
+    """Returns the TeamScoreboardEntry of the team in the round, or None if not exist."""
+    try:
+        return TeamScoreboardEntry.objects.get(team=team, round_name=round_name)
+    except ObjectDoesNotExist:
+        return None
+
+
+def _update_team_scoreboard_entry(team_id, round_name, points, transaction_date):
+    """Update the team scoreboard entry for the transaction of a team member. Called after
+    the member's ScoreboardEntry is updated."""
+    TeamScoreboardEntry.objects.get_or_create(team_id=team_id, round_name=round_name)
+    entries = TeamScoreboardEntry.objects.filter(team=team_id, round_name=round_name)
+    entries.update(points=F("points") + points)
+
+    # update the last_awarded_submission
+    if points > 0:
+        entries.filter(Q(last_awarded_submission__isnull=True) |
+                       Q(last_awarded_submission__lt=transaction_date)).update(
+            last_awarded_submission=transaction_date)
+    else:
+        # Need to find the latest submission of the members.
+        entries.filter(last_awarded_submission=transaction_date).update(
+            last_awarded_submission=ScoreboardEntry.objects.filter(
+                profile__team=team_id, round_name=round_name).aggregate(
+                last=Max("last_awarded_submission"))["last"])
+
+
+def refresh_team_scoreboard_entry(team_id, round_name):
+    """Recomputes the team scoreboard entry of the round from the ScoreboardEntry of the
+    team members."""
+    aggregate = ScoreboardEntry.objects.filter(
+        profile__team=team_id,
+        round_name=round_name).aggregate(points=Sum("points"), last=Max("last_awarded_submission"))
+
+    entry, _ = TeamScoreboardEntry.objects.get_or_create(team_id=team_id, round_name=round_name)
+    entry.points = aggregate["points"] or 0
+    entry.last_awarded_submission = aggregate["last"]
+    entry.save()
+    _standings_changed()
+
+
+def rebuild_team_scoreboard(round_name=None):
+    """Rebuilds all the team scoreboard entries of the round from the ScoreboardEntry table.
+    Returns the number of team entries created."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    aggregates = ScoreboardEntry.objects.filter(
+        round_name=round_name, profile__team__isnull=False).values("profile__team").annotate(
+        points=Sum("points"), last=Max("last_awarded_submission"))
+
+    TeamScoreboardEntry.objects.filter(round_name=round_name).delete()
+    TeamScoreboardEntry.objects.bulk_create([
+        TeamScoreboardEntry(team_id=aggregate["profile__team"],
+                            round_name=round_name,
+                            points=aggregate["points"] or 0,
+                            last_awarded_submission=aggregate["last"])
+        for aggregate in aggregates])
+    _standings_changed()
+    return len(aggregates)
+
+
+def reconcile_scoreboard(round_name=None):
+    """Recomputes the ScoreboardEntry of every player in the round from the PointsTransaction
+    table, in one aggregate query over the transactions of the round. Corrects the entries
+    that differ, then rebuilds the team scoreboard and the rank index of the round.
+    Returns the number of entries corrected."""
+    if not round_name:
+        round_name = challenge_mgr.get_round_name()
+
+    totals = _round_transaction_totals(_round_transactions(round_name))
+    corrected = _correct_scoreboard_entries(round_name, totals)
+
+    rebuild_team_scoreboard(round_name)
+    rebuild_rank_index(round_name)
+    return corrected
+
+
+def _round_transactions(round_name):
+    """Returns the transactions that get_round_name attributes to the round. Raises ValueError
+    if the round is not a round of the challenge."""
+    rounds_info = challenge_mgr.get_all_round_info()
+    rounds = rounds_info["rounds"]
+    if not round_name in rounds:
+        raise ValueError("%s is not a round of the challenge." % round_name)
+
+    in_round = Q(transaction_date__gte=rounds[round_name]["start"],
+                 transaction_date__lt=rounds[round_name]["end"])
+    if round_name == list(rounds)[-1]:
+        # get_round_name attributes the transactions between the rounds and after the end of
+        # the competition to the last round it iterates.
+        outside = Q(transaction_date__gte=rounds_info["competition_start"])
+        for round_info in rounds.values():
+            outside &= ~Q(transaction_date__gte=round_info["start"],
+                          transaction_date__lt=round_info["end"])
+        in_round |= outside
+    return PointsTransaction.objects.filter(in_round)
+
+
+def _round_transaction_totals(transactions):
+    """Returns a dictionary of the (points, last awarded submission) of each profile id, summed
+    from the transactions. A removal is logged with the date of the award it cancels, so the
+    last awarded submission is the latest date with a positive sum of points."""
+    totals = {}
+    aggregates = transactions.values_list("user__profile", "transaction_date").annotate(
+        sum=Sum("points")).order_by()
+    for profile_id, transaction_date, points in aggregates:
+        total, last = totals.get(profile_id, (0, None))
+        if points > 0 and (not last or transaction_date > last):
+            last = transaction_date
+        totals[profile_id] = (total + points, last)
+    return totals
+
+
+def _correct_scoreboard_entries(round_name, totals):
+    """Updates the ScoreboardEntry of the round which differ from the totals, a dictionary of
+    the (points, last awarded submission) of each profile id, and creates the missing ones.
+    Returns the number of entries corrected."""
+    corrected = 0
+    entries = ScoreboardEntry.objects.filter(round_name=round_name)
+    for pk, profile_id, points, last in entries.values_list(
+        "pk", "profile", "points", "last_awarded_submission"):
+        total = totals.pop(profile_id, (0, None))
+        if total != (points, last):
+            ScoreboardEntry.objects.filter(pk=pk).update(
+                points=total[0], last_awarded_submission=total[1])
+            corrected += 1
+
+    ScoreboardEntry.objects.bulk_create([
+        ScoreboardEntry(profile_id=profile_id, round_name=round_name,
+                        points=total, last_awarded_submission=last)
+        for profile_id, (total, last) in totals.items()])
+    return corrected + len(totals)
+
+
+def player_change_team(profile, old_team_id):
+    """Moves the points of the player from the old team to the player's current team.
+    Called after the team of the profile is changed."""
+    for entry in profile.scoreboardentry_set.all():
+        for team_id in (old_team_id, profile.team_id):
+            if team_id:
+                refresh_team_scoreboard_entry(team_id, entry.round_name)
+        _update_rank_index(profile, entry)
+
+
+def _standings_changed():
+    """Invalidates the caches derived from the standings, such as the prize leaders, which
+    are kept in the "leaders" cache namespace, once the changes are committed."""
+    cache_mgr.invalidate_namespace_on_commit("leaders")
+
+
+def _bulk_update_rank_index(profiles, round_name, points, transaction_date):
+    """Updates the cached rank index for the profiles which are all awarded the same points
+    at the transaction date."""
+    def change(index):
+        """move the entries of the profiles to their new keys."""
+        for profile in profiles:
+            new_key = _rank_key(profile.pk, points, transaction_date)
+            key = index["keys"].get(profile.pk)
+            if key:
+                # keep the later of the submissions, which has the smaller key component.
+                new_key = (key[0] + new_key[0], min(key[1], new_key[1]), profile.pk)
+            _index_remove(index, profile.pk)
+            _index_insert(index, profile.pk, profile.team_id, new_key)
+
+    _change_rank_index(round_name, change)
+
+
+def _scoreboard_entry_deleted(sender, instance=None, **kwargs):
+    """Removes the points of the scoreboard entry being deleted from the team scoreboard and
+    the rank index."""
+    _ = sender
+    _ = kwargs
+    team_id = instance.profile.team_id
+    if team_id:
+        TeamScoreboardEntry.objects.filter(team=team_id, round_name=instance.round_name).update(
+            points=F("points") - instance.points)
+
+    _change_rank_index(instance.round_name,
+                       lambda index: _index_remove(index, instance.profile_id))
+    _standings_changed()
+
+
+pre_delete.connect(_scoreboard_entry_deleted, sender=ScoreboardEntry)
+
+
 def award_referral_bonus(instance, referrer):
     """award the referral bonus to both party."""
     points = referral_points()
@@ -3,11 +3,20 @@ test score_mgr
 """
 
 import datetime
+import threading
+from django.core.cache import get_cache
+from django.db import connection
 from django.test import TransactionTestCase
+from django.utils import unittest
 from django.contrib.auth.models import User
+from apps.managers.cache_mgr import cache_mgr
+from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.challenge_mgr.models import RoundSetting
 from apps.managers.score_mgr import score_mgr
+from apps.managers.player_mgr.models import Profile
 from apps.managers.team_mgr.models import Group, Team
-from apps.managers.score_mgr.models import ScoreboardEntry, PointsTransaction
+from apps.managers.score_mgr.models import ScoreboardEntry, PointsTransaction, \
+    TeamScoreboardEntry
 from apps.utils import test_utils
 
 
@@ -223,6 +232,293 @@ class ScoreboardEntryUnitTests(TransactionTestCase):
                          team_rank + 1,
                          "Check that the user's team rank has moved down.")
 
+    def testRankIndex(self):
+        """Tests that the rank index is consistent with the scoreboard entries, and that
+        incremental updates to the index match a rebuilt index."""
+        test_utils.create_teams(self)
+        for index, user in enumerate(self.users):
+            user.get_profile().add_points(10 * (index % 3), datetime.datetime.today(), "test")
+
+        for user in self.users:
+            profile = user.get_profile()
+            self.assertEqual(score_mgr.player_rank(profile, self.current_round),
+                             score_mgr.player_rank_sql(profile, self.current_round),
+                             "Check the index rank matches the SQL rank.")
+            self.assertEqual(score_mgr.player_rank_in_team(profile, self.current_round),
+                             score_mgr.player_rank_in_team_sql(profile, self.current_round),
+                             "Check the index team rank matches the SQL team rank.")
+        self.assertEqual(score_mgr.check_rank_index(self.current_round), [],
+                         "Check there is no inconsistent entry.")
+
+        rank_index = score_mgr._build_rank_index(self.current_round)
+        profile = self.users[0].get_profile()
+        profile.add_points(25, datetime.datetime.today(), "test index")
+        entry = ScoreboardEntry.objects.get(profile=profile, round_name=self.current_round)
+        score_mgr._index_remove(rank_index, profile.pk)
+        key = score_mgr._rank_key(profile.pk, entry.points, entry.last_awarded_submission)
+        score_mgr._index_insert(rank_index, profile.pk, profile.team_id, key)
+        self.assertEqual(rank_index, score_mgr._build_rank_index(self.current_round),
+                         "Check the updated index matches the rebuilt index.")
+        self.assertEqual(score_mgr.player_rank(profile, self.current_round), 1,
+                         "Check user is ranked #1 for the current round.")
+
+    def testCachedRankIndex(self):
+        """Tests that the cached rank index is updated under its lock, and invalidated when
+        the lock is held, so that no update is lost."""
+        test_utils.create_teams(self)
+        for index, user in enumerate(self.users):
+            user.get_profile().add_points(10 * (index % 3), datetime.datetime.today(), "test")
+
+        dummy_cache = cache_mgr.cache
+        cache_mgr.cache = get_cache("django.core.cache.backends.locmem.LocMemCache")
+        try:
+            profile = self.users[0].get_profile()
+            self.assertEqual(score_mgr.rebuild_rank_index(self.current_round),
+                             ScoreboardEntry.objects.filter(round_name=self.current_round).count(),
+                             "Check the index contains all the entries.")
+
+            profile.add_points(100, datetime.datetime.today(), "test index")
+            self.assertEqual(score_mgr.player_rank(profile, self.current_round), 1,
+                             "Check the update is applied to the cached index.")
+
+            # another process holds the lock, the update invalidates the index.
+            score_mgr._lock_rank_index(self.current_round)
+            profile = self.users[1].get_profile()
+            profile.add_points(200, datetime.datetime.today(), "test lock")
+            self.assertEqual(score_mgr._get_rank_index(self.current_round), None,
+                             "Check the index is not used while it is locked.")
+            self.assertEqual(score_mgr.player_rank(profile, self.current_round), 1,
+                             "Check the SQL rank is used while the index is locked.")
+
+            score_mgr._unlock_rank_index(self.current_round)
+            self.assertEqual(score_mgr.player_rank(profile, self.current_round), 1,
+                             "Check the rebuilt index contains the update.")
+            self.assertEqual(score_mgr.check_rank_index(self.current_round), [],
+                             "Check there is no inconsistent entry.")
+
+            max_entries = score_mgr.RANK_INDEX_MAX_ENTRIES
+            score_mgr.RANK_INDEX_MAX_ENTRIES = 1
+            try:
+                self.assertEqual(score_mgr.rebuild_rank_index(self.current_round), 0,
+                                 "Check there is no index for a large round.")
+                self.assertEqual(score_mgr.player_rank(profile, self.current_round), 1,
+                                 "Check the SQL rank is used for a large round.")
+            finally:
+                score_mgr.RANK_INDEX_MAX_ENTRIES = max_entries
+        finally:
+            cache_mgr.cache = dummy_cache
+            score_mgr._local_rank_indexes.clear()
+
+
+class TeamScoreboardEntryUnitTests(TransactionTestCase):
+    """team scoreboard test"""
+
+    def setUp(self):
+        """Generate test teams and users."""
+        self.current_round = "Round 1"
+        test_utils.set_competition_round()
+        test_utils.create_teams(self)
+
+    def testTeamScoreboardEntry(self):
+        """Tests that the team scoreboard entries follow the points of the team members."""
+        today = datetime.datetime.today()
+        profile = self.users[0].get_profile()
+        profile.add_points(10, today - datetime.timedelta(minutes=1), "test")
+        self.users[2].get_profile().add_points(5, today, "test")
+
+        entry = TeamScoreboardEntry.objects.get(team=profile.team,
+                                                round_name=self.current_round)
+        self.assertEqual(entry.points, 15, "Check the team has the points of both members.")
+        self.assertEqual(entry.last_awarded_submission, today,
+                         "Check the team has the latest submission of the members.")
+        self.assertEqual(score_mgr.team_points(profile.team, self.current_round), 15,
+                         "Check the team points.")
+        self.assertEqual(score_mgr.team_rank(profile.team, self.current_round), 1,
+                         "Check the team is ranked #1.")
+
+        self.users[2].get_profile().remove_points(5, today, "test remove")
+        entry = TeamScoreboardEntry.objects.get(team=profile.team,
+                                                round_name=self.current_round)
+        self.assertEqual(entry.points, 10, "Check the points are removed from the team.")
+        self.assertEqual(entry.last_awarded_submission, today - datetime.timedelta(minutes=1),
+                         "Check the last submission is rolled back.")
+
+    def testChangeTeam(self):
+        """Tests that the points of the player move with the player to the new team."""
+        profile = self.users[0].get_profile()
+        old_team = profile.team
+        profile.add_points(10, datetime.datetime.today(), "test")
+
+        profile.team = self.teams[1]
+        profile.save()
+
+        self.assertEqual(score_mgr.team_points(old_team, self.current_round), 0,
+                         "Check the points are removed from the old team.")
+        self.assertEqual(score_mgr.team_points(self.teams[1], self.current_round), 10,
+                         "Check the points are added to the new team.")
+        self.assertEqual(score_mgr.team_points_leader(self.current_round), self.teams[1].id,
+                         "Check the new team is the leader.")
+
+        TeamScoreboardEntry.objects.all().delete()
+        self.assertEqual(score_mgr.rebuild_team_scoreboard(self.current_round), 1,
+                         "Check the team scoreboard is rebuilt.")
+        self.assertEqual(score_mgr.team_points(self.teams[1], self.current_round), 10,
+                         "Check the rebuilt points of the team.")
+
+    def testBulkAddPoints(self):
+        """Tests that bulk awarding points matches awarding the points one by one."""
+        today = datetime.datetime.today()
+        profile = self.users[0].get_profile()
+        profile.add_points(10, today - datetime.timedelta(days=1), "test")
+
+        team = self.teams[0]
+        count = score_mgr.bulk_add_points(team.profile_set.select_related("user"), 5, today,
+                                          "team award")
+        self.assertEqual(count, 2, "Check both team members are awarded.")
+        self.assertEqual(PointsTransaction.objects.filter(message="team award").count(), 2,
+                         "Check a transaction is created for each member.")
+
+        self.assertEqual(score_mgr.player_points(profile, self.current_round), 15,
+                         "Check the points are added to the existing entry.")
+        self.assertEqual(score_mgr.player_points(self.users[2].get_profile(),
+                                                 self.current_round), 5,
+                         "Check an entry is created for the member without points.")
+        self.assertEqual(profile.last_awarded_submission(), today,
+                         "Check the last awarded submission is updated.")
+        self.assertEqual(score_mgr.team_points(team, self.current_round), 20,
+                         "Check the team points include the award.")
+        self.assertEqual(score_mgr.check_rank_index(self.current_round), [],
+                         "Check there is no inconsistent entry.")
+
+    @unittest.skipIf(connection.vendor == "sqlite",
+                     "The in-memory test database is not shared between the threads.")
+    def testConcurrentAddPoints(self):
+        """Tests that no points are lost when the team members are awarded points from
+        several threads at the same time."""
+        today = datetime.datetime.today()
+        team = self.teams[0]
+        profile_ids = [profile.pk for profile in team.profile_set.all()]
+        thread_count = 8
+        awards = 10
+
+        def award(thread):
+            """award the points to the team members."""
+            try:
+                for count in range(awards):
+                    for profile in Profile.objects.filter(pk__in=profile_ids):
+                        minutes = thread * awards + count
+                        profile.add_points(1, today - datetime.timedelta(minutes=minutes),
+                                           "stress test")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=award, args=(thread,))
+                   for thread in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        for profile in Profile.objects.filter(pk__in=profile_ids):
+            self.assertEqual(score_mgr.player_points(profile, self.current_round),
+                             thread_count * awards, "Check no points of the player are lost.")
+            self.assertEqual(profile.last_awarded_submission(), today,
+                             "Check the last awarded submission is the latest award.")
+        self.assertEqual(score_mgr.team_points(team, self.current_round),
+                         thread_count * awards * len(profile_ids),
+                         "Check no points of the team are lost.")
+        self.assertEqual(score_mgr.reconcile_scoreboard(self.current_round), 0,
+                         "Check the scoreboard matches the points transactions.")
+
+    @unittest.skipIf(connection.vendor == "sqlite",
+                     "The in-memory test database is not shared between the threads.")
+    def testConcurrentFirstAward(self):
+        """Tests that the concurrent first awards of a player in a round create a single
+        scoreboard entry holding all the points."""
+        today = datetime.datetime.today()
+        profile_id = self.users[2].get_profile().pk
+        ScoreboardEntry.objects.filter(profile=profile_id).delete()
+        thread_count = 8
+        start = threading.Event()
+
+        def award(thread):
+            """award the points to the player once all the threads are started."""
+            try:
+                profile = Profile.objects.get(pk=profile_id)
+                start.wait()
+                profile.add_points(1, today - datetime.timedelta(minutes=thread),
+                                   "lock test")
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=award, args=(thread,))
+                   for thread in range(thread_count)]
+        for thread in threads:
+            thread.start()
+        start.set()
+        for thread in threads:
+            thread.join()
+
+        entries = ScoreboardEntry.objects.filter(profile=profile_id,
+                                                 round_name=self.current_round)
+        self.assertEqual(entries.count(), 1, "Check a single entry is created.")
+        self.assertEqual(entries.get().points, thread_count,
+                         "Check no points of the concurrent awards are lost.")
+        self.assertEqual(entries.get().last_awarded_submission, today,
+                         "Check the last awarded submission is the latest award.")
+
+    def testReconcileScoreboard(self):
+        """Tests that the scoreboard is recomputed from the points transactions."""
+        today = datetime.datetime.today()
+        profile = self.users[0].get_profile()
+        profile.add_points(10, today - datetime.timedelta(minutes=1), "test")
+        profile.add_points(5, today, "test")
+        profile.remove_points(5, today, "test remove")
+
+        ScoreboardEntry.objects.filter(profile=profile).update(points=100,
+                                                               last_awarded_submission=None)
+        PointsTransaction.objects.create(user=self.users[2], points=7, transaction_date=today,
+                                         message="no entry")
+
+        self.assertEqual(score_mgr.reconcile_scoreboard(self.current_round), 2,
+                         "Check the changed entry and the missing entry are corrected.")
+        entry = ScoreboardEntry.objects.get(profile=profile, round_name=self.current_round)
+        self.assertEqual(entry.points, 10, "Check the points are recomputed.")
+        self.assertEqual(entry.last_awarded_submission, today - datetime.timedelta(minutes=1),
+                         "Check the removed award is not the last awarded submission.")
+        self.assertEqual(score_mgr.player_points(self.users[2].get_profile(),
+                                                 self.current_round), 7,
+                         "Check the missing entry is created.")
+        self.assertEqual(score_mgr.team_points(self.teams[0], self.current_round), 17,
+                         "Check the team scoreboard is rebuilt.")
+        self.assertEqual(score_mgr.check_rank_index(self.current_round), [],
+                         "Check there is no inconsistent entry.")
+
+    def testReconcileRoundGap(self):
+        """Tests that the transactions between the rounds are reconciled in the round they
+        are attributed to."""
+        today = datetime.datetime.today()
+        end = today + datetime.timedelta(days=1)
+        RoundSetting.objects.all().delete()
+        RoundSetting.objects.create(name="Round 1", start=today - datetime.timedelta(days=1),
+                                    end=end)
+        RoundSetting.objects.create(name="Round 2", start=end + datetime.timedelta(days=1),
+                                    end=end + datetime.timedelta(days=7))
+        challenge_mgr.init()
+
+        gap = end + datetime.timedelta(hours=12)
+        profile = self.users[0].get_profile()
+        profile.add_points(10, today, "test")
+        profile.add_points(5, gap, "test gap")
+
+        for round_name in ("Round 1", "Round 2"):
+            self.assertEqual(score_mgr.reconcile_scoreboard(round_name), 0,
+                             "Check the scoreboard of %s matches the transactions." % round_name)
+        self.assertEqual(sum(score_mgr.player_points(profile, round_name)
+                             for round_name in ("Round 1", "Round 2")), 15,
+                         "Check the points of the transaction in the gap are kept.")
+        self.assertRaises(ValueError, score_mgr.reconcile_scoreboard, "Unknown Round")
+
 
 class PointsLogTest(TransactionTestCase):
     """test points log"""
@@ -106,3 +106,8 @@ class CanopyPost(models.Model):
     def date_string(self):
         """Formats the created date into a pretty string."""
         return self.created_at.strftime("%m/%d %I:%M %p")
+
+
+# importing team_mgr connects the signals maintaining the cached team feeds.
+from apps.managers.team_mgr import team_mgr
+_ = team_mgr
@@ -1,9 +1,15 @@
 """The manager for managing team."""
 import datetime
 from django.db.models.aggregates import Count
+from django.db.models.signals import post_save, post_delete
+from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr import challenge_mgr
 from apps.managers.score_mgr import score_mgr
-from apps.managers.team_mgr.models import Team
+from apps.managers.team_mgr.models import Team, Post
+
+
+TEAM_FEED_HEAD_SIZE = 20
+"""Number of the latest posts of each team feed kept in the cache."""
 
 
 def team_members(team):
@@ -75,21 +81,82 @@ def team_active_participation(num_results=None, round_name=None):
 
 def award_member_points(team, points, reason):
     """Award points to the members of the team."""
-    count = 0
-    for profile in team.profile_set.all():
-        if profile.setup_complete:
-            today = datetime.datetime.today()
-            # Hack to get around executing this script at midnight.  We want to award
-            # points earlier to ensure they are within the round they were completed.
-            if today.hour == 0:
-                today = today - datetime.timedelta(hours=1)
-
-            date = "%d/%d/%d" % (today.month, today.day, today.year)
-            profile.add_points(points, today, "%s for %s" % (reason, date))
-            profile.save()
-            count += 1
+    today = datetime.datetime.today()
+    # Hack to get around executing this script at midnight.  We want to award
+    # points earlier to ensure they are within the round they were completed.
+    if today.hour == 0:
+        today = today - datetime.timedelta(hours=1)
+
+    date = "%d/%d/%d" % (today.month, today.day, today.year)
+    profiles = team.profile_set.filter(setup_complete=True).select_related("user")
+    count = score_mgr.bulk_add_points(profiles, points, today, "%s for %s" % (reason, date))
     print '%d users in %s are awarded %s points for %s.' % (
         count,
         team,
         points,
         reason)
+
+
+def get_team_posts(team, style_class, num_results, last_post=None):
+    """Returns the posts of the team feed of style_class, newest first, up to num_results.
+    If last_post is given, only the posts older than the last_post id are returned. The
+    latest posts are served from the cached head of the feed, which is versioned by the
+    generation of the feed and invalidated on Post save. Returns [] if team is None."""
+    if team is None:
+        return []
+
+    if last_post is None and num_results <= TEAM_FEED_HEAD_SIZE:
+        # read the generation before the query, so that a head built from a stale query is
+        # stored under the stale generation.
+        key = _team_feed_key(team.id, style_class)
+        head = cache_mgr.get_cache(key)
+        if head is None:
+            head = list(_team_feed(team, style_class)[:TEAM_FEED_HEAD_SIZE])
+            cache_mgr.set_cache(key, head, 1800)
+        return head[:num_results]
+
+    posts = _team_feed(team, style_class)
+    if last_post is not None:
+        posts = posts.filter(id__lt=last_post)
+    return list(posts[:num_results])
+
+
+def _team_feed(team, style_class):
+    """Returns the queryset of the team feed, newest first."""
+    return Post.objects.filter(team=team, style_class=style_class).select_related(
+        'user__profile').order_by("-id")
+
+
+def _team_feed_namespace(team_id, style_class):
+    """Returns the cache namespace of the team feed."""
+    return "team_posts-%d-%s" % (team_id, style_class)
+
+
+def _team_feed_key(team_id, style_class):
+    """Returns the cache key of the head of the team feed in its current generation."""
+    namespace = _team_feed_namespace(team_id, style_class)
+    return "%s-%s" % (namespace, cache_mgr.namespace_generation(namespace))
+
+
+def _invalidate_team_feed(team_id, style_class):
+    """Invalidates the cached head of the team feed, by moving to a new generation."""
+    if team_id is not None:
+        cache_mgr.invalidate_namespace(_team_feed_namespace(team_id, style_class))
+
+
+def _post_saved(sender, instance, **kwargs):
+    """Invalidates the cached head of the team feed of the saved post."""
+    _ = sender
+    _ = kwargs
+    _invalidate_team_feed(instance.team_id, instance.style_class)
+
+
+def _post_deleted(sender, instance, **kwargs):
+    """Invalidates the cached head of the team feed of the deleted post."""
+    _ = sender
+    _ = kwargs
+    _invalidate_team_feed(instance.team_id, instance.style_class)
+
+
+post_save.connect(_post_saved, sender=Post)
+post_delete.connect(_post_deleted, sender=Post)
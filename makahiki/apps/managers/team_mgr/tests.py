@@ -7,7 +7,7 @@ from django.test import TransactionTestCase
 from django.contrib.auth.models import User
 from apps.managers.team_mgr import team_mgr
 
-from apps.managers.team_mgr.models import Group, Team
+from apps.managers.team_mgr.models import Group, Team, Post
 from apps.utils import test_utils
 
 
@@ -457,3 +457,26 @@ class TeamsUnitTestCase(TransactionTestCase):
         self.assertEqual(self.test_team.rank(),
                          2,
                          "Check that the team is ranked second.")
+
+    def testTeamPosts(self):
+        """Check that the team feed is paginated by the post id."""
+        user = User(username="test_user", password="test_password")
+        user.save()
+        for i in range(0, 5):
+            Post(user=user, team=self.test_team, text="Post %d" % i).save()
+
+        posts = team_mgr.get_team_posts(self.test_team, "user_post", 3)
+        self.assertEqual([post.text for post in posts], ["Post 4", "Post 3", "Post 2"],
+                         "Check that the latest posts are returned first.")
+        posts = team_mgr.get_team_posts(self.test_team, "user_post", 3,
+                                        last_post=posts[-1].id)
+        self.assertEqual([post.text for post in posts], ["Post 1", "Post 0"],
+                         "Check that the older posts are returned.")
+
+        Post(user=user, team=self.test_team, text="Post 5").save()
+        posts = team_mgr.get_team_posts(self.test_team, "user_post", 3)
+        self.assertEqual(posts[0].text, "Post 5", "Check that the new post is at the head.")
+        self.assertEqual(len(team_mgr.get_team_posts(self.test_team, "system_post", 3)), 0,
+                         "Check that the system feed is empty.")
+        self.assertEqual(team_mgr.get_team_posts(None, "user_post", 3), [],
+                         "Check that a user without a team has an empty feed.")
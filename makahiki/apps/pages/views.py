@@ -2,9 +2,9 @@
 main views module to render pages.
 """
 #import datetime
+from django.conf import settings
 from django.shortcuts import render_to_response
 from django.template import RequestContext
-from django.utils import importlib
 from django.views.decorators.cache import never_cache
 from django.http import HttpResponseRedirect, HttpResponseForbidden, Http404
 from django.core.urlresolvers import reverse
@@ -32,7 +32,7 @@ def index(request):
     """
     page_name = request.path[1:][:-1]
 
-    view_objects = {}
+    view_objects = challenge_mgr.LazyViewObjects(request, page_name)
 
     if page_name != "home" and not challenge_mgr.is_page_unlock(request.user, page_name):
         return HttpResponseForbidden('<h1>Permission denied</h1>')
@@ -57,26 +57,40 @@ def index(request):
         }, context_instance=RequestContext(request))
     #time_end = datetime.datetime.now()
     #print "%s time: %s" % ("render", (time_end - time_start))
+    challenge_mgr.log_supply_timings(page_name, view_objects.timings)
     return response
 
 
 def supply_view_objects(request, page_name, view_objects):
-    """ Returns view_objects supplied widgets defined in PageSetting. """
+    """ Adds the widgets defined in PageSetting to the view_objects, a LazyViewObjects which
+    supplies the view objects of a widget when the widget is rendered. The eager widgets are
+    supplied right away, before the request context is built.
+    If MAKAHIKI_PARALLEL_SUPPLY is set, the view objects of the concurrent widgets are supplied
+    concurrently instead, and the widgets which miss the time budget are replaced by a
+    placeholder. The supply time of each widget is kept in view_objects.timings."""
 
     widgets = challenge_mgr.get_enabled_widgets(page_name)
     if not widgets:
         return False
 
+    if settings.MAKAHIKI_PARALLEL_SUPPLY:
+        supplied, timings = challenge_mgr.supply_widgets(
+            request, page_name,
+            [widget for widget in widgets if challenge_mgr.is_concurrent_widget(widget)],
+            settings.MAKAHIKI_SUPPLY_TIME_BUDGET)
+        for widget, objects in supplied.items():
+            view_objects[widget.replace(".", "__")] = objects
+        view_objects.timings.update(timings)
+        view_objects['supply_timeouts'] = sorted(
+            widget for widget, elapsed in timings.items() if elapsed is None)
+
     view_objects['widget_templates'] = []
     for widget in widgets:
-        view_module_name = 'apps.widgets.' + widget + '.views'
-        page_views = importlib.import_module(view_module_name)
+        view_objects.add_widget(widget)
+        is_eager = challenge_mgr.is_eager_widget(widget)
         widget = widget.replace(".", "__")
-
-        #time_start = datetime.datetime.now()
-        view_objects[widget] = page_views.supply(request, page_name)
-        #time_end = datetime.datetime.now()
-        #print "%s time: %s" % (view_module_name, (time_end - time_start))
+        if is_eager:
+            _ = view_objects[widget]
 
         widget_template = "widgets/" + widget.replace(".", "/") + "/templates/index.html"
         view_objects['widget_templates'].append(widget_template)
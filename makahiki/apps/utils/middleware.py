@@ -0,0 +1,19 @@
+"""A middleware class to memoize the predicate evaluation results during a request."""
+
+from apps.utils import utils
+
+
+class PredicateMemoMiddleware(object):
+    """Memoizes the results of the predicates evaluated for the duration of a request, so that
+    the same unlock or award condition is evaluated only once per user per request."""
+
+    def process_request(self, request):
+        """Start memoizing the predicate results."""
+        _ = request
+        utils.enable_predicate_memo()
+
+    def process_response(self, request, response):
+        """Discard the memoized predicate results."""
+        _ = request
+        utils.disable_predicate_memo()
+        return response
@@ -0,0 +1,75 @@
+"""Tests the utils module."""
+
+from django.test import TransactionTestCase
+from django.contrib.auth.models import User
+from apps.utils import utils, test_utils
+
+
+class PredicatesTestCase(TransactionTestCase):
+    """predicates evaluation test"""
+
+    def setUp(self):
+        """Generate the test user."""
+        test_utils.set_competition_round()
+        self.user = User.objects.create_user("test", "test@test.com")
+
+    def testCompilePredicates(self):
+        """Tests that the predicates are compiled once and rewritten to pass in the user."""
+        code = utils.compile_predicates("is_admin() or has_points(10)")
+        self.assertTrue(code is utils.compile_predicates("is_admin() or has_points(10)"),
+                        "Check the compiled predicates are cached.")
+        self.assertFalse(utils.eval_predicates("is_admin() or has_points(10)", self.user),
+                         "Check the user is not admin and has no points.")
+
+        self.user.is_staff = True
+        self.user.save()
+        self.assertTrue(utils.eval_predicates("is_admin() or has_points(10)", self.user),
+                        "Check the user is an admin.")
+        self.assertTrue(utils.validate_predicates("is_admin(") is not None,
+                        "Check the invalid predicates report an error.")
+
+    def testPredicateMemo(self):
+        """Tests that the predicate results are memoized only when the memo is enabled."""
+        utils.enable_predicate_memo()
+        try:
+            self.assertFalse(utils.eval_predicates("is_admin()", self.user),
+                             "Check the user is not admin.")
+            self.user.is_staff = True
+            self.assertFalse(utils.eval_predicates("is_admin()", self.user),
+                             "Check the memoized result is returned.")
+
+            utils.clear_predicate_memo(self.user)
+            self.assertTrue(utils.eval_predicates("is_admin()", self.user),
+                            "Check the result is re-evaluated after clearing the memo.")
+        finally:
+            utils.disable_predicate_memo()
+
+        self.user.is_staff = False
+        self.assertFalse(utils.eval_predicates("is_admin()", self.user),
+                         "Check the result is not memoized when the memo is disabled.")
+
+    def testPredicateDependencies(self):
+        """Tests that the predicates are analyzed into the user state keys they depend on."""
+        dependencies = utils.get_predicate_dependencies(
+            "completed_action('intro-video') and completed_some_of(2, category_slug='basic')")
+        self.assertEqual(dependencies, frozenset([("action", "intro-video"),
+                                                  ("category", "basic")]),
+                         "Check the smartgrid predicates depend on the action state.")
+        self.assertEqual(utils.get_predicate_dependencies("completed_level(2) or has_points(10)"),
+                         frozenset([("level_task", 2), utils.PLAYER_STATE_KEY]),
+                         "Check the player predicates depend on the player state.")
+        self.assertEqual(utils.get_predicate_dependencies("unlock_on_date('10/01/12') or True"),
+                         frozenset([utils.TIME_STATE_KEY]),
+                         "Check the time predicates depend on the time.")
+        self.assertEqual(utils.get_predicate_dependencies("reached_round('Round 2')"),
+                         frozenset([utils.TIME_STATE_KEY]),
+                         "Check the challenge_mgr predicates depend on the time.")
+        self.assertTrue(utils.predicates_affected("unlock_on_date('10/01/12')", set()),
+                        "Check the time predicates are always affected.")
+
+        self.assertTrue(utils.predicates_affected("completed_some_of(action_type='event')",
+                                                  set([("type", "event")])))
+        self.assertFalse(utils.predicates_affected("approved_action('intro-video')",
+                                                   set([("action", "other-video")])))
+        self.assertTrue(utils.predicates_affected("is_admin(", set()),
+                        "Check the invalid predicates are always affected.")
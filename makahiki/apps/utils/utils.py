@@ -1,7 +1,53 @@
 """Provides common utility functions."""
 from django.conf import settings
+from django.db import transaction, IntegrityError
+from django.http import HttpResponse
+from django.template import loader, RequestContext
+import ast
+import inspect
 import os
+import random
+import re
 import sys
+import threading
+
+
+_predicate_namespace = {}
+"""private variable to store the global namespace of all predicates ("globals") and the pattern
+matching the predicate calls in a predicate string ("pattern"), built on first use."""
+
+
+_compiled_predicates = {}
+"""private variable to cache the compiled predicate code objects, keyed by predicate string."""
+
+
+_predicate_memo = threading.local()
+"""private variable to store the per-request (or per-job) memoized predicate results."""
+
+
+_predicate_dependencies = {}
+"""private variable to cache the dependencies of the predicates, keyed by predicate string."""
+
+
+PLAYER_STATE_KEY = ("player", None)
+"""The state key the player_mgr predicates depend on, such as the points and badges."""
+
+
+ANY_STATE_KEY = ("any", None)
+"""The state key of the predicates that can not be analyzed, they depend on any change."""
+
+
+TIME_STATE_KEY = ("time", None)
+"""The state key of the predicates depending on the time, such as unlock_on_date and
+reached_round. They change without any user state change, so they are always re-evaluated."""
+
+
+CODE_VALUES = 'abcdefghijkmnpqrstuvwxyz234789'
+"""The characters of the random part of the generated codes."""
+
+
+CODE_BATCH_SIZE = 200
+"""The number of generated codes inserted in one query."""
 
 
 def media_file_path(prefix=None):
@@ -12,6 +58,70 @@ def media_file_path(prefix=None):
         return settings.MAKAHIKI_MEDIA_PREFIX
 
 
+def generate_unique_codes(header, num_codes, existing_codes, length=5):
+    """Returns a list of num_codes random codes starting with the header. The codes are
+    unique, and are not in existing_codes, a set of the lower case codes already taken.
+    The candidates are drawn in batches and deduplicated in memory."""
+    codes = set()
+    while len(codes) < num_codes:
+        for _ in range(num_codes - len(codes)):
+            code = header + "".join(random.sample(CODE_VALUES, length))
+            if not code.lower() in existing_codes:
+                codes.add(code)
+    return list(codes)
+
+
+def bulk_create_codes(model, header, num_codes, make_code):
+    """Creates num_codes objects of the model with unique random codes starting with the
+    header. The existing codes with the header are fetched in one query, and the objects,
+    built by make_code(code), are inserted with bulk_create. If another process took some
+    of the codes in the meantime, the batch is drawn again."""
+    while True:
+        existing_codes = set(code.lower() for code in model.objects.filter(
+            code__istartswith=header).values_list("code", flat=True))
+        codes = generate_unique_codes(header, num_codes, existing_codes)
+
+        sid = transaction.savepoint()
+        try:
+            for start in range(0, len(codes), CODE_BATCH_SIZE):
+                model.objects.bulk_create(
+                    [make_code(code) for code in codes[start:start + CODE_BATCH_SIZE]])
+            transaction.savepoint_commit(sid)
+            return codes
+        except IntegrityError:
+            # Try again.
+            transaction.savepoint_rollback(sid)
+
+
+def render_code_pages(request, template_name, codes, per_page, context):
+    """Renders the printable pages of the codes, one page of per_page codes at a time,
+    into the response. The codes are iterated without caching the queryset, and the
+    template is rendered with the codes of the page, first_page and last_page."""
+    response = HttpResponse()
+    template = loader.get_template(template_name)
+    context = RequestContext(request, context)
+
+    page = []
+    first_page = True
+    for code in codes.iterator():
+        if len(page) == per_page:
+            response.write(_render_code_page(template, context, page, first_page, False))
+            page = []
+            first_page = False
+        page.append(code)
+    response.write(_render_code_page(template, context, page, first_page, True))
+    return response
+
+
+def _render_code_page(template, context, page, first_page, last_page):
+    """Renders one page of the codes."""
+    context.update({"codes": page, "first_page": first_page, "last_page": last_page})
+    try:
+        return template.render(context)
+    finally:
+        context.pop()
+
+
 def get_challenge_mgr_predicates():
     """Returns the predicates defined in smartgrid module."""
     from apps.managers.challenge_mgr.predicates import game_enabled, reached_round
@@ -61,19 +171,149 @@ def get_player_mgr_predicates():
         }
 
 
+def _get_predicate_globals():
+    """Returns the global namespace for evaluating predicates. It contains all the predicates
+    and is built only once."""
+    if not _predicate_namespace:
+        allow_dict = {"True": True, "False": False}
+        allow_dict.update(get_player_mgr_predicates())
+        allow_dict.update(get_challenge_mgr_predicates())
+        allow_dict.update(get_smartgrid_predicates())
+
+        pattern = re.compile(r"\b(%s)\(" % "|".join(allow_dict.keys()))
+        allow_dict["__builtins__"] = None
+        _predicate_namespace["pattern"] = pattern
+        _predicate_namespace["globals"] = allow_dict
+    return _predicate_namespace["globals"]
+
+
+def compile_predicates(predicates):
+    """Returns the compiled code object of the predicates string. The predicate calls are
+    rewritten to pass in the user. The result is cached by the predicates string."""
+    code = _compiled_predicates.get(predicates)
+    if code is None:
+        _get_predicate_globals()
+        code = compile(_predicate_namespace["pattern"].sub(r"\1(user,", predicates),
+                       "<predicates>", "eval")
+        _compiled_predicates[predicates] = code
+    return code
+
+
 def eval_predicates(predicates, user):
-    """Returns the boolean evaluation result of the predicates against the user."""
+    """Returns the boolean evaluation result of the predicates against the user.
+    The result is memoized if the predicate memo is enabled."""
+    memo = getattr(_predicate_memo, "results", None)
+    if memo is not None:
+        key = (user.pk, predicates)
+        if key not in memo:
+            memo[key] = _eval_compiled_predicates(predicates, user)
+        return memo[key]
+
+    return _eval_compiled_predicates(predicates, user)
+
+
+def _eval_compiled_predicates(predicates, user):
+    """Evaluates the compiled predicates against the user."""
+    return eval(compile_predicates(predicates), _get_predicate_globals(), {"user": user})
+
+
+def enable_predicate_memo():
+    """Starts memoizing the predicate results in the current thread, such as for the duration
+    of a request or a job run."""
+    _predicate_memo.results = {}
+
+
+def disable_predicate_memo():
+    """Stops memoizing the predicate results in the current thread and discards them."""
+    _predicate_memo.results = None
+
+
+def clear_predicate_memo(user):
+    """Discards the memoized predicate results of the user, called when the user state that
+    the predicates depend on is changed."""
+    memo = getattr(_predicate_memo, "results", None)
+    if memo:
+        for key in memo.keys():
+            if key[0] == user.pk:
+                del memo[key]
+
+
+def get_predicate_dependencies(predicates):
+    """Returns the set of the user state keys the predicates depend on. The smartgrid
+    predicates depend on the action state keys (see smartgrid.predicates.get_dependency_keys),
+    the player_mgr predicates depend on PLAYER_STATE_KEY and the challenge_mgr predicates depend
+    on TIME_STATE_KEY. The result is cached by the predicates string."""
+    dependencies = _predicate_dependencies.get(predicates)
+    if dependencies is None:
+        try:
+            dependencies = _analyze_predicate_dependencies(predicates)
+        except (SyntaxError, ValueError, TypeError):
+            dependencies = frozenset([ANY_STATE_KEY])
+        _predicate_dependencies[predicates] = dependencies
+    return dependencies
+
+
+def _analyze_predicate_dependencies(predicates):
+    """Parses the predicates and collects the dependencies of the predicate calls. Raises
+    ValueError if an argument is not a literal."""
+    from apps.widgets.smartgrid.predicates import get_dependency_keys
+
+    dependencies = set()
+    if not predicates:
+        return frozenset(dependencies)
+
+    smartgrid_predicates = get_smartgrid_predicates()
+    player_mgr_predicates = get_player_mgr_predicates()
+    challenge_mgr_predicates = get_challenge_mgr_predicates()
+    for node in ast.walk(ast.parse(predicates, mode="eval")):
+        if not isinstance(node, ast.Call):
+            continue
+        name = node.func.id if isinstance(node.func, ast.Name) else None
+        if name in smartgrid_predicates:
+            args = [ast.literal_eval(arg) for arg in node.args]
+            kwargs = dict((keyword.arg, ast.literal_eval(keyword.value))
+                          for keyword in node.keywords)
+            callargs = _predicate_call_args(smartgrid_predicates[name], args, kwargs)
+            dependencies.update(get_dependency_keys(name, callargs))
+        elif name in player_mgr_predicates:
+            dependencies.add(PLAYER_STATE_KEY)
+        elif name in challenge_mgr_predicates:
+            dependencies.add(TIME_STATE_KEY)
+        else:
+            dependencies.add(ANY_STATE_KEY)
+
+    return frozenset(dependencies)
+
+
+def _predicate_call_args(predicate, args, kwargs):
+    """Returns the dictionary of the argument names to the values of a predicate call, given
+    the positional and keyword arguments passed after the user. The arguments left out take
+    their default value. Raises TypeError if the arguments do not match the predicate."""
+    spec = inspect.getargspec(predicate)
+    names = spec.args[1:]
+    defaults = spec.defaults or ()
+    if len(args) > len(names):
+        raise TypeError("%s takes at most %d arguments." % (predicate.__name__, len(names)))
+
+    callargs = dict(zip(names[len(names) - len(defaults):], defaults))
+    callargs.update(zip(names, args))
+    for name, value in kwargs.items():
+        if not name in names or name in names[:len(args)]:
+            raise TypeError("%s got an unexpected argument %s." % (predicate.__name__, name))
+        callargs[name] = value
 
-    ALLOW_DICT = {"True": True, "False": False, "user": user}
-    ALLOW_DICT.update(get_player_mgr_predicates())
-    ALLOW_DICT.update(get_challenge_mgr_predicates())
-    ALLOW_DICT.update(get_smartgrid_predicates())
+    for name in names:
+        if not name in callargs:
+            raise TypeError("%s is missing the argument %s." % (predicate.__name__, name))
+    return callargs
 
-    for key in ALLOW_DICT:
-        if "%s(" % key in predicates:
-            predicates = predicates.replace("%s(" % key, "%s(user," % key)
 
-    return eval(predicates, {"__builtins__": None}, ALLOW_DICT)
+def predicates_affected(predicates, changes):
+    """Returns True if the predicates depend on any of the changed user state keys, or on the
+    time."""
+    dependencies = get_predicate_dependencies(predicates)
+    return ANY_STATE_KEY in dependencies or TIME_STATE_KEY in dependencies or \
+           not dependencies.isdisjoint(changes)
 
 
 def validate_predicates(predicates):
@@ -5,10 +5,10 @@ import simplejson as json
 
 from django.http import Http404, HttpResponse
 from django.template.loader import render_to_string
-from django.core.mail.message import EmailMultiAlternatives
 from apps.managers.challenge_mgr import challenge_mgr
 
 from apps.widgets.ask_admin.forms import FeedbackForm
+from apps.widgets.notifications.models import UserNotification
 
 ADMINS = (("Makahiki Developers", "makahiki-dev@googlegroups.com"),)
 FROM_EMAIL = ADMINS[0][1]
@@ -48,12 +48,9 @@ def send_feedback(request):
                 request.user.get_profile().name)
 
             if challenge.email_enabled:
-                mail = EmailMultiAlternatives(subject, message, FROM_EMAIL,
-                    [challenge.contact_email, ], headers={
-                    "Reply-To": request.user.email})
-
-                mail.attach_alternative(html_message, 'text/html')
-                mail.send()
+                UserNotification.create_email_notification(
+                    challenge.contact_email, subject, message, html_message,
+                    from_email=FROM_EMAIL, reply_to=request.user.email)
 
             #print "email sent %s" % html_message
             if request.is_ajax():
@@ -3,6 +3,10 @@ from apps.managers.player_mgr.models import Profile
 from django.db.models.aggregates import Count
 
 
+SUPPLY_CACHE = ("team", 300)
+"""The badge scoreboard depends on the team of the user, cached for 5 minutes."""
+
+
 def supply(request, page_name):
     """Supply the view_objects content for this widget, the badge scoreboard data."""
 
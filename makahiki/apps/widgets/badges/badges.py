@@ -18,19 +18,28 @@ def award_badge(profile, badge):
     BadgeAward(profile=profile, badge=badge).save()
 
 
-def award_possible_badges(profile):
-    """Award any possible badges to a user.
+def award_possible_badges(profile, changes=None):
+    """Award any possible badges to a user. If changes is given, only the badges whose award
+    condition depends on the changed user state keys are evaluated.
     """
     user_badges = []
     for awarded in profile.badgeaward_set.all().select_related():
         user_badges.append(awarded.badge)
 
     for badge in Badge.objects.all():
-        if not badge in user_badges and utils.eval_predicates(badge.award_condition, profile.user):
+        if badge in user_badges:
+            continue
+        if changes is not None and not utils.predicates_affected(badge.award_condition, changes):
+            continue
+        if utils.eval_predicates(badge.award_condition, profile.user):
             award_badge(profile=profile, badge=badge)
 
 
 def award_badges():
     """award badges for all users. called in an hourly scheduler."""
-    for p in Profile.objects.filter(setup_completed=True):
-        award_possible_badges(p.user)
+    utils.enable_predicate_memo()
+    try:
+        for p in Profile.objects.filter(setup_completed=True):
+            award_possible_badges(p.user)
+    finally:
+        utils.disable_predicate_memo()
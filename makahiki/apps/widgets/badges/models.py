@@ -4,6 +4,7 @@ from datetime import datetime
 from django.conf import settings
 from apps.managers.player_mgr.models import Profile
 from apps.widgets.notifications.models import UserNotification
+from apps.utils import utils
 from apps.utils.utils import media_file_path
 
 
@@ -78,3 +79,5 @@ class BadgeAward(models.Model):
         message = "Badge: %s" % self.badge.name
         self.profile.add_points(self.badge.points, self.awarded_at, message, self)
         super(BadgeAward, self).save(args, kwargs)
+
+        utils.clear_predicate_memo(self.profile.user)
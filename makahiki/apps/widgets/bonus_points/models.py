@@ -6,9 +6,9 @@ Created on Aug 5, 2012
 @author: Cam Moore
 '''
 
-import random
-from django.db import models, IntegrityError
+from django.db import models
 from django.contrib.auth.models import User
+from apps.utils import utils
 
 
 class BonusPoint(models.Model):
@@ -32,26 +32,10 @@ class BonusPoint(models.Model):
     @staticmethod
     def generate_bonus_points(point_value, num_codes):
         """Generates a set of random codes for the bonus points with the given
-        point value."""
-        values = 'abcdefghijkmnpqrstuvwxyz234789'
-
-        # Use the first non-dash component of the slug.
-        header = 'BONUS'
-        header += "-"
-        header += str(point_value)
-        header += "-"
-        for _ in range(0, num_codes):
-            bonus = BonusPoint(point_value=point_value, code=header.lower(),
-                               create_date=datetime.datetime.now())
-            valid = False
-            while not valid:
-                for value in random.sample(values, 5):
-                    bonus.code += value
-                try:
-                    # print bonus.code
-                    # Throws exception if the code is a duplicate.
-                    bonus.save()
-                    valid = True
-                except IntegrityError:
-                    # Try again.
-                    bonus.code = header
+        point value. Returns the list of codes."""
+        header = 'bonus-%s-' % point_value
+        create_date = datetime.datetime.now()
+        return utils.bulk_create_codes(
+            BonusPoint, header, num_codes,
+            lambda code: BonusPoint(point_value=point_value, code=code,
+                                    create_date=create_date))
@@ -36,3 +36,22 @@ class BonusPointTest(TransactionTestCase):
         response = self.client.get(reverse('bonus_view_codes'))
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'view_bonus_points.html')
+
+    def testGenerateBonusPoints(self):
+        """Test that the bonus point codes are generated in bulk without duplicates."""
+        codes = BonusPoint.generate_bonus_points(5, 300)
+        self.assertEqual(len(set(codes)), 300, "Check the generated codes are unique.")
+        self.assertEqual(BonusPoint.objects.filter(point_value=5,
+                                                   code__startswith="bonus-5-").count(), 300,
+                         "Check the codes are created with the header.")
+
+        BonusPoint.generate_bonus_points(5, 10)
+        self.assertEqual(BonusPoint.objects.count(), 310,
+                         "Check more codes are added to the existing codes.")
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get(reverse('bonus_view_codes') + "?rows=100")
+        self.assertContains(response, "page-break-before", count=3,
+                            msg_prefix="Check a page is rendered for each 100 codes.")
+        self.assertContains(response, codes[0], msg_prefix="Check the codes are printed.")
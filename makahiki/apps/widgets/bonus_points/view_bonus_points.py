@@ -6,9 +6,8 @@ Created on Aug 4, 2012
 from django.views.decorators.cache import never_cache
 from django.contrib.auth.decorators import login_required
 from django.http import Http404
+from apps.utils import utils
 from apps.widgets.bonus_points.models import BonusPoint
-from django.shortcuts import render_to_response
-from django.template.context import RequestContext
 
 
 @never_cache
@@ -24,10 +23,7 @@ def view_codes(request):
         per_page = int(request.GET['rows'])
 
     codes = BonusPoint.objects.order_by('pk')
-    if len(codes) == 0:
+    if not codes.exists():
         raise Http404
 
-    return render_to_response("view_bonus_points.html", {
-        "codes": codes,
-        "per_page": per_page,
-        }, context_instance=RequestContext(request))
+    return utils.render_code_pages(request, "view_bonus_points.html", codes, per_page, {})
@@ -1,6 +1,7 @@
 """The model for help topics."""
 from django.conf import settings
 from django.db import models
+from apps.managers.cache_mgr import cache_mgr
 
 HELP_CATEGORIES = (
     ("faq", "Frequently Asked Questions"),
@@ -34,3 +35,13 @@ class HelpTopic(models.Model):
 
     def __unicode__(self):
         return "%s: %s" % (self.category.capitalize(), self.title)
+
+    def save(self, *args, **kwargs):
+        """Custom save method to invalidate the supplied view objects of the help widgets."""
+        super(HelpTopic, self).save(*args, **kwargs)
+        cache_mgr.invalidate_namespace("supply")
+
+    def delete(self, *args, **kwargs):
+        """Custom delete method to invalidate the supplied view objects of the help widgets."""
+        super(HelpTopic, self).delete(*args, **kwargs)
+        cache_mgr.invalidate_namespace("supply")
@@ -3,6 +3,13 @@
 from apps.widgets.help.models import HelpTopic
 
 
+SUPPLY_CACHE = ("global", 600)
+"""The rule topics are the same for everyone, cached for 10 minutes."""
+
+SUPPLY_CONCURRENT = True
+"""The rule topics are only read, so they can be supplied concurrently."""
+
+
 def supply(request, page_name):
     """ supply view_objects for widget rendering."""
     _ = request
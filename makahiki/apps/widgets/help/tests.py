@@ -1,6 +1,8 @@
 """Tests to see that we can retrieve and display a help topic."""
 
 from django.test import TransactionTestCase
+from django.test.client import RequestFactory
+from django.core.cache import get_cache
 from django.core.urlresolvers import reverse
 from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr import challenge_mgr
@@ -42,3 +44,28 @@ class HelpFunctionalTestCase(TransactionTestCase):
                                            args=(topic.category, topic.slug)))
         self.failUnlessEqual(response.status_code, 200)
         self.assertContains(response, topic.contents)
+
+    def testSupplyInvalidation(self):
+        """Check that the cached rule topics are invalidated when a topic is saved."""
+        request = RequestFactory().get("/help/")
+        request.user = self.user
+
+        dummy_cache = cache_mgr.cache
+        cache_mgr.cache = get_cache("django.core.cache.backends.locmem.LocMemCache")
+        try:
+            view_objects = challenge_mgr.supply_widget(request, "help", "help.rule")
+            self.assertEqual(len(view_objects["rules"]), 0, "There should be no rule topic.")
+
+            topic = HelpTopic(title="A topic", slug="a-topic", category="rules",
+                              contents="This is a topic")
+            topic.save()
+            view_objects = challenge_mgr.supply_widget(request, "help", "help.rule")
+            self.assertEqual(len(view_objects["rules"]), 1,
+                             "The new rule topic should be supplied.")
+
+            topic.delete()
+            view_objects = challenge_mgr.supply_widget(request, "help", "help.rule")
+            self.assertEqual(len(view_objects["rules"]), 0,
+                             "The deleted rule topic should not be supplied.")
+        finally:
+            cache_mgr.cache = dummy_cache
@@ -4,6 +4,10 @@ from apps.managers.challenge_mgr import challenge_mgr
 from apps.widgets.my_info.forms import ProfileForm
 
 
+SUPPLY_EAGER = True
+"""The supply saves the posted profile, whose name and theme are shown by the page header."""
+
+
 def supply(request, page_name):
     """Supply view_objects for My_Info and process the POST command."""
     _ = page_name
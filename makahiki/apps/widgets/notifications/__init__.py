@@ -1,8 +1,27 @@
 """Provides the notification service."""
+import datetime
 import re
+import time
+from django.core.mail import get_connection
 from apps.managers.cache_mgr import cache_mgr
 
-from apps.widgets.notifications.models import UserNotification
+from apps.widgets.notifications.models import UserNotification, OutboundEmail
+
+
+EMAIL_BATCH_SIZE = 100
+"""Number of queued emails sent over one SMTP connection."""
+
+EMAIL_RATE_LIMIT = 10
+"""Maximum number of emails sent per second, 0 means no limit."""
+
+EMAIL_MAX_ATTEMPTS = 5
+"""Number of failed attempts after which a queued email is marked as failed."""
+
+EMAIL_RETRY_DELAY = 300
+"""Seconds to wait before retrying a failed email, doubled after each failed attempt."""
+
+EMAIL_CLAIM_TIMEOUT = 3600
+"""Seconds after which an email claimed by a send run that did not finish is queued again."""
 
 
 def _strip_html_tag(contents):
@@ -58,3 +77,76 @@ def get_user_alert_notifications(user):
         item.fb_contents = _strip_html_tag(item.contents)
 
     return notifications
+
+
+def send_queued_emails(batch_size=EMAIL_BATCH_SIZE, rate_limit=EMAIL_RATE_LIMIT,
+                       max_attempts=EMAIL_MAX_ATTEMPTS, retry_delay=EMAIL_RETRY_DELAY,
+                       claim_timeout=EMAIL_CLAIM_TIMEOUT):
+    """Sends the queued emails that are due, in batches over a reused connection.
+    Each email is claimed before it is sent, so that overlapping runs do not send it twice.
+    A failed email is retried later with an increasing delay, and marked as failed after
+    max_attempts. Returns the tuple of the number of the sent and failed emails."""
+    release_stale_emails()
+
+    sent = failed = 0
+    while True:
+        emails = _claim_emails(batch_size, claim_timeout)
+        if not emails:
+            break
+
+        connection = get_connection()
+        connection.open()
+        try:
+            for email in emails:
+                if rate_limit:
+                    time.sleep(1.0 / rate_limit)
+                try:
+                    connection.send_messages([email.message_object()])
+                except Exception as e:
+                    _retry_email(email, e, max_attempts, retry_delay)
+                    failed += 1
+                else:
+                    email.status = "sent"
+                    email.sent_at = datetime.datetime.now()
+                    email.save()
+                    sent += 1
+        finally:
+            connection.close()
+
+    return sent, failed
+
+
+def release_stale_emails():
+    """Queues again the emails claimed by a send run which did not finish before its claim
+    expired. Returns the number of the released emails."""
+    return OutboundEmail.objects.filter(
+        status="sending", send_after__lte=datetime.datetime.now()).update(status="queued")
+
+
+def _claim_emails(batch_size, claim_timeout):
+    """Claims up to batch_size of the queued emails that are due, and returns them. An email
+    is claimed with a conditional update from queued to sending, so that an email is only
+    claimed by one send run. The claim expires after claim_timeout seconds."""
+    now = datetime.datetime.now()
+    expires = now + datetime.timedelta(seconds=claim_timeout)
+    claimed = []
+    for pk in OutboundEmail.objects.filter(
+            status="queued", send_after__lte=now).values_list("pk", flat=True)[:batch_size]:
+        if OutboundEmail.objects.filter(pk=pk, status="queued").update(
+                status="sending", send_after=expires):
+            claimed.append(pk)
+    return list(OutboundEmail.objects.filter(pk__in=claimed))
+
+
+def _retry_email(email, error, max_attempts, retry_delay):
+    """Records the failed attempt of the email, and schedules the retry or marks it as
+    failed."""
+    email.attempts += 1
+    email.last_error = "%s: %s" % (error.__class__.__name__, error)
+    if email.attempts >= max_attempts:
+        email.status = "failed"
+    else:
+        email.status = "queued"
+        email.send_after = datetime.datetime.now() + datetime.timedelta(
+            seconds=retry_delay * 2 ** (email.attempts - 1))
+    email.save()
@@ -1,7 +1,8 @@
 """Admin definition."""
+import datetime
 from django.contrib import admin
 from apps.managers.challenge_mgr import challenge_mgr
-from apps.widgets.notifications.models import NoticeTemplate, UserNotification
+from apps.widgets.notifications.models import NoticeTemplate, UserNotification, OutboundEmail
 
 
 class UserNotificationAdmin(admin.ModelAdmin):
@@ -9,7 +10,23 @@ class UserNotificationAdmin(admin.ModelAdmin):
     list_display = ('recipient', 'unread', 'level')
 
 
+class OutboundEmailAdmin(admin.ModelAdmin):
+    """outbound email admin"""
+    list_display = ('recipients', 'subject', 'status', 'attempts', 'send_after', 'sent_at')
+    list_filter = ('status',)
+    actions = ["retry_emails"]
+
+    def retry_emails(self, request, queryset):
+        """Queue the selected emails to be sent again."""
+        _ = request
+        queryset.update(status="queued", attempts=0, send_after=datetime.datetime.now())
+
+    retry_emails.short_description = "Retry the selected emails."
+
+
 admin.site.register(NoticeTemplate)
 admin.site.register(UserNotification, UserNotificationAdmin)
 challenge_mgr.register_sys_admin_model("Notifications", NoticeTemplate)
 challenge_mgr.register_sys_admin_model("Notifications", UserNotification)
+admin.site.register(OutboundEmail, OutboundEmailAdmin)
+challenge_mgr.register_sys_admin_model("Notifications", OutboundEmail)
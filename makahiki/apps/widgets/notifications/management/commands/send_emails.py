@@ -0,0 +1,21 @@
+"""Invocation:  python manage.py send_emails
+
+Send the queued emails in the outbox, in batches over a reused connection. Failed emails are
+retried with an increasing delay, and marked as failed after the maximum attempts.
+Normally is scheduled every few minutes."""
+
+import datetime
+
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+from apps.widgets import notifications
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    help = 'Send the queued emails in the outbox.'
+
+    def handle(self, *args, **options):
+        """send the queued emails"""
+        print '****** Processing send_emails at %s *******' % datetime.datetime.today()
+        sent, failed = notifications.send_queued_emails()
+        print "%d emails sent, %d failed.\n" % (sent, failed)
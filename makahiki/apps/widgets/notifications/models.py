@@ -1,5 +1,8 @@
 """Model definition for notification service."""
 
+import datetime
+import threading
+from collections import OrderedDict
 from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.messages import constants as message_constants
@@ -16,6 +19,16 @@ from apps.managers.challenge_mgr import challenge_mgr
 
 constants = message_constants
 
+NOTICE_TEMPLATE_CACHE_SIZE = 100
+"""The number of compiled notice templates kept in memory."""
+
+_compiled_templates = OrderedDict()
+"""private variable to store the compiled notice templates, keyed by the pk and the text of the
+template, in least recently used order."""
+
+_compiled_templates_lock = threading.Lock()
+"""private variable to guard the compiled notice templates."""
+
 TYPE_CHOICES = (
     ('round-transition', 'Round Transition'),
     ('raffle-winner', 'Raffle Winner'),
@@ -40,11 +53,25 @@ class NoticeTemplate(models.Model):
            The template renderer uses the passed in context to insert variables."""
         if not context_dict:
             context_dict = {}
-        template = Template(self.template)
+        template = self._compiled_template()
         template = template.render(Context(context_dict))
 
         return markdown(template)
 
+    def _compiled_template(self):
+        """Returns the compiled template, from the least recently used cache of the compiled
+        templates if available. The template text is part of the key, so a changed template
+        is compiled again."""
+        key = (self.pk, self.template)
+        with _compiled_templates_lock:
+            template = _compiled_templates.pop(key, None)
+            if template is None:
+                template = Template(self.template)
+            _compiled_templates[key] = template
+            if len(_compiled_templates) > NOTICE_TEMPLATE_CACHE_SIZE:
+                _compiled_templates.popitem(last=False)
+        return template
+
     def __unicode__(self):
         return self.notice_type
 
@@ -162,21 +189,120 @@ class UserNotification(models.Model):
         notification.save()
 
     @staticmethod
-    def create_email_notification(recipient_email, subject, message, html_message=None):
-        """Create an email notification."""
+    def create_broadcast_notification(recipients, contents, level=constants.INFO,
+                                      display_alert=False, batch_size=500):
+        """Create the same notification for all the recipients, a queryset of users. The
+        notifications are inserted and their caches invalidated in batches of batch_size.
+        Returns the number of the notifications created."""
+        count = 0
+        batch = []
+        usernames = []
+        for recipient_id, username in recipients.values_list("id", "username").iterator():
+            batch.append(UserNotification(
+                recipient_id=recipient_id,
+                contents=contents,
+                level=level,
+                display_alert=display_alert,
+            ))
+            usernames.append(username)
+            if len(batch) == batch_size:
+                count += UserNotification._create_batch(batch, usernames)
+                batch = []
+                usernames = []
+
+        if batch:
+            count += UserNotification._create_batch(batch, usernames)
+        return count
+
+    @staticmethod
+    def _create_batch(notifications, usernames):
+        """Insert the notifications and invalidate the notification caches of the usernames."""
+        UserNotification.objects.bulk_create(notifications)
+        cache_mgr.delete_many(["notification-%s" % username for username in usernames])
+        return len(notifications)
+
+    @staticmethod
+    def create_email_notification(recipient_email, subject, message, html_message=None,
+                                  from_email=None, reply_to=None):
+        """Create an email notification. The email is queued in the outbox if
+        MAKAHIKI_EMAIL_QUEUE is enabled, otherwise it is sent immediately."""
 
         if settings.EMAIL_BACKEND == 'django.core.mail.backends.locmem.EmailBackend' or\
            challenge_mgr.get_challenge().email_enabled:
-            msg = EmailMultiAlternatives(subject,
-                                         message,
-                                         settings.SERVER_EMAIL,
-                                         [recipient_email, ])
-            if html_message:
-                msg.attach_alternative(html_message, "text/html")
-
-            msg.send()
+            email = OutboundEmail(from_email=from_email or settings.SERVER_EMAIL,
+                                  recipients=recipient_email,
+                                  reply_to=reply_to,
+                                  subject=subject,
+                                  message=message,
+                                  html_message=html_message)
+            if settings.MAKAHIKI_EMAIL_QUEUE:
+                email.save()
+            else:
+                email.message_object().send()
 
     def save(self, *args, **kwargs):
         """Custom save method."""
         super(UserNotification, self).save(*args, **kwargs)
         cache_mgr.delete("notification-%s" % self.recipient.username)
+
+
+class OutboundEmail(models.Model):
+    """An email queued in the outbox, sent in batches by the send_emails command."""
+    STATUS_CHOICES = (
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    )
+
+    from_email = models.CharField(
+        max_length=255,
+        help_text="The sender of the email.")
+    recipients = models.TextField(
+        help_text="The comma separated recipient email addresses.")
+    reply_to = models.CharField(
+        max_length=255, null=True, blank=True,
+        help_text="The Reply-To address of the email.")
+    subject = models.CharField(
+        max_length=255, blank=True,
+        help_text="The subject of the email.")
+    message = models.TextField(
+        help_text="The plain text body of the email.")
+    html_message = models.TextField(
+        null=True, blank=True,
+        help_text="The html body of the email.")
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default="queued",
+        help_text="Sending emails are claimed by a send run. Failed emails have reached the "
+                  "maximum attempts and are no longer sent.")
+    attempts = models.IntegerField(
+        default=0,
+        help_text="The number of the failed send attempts.")
+    last_error = models.TextField(
+        null=True, blank=True,
+        help_text="The error of the last failed send attempt.")
+    send_after = models.DateTimeField(
+        default=datetime.datetime.now, db_index=True,
+        help_text="The email is not sent before this time, used to delay the retries. "
+                  "For a sending email, the time its claim expires.")
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        """Meta"""
+        ordering = ("send_after", "id")
+
+    def __unicode__(self):
+        return "%s : %s" % (self.recipients, self.subject)
+
+    def message_object(self):
+        """Returns the EmailMultiAlternatives message of this email."""
+        headers = {"Reply-To": self.reply_to} if self.reply_to else None
+        msg = EmailMultiAlternatives(self.subject,
+                                     self.message,
+                                     self.from_email,
+                                     self.recipients.split(","),
+                                     headers=headers)
+        if self.html_message:
+            msg.attach_alternative(self.html_message, "text/html")
+        return msg
@@ -0,0 +1,10 @@
+"""Celery Task definitions for notifications."""
+
+from celery.task import task
+from apps.widgets import notifications
+
+
+@task
+def send_emails():
+    """send the queued emails."""
+    notifications.send_queued_emails()
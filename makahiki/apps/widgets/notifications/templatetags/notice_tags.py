@@ -3,7 +3,9 @@ from datetime import datetime
 
 from django.template import Library
 
+from apps.managers.cache_mgr import cache_mgr
 from apps.managers.log_mgr import log_mgr
+from apps.widgets.notifications.models import UserNotification
 
 register = Library()
 
@@ -13,11 +15,16 @@ def mark_alerts_displayed(request, alerts):
     """
     Simple tag to mark the alerts displayed.
     """
+    if not alerts:
+        return ""
+
     for alert in alerts:
         log_mgr.write_log_entry(request, 200, "/slog/notifications/alert/%d/" % alert.pk)
         alert.display_alert = False
-        alert.save()
 
+    UserNotification.objects.filter(pk__in=[alert.pk for alert in alerts]).update(
+        display_alert=False)
+    cache_mgr.delete("notification-%s" % request.user.username)
     return ""
 
 # duration in seconds within which the time difference will be rendered as 'a moment ago'
@@ -1,13 +1,17 @@
 """Notification testing."""
 
+import datetime
+from django.core import mail
 from django.test import TransactionTestCase
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
 from apps.managers.challenge_mgr import challenge_mgr
 from apps.utils import test_utils
 
+from apps.widgets import notifications as notifications_module
 from apps.widgets.notifications import get_unread_notifications
-from apps.widgets.notifications.models import UserNotification
+from apps.widgets.notifications.models import UserNotification, OutboundEmail, \
+    NoticeTemplate
 
 
 class NotificationUnitTests(TransactionTestCase):
@@ -33,6 +37,107 @@ class NotificationUnitTests(TransactionTestCase):
         unread = notifications["unread"]
         self.assertEqual(unread.count(), 4, "There should be four unread notifications.")
 
+    def testBroadcast(self):
+        """Test that a broadcast notification is created for all the recipients."""
+        users = [User.objects.create_user("test%d" % i, "test%d@test.com" % i) for i in range(3)]
+        self.assertEqual(get_unread_notifications(users[0])["unread"].count(), 0,
+            "There should not be any unread notifications.")
+
+        count = UserNotification.create_broadcast_notification(
+            User.objects.filter(username__startswith="test"), "Round 2 started",
+            display_alert=True, batch_size=2)
+        self.assertEqual(count, 3, "There should be three notifications created.")
+        for user in users:
+            notifications = get_unread_notifications(user)
+            self.assertEqual(notifications["unread"].count(), 1,
+                "There should be one unread notification.")
+            self.assertEqual(notifications["alerts"][0].contents, "Round 2 started",
+                "The broadcast notification should have been returned.")
+
+    def testEmailQueue(self):
+        """Test that the queued emails are sent in batches and the failures are retried."""
+        with self.settings(MAKAHIKI_EMAIL_QUEUE=True):
+            UserNotification.create_email_notification("test@test.com", "Reminder", "Hello",
+                                                       "<p>Hello</p>")
+        self.assertEqual(len(mail.outbox), 0, "The email should have been queued.")
+        self.assertEqual(OutboundEmail.objects.filter(status="queued").count(), 1,
+            "There should be one queued email.")
+
+        self.assertEqual(notifications_module.send_queued_emails(rate_limit=0), (1, 0))
+        self.assertEqual(mail.outbox[0].to, ["test@test.com"],
+            "The queued email should have been sent.")
+        self.assertEqual(OutboundEmail.objects.filter(status="sent").count(), 1,
+            "The email should be marked as sent.")
+
+        class FailingConnection(object):
+            """A connection failing to send any message."""
+            def open(self):
+                """open"""
+                pass
+
+            def close(self):
+                """close"""
+                pass
+
+            def send_messages(self, messages):
+                """fail"""
+                _ = messages
+                raise IOError("connection refused")
+
+        email = OutboundEmail.objects.create(from_email="admin@test.com",
+                                             recipients="test@test.com", message="Hello")
+        get_connection = notifications_module.get_connection
+        notifications_module.get_connection = FailingConnection
+        try:
+            self.assertEqual(notifications_module.send_queued_emails(rate_limit=0, max_attempts=2),
+                             (0, 1))
+            email = OutboundEmail.objects.get(pk=email.pk)
+            self.assertEqual(email.status, "queued", "The failed email should be retried.")
+            self.assertTrue(email.send_after > datetime.datetime.now(),
+                "The retry should be delayed.")
+
+            OutboundEmail.objects.filter(pk=email.pk).update(send_after=datetime.datetime.now())
+            notifications_module.send_queued_emails(rate_limit=0, max_attempts=2)
+            email = OutboundEmail.objects.get(pk=email.pk)
+            self.assertEqual(email.status, "failed",
+                "The email should be marked as failed after the maximum attempts.")
+            self.assertTrue("connection refused" in email.last_error)
+        finally:
+            notifications_module.get_connection = get_connection
+
+    def testEmailClaim(self):
+        """Test that a claimed email is not sent by another run, until its claim expires."""
+        email = OutboundEmail.objects.create(from_email="admin@test.com",
+                                             recipients="test@test.com", message="Hello")
+        self.assertEqual([e.pk for e in notifications_module._claim_emails(10, 60)], [email.pk],
+            "The queued email should be claimed.")
+        self.assertEqual(notifications_module._claim_emails(10, 60), [],
+            "The claimed email should not be claimed again.")
+        self.assertEqual(notifications_module.send_queued_emails(rate_limit=0), (0, 0),
+            "The claimed email should not be sent by another run.")
+        self.assertEqual(len(mail.outbox), 0, "No email should have been sent.")
+
+        OutboundEmail.objects.filter(pk=email.pk).update(send_after=datetime.datetime.now())
+        self.assertEqual(notifications_module.send_queued_emails(rate_limit=0), (1, 0),
+            "The email of the expired claim should be sent.")
+        self.assertEqual(OutboundEmail.objects.get(pk=email.pk).status, "sent",
+            "The email should be marked as sent.")
+
+    def testNoticeTemplateCache(self):
+        """Test that the compiled notice templates are reused until the template changes."""
+        template = NoticeTemplate.objects.create(notice_type="round-transition",
+                                                 template="Welcome to {{ ROUND }}")
+        self.assertEqual(template.render({"ROUND": "Round 1"}), "<p>Welcome to Round 1</p>",
+            "The template should be rendered with the context.")
+        compiled = template._compiled_template()
+        self.assertTrue(compiled is template._compiled_template(),
+            "The compiled template should be reused.")
+
+        template.template = "Goodbye {{ ROUND }}"
+        template.save()
+        self.assertEqual(template.render({"ROUND": "Round 1"}), "<p>Goodbye Round 1</p>",
+            "The changed template should be compiled again.")
+
 
 class NotificationFunctionalTests(TransactionTestCase):
     """View Test."""
@@ -3,6 +3,13 @@
 from apps.widgets.smartgrid import   smartgrid
 
 
+SUPPLY_CACHE = ("global", 300)
+"""The popular actions are the same for everyone, cached for 5 minutes."""
+
+SUPPLY_CONCURRENT = True
+"""The popular actions are only read, so they can be supplied concurrently."""
+
+
 def supply(request, page_name):
     """Supply view_objects content, which are the popular actions from the smart grid game."""
 
@@ -5,6 +5,7 @@ from django.contrib import admin
 from apps.managers.challenge_mgr import challenge_mgr
 from apps.widgets.notifications.models import UserNotification, NoticeTemplate
 
+from apps.widgets.prizes import prizes
 from apps.widgets.prizes.models import Prize
 
 
@@ -38,7 +39,7 @@ class PrizeAdmin(admin.ModelAdmin):
 
     def winner(self, obj):
         """return the winner and link to pickup form."""
-        leader = obj.leader()
+        leader = prizes.prize_leader(obj)
         if leader and obj.award_to in ('individual_overall', 'individual_team'):
             return "%s (<a href='%s'>View pickup form</a>)" % (leader,
             reverse('prize_view_form', args=(obj.pk,)))
@@ -49,7 +50,7 @@ class PrizeAdmin(admin.ModelAdmin):
 
     def notice_sent(self, obj):
         """return True if the notification had been sent."""
-        leader = obj.leader()
+        leader = prizes.prize_leader(obj)
         if leader and obj.award_to in ('individual_overall', 'individual_team'):
             return UserNotification.objects.filter(
                 recipient=leader.user,
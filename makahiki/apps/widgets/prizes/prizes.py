@@ -0,0 +1,120 @@
+"""Maintains the snapshot of the current leaders of the prizes."""
+
+import datetime
+from django.template.defaultfilters import slugify
+from apps.managers.cache_mgr import cache_mgr
+from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.player_mgr.models import Profile
+from apps.managers.score_mgr.models import ScoreboardEntry, TeamScoreboardEntry
+from apps.widgets.prizes.models import Prize
+
+
+LEADER_SNAPSHOT_TIMEOUT = 600
+"""The seconds a leader snapshot is kept in the cache. The snapshots are also refreshed every
+5 minutes by the refresh_prize_leaders task, as a backstop to the invalidation on the score
+changes."""
+
+
+def get_leader_snapshot(round_name):
+    """Returns the leader snapshot of the round, from cache if available. The snapshot is
+    a dictionary of the leader of each (award_to, competition_type) of the prizes of the
+    round. The leaders of the individual_team and team_group prizes are dictionaries of the
+    leader of each team id and group id respectively.
+    The snapshot is stored in the "leaders" cache namespace, which is invalidated once the
+    score and resource changes are committed. It is also refreshed by the
+    refresh_prize_leaders task and expires after LEADER_SNAPSHOT_TIMEOUT."""
+    snapshot = cache_mgr.get_cache(_snapshot_cache_key(round_name), namespace="leaders")
+    if snapshot is None:
+        snapshot = refresh_leader_snapshot(round_name)
+    return snapshot
+
+
+def refresh_leader_snapshot(round_name):
+    """Computes the leader snapshot of the round and stores it in the cache."""
+    snapshot = _build_leader_snapshot(round_name)
+    cache_mgr.set_cache(_snapshot_cache_key(round_name), snapshot, LEADER_SNAPSHOT_TIMEOUT,
+                        namespace="leaders")
+    return snapshot
+
+
+def refresh_leader_snapshots():
+    """Refreshes the leader snapshots of all the rounds which have started.
+    Returns the number of snapshots refreshed."""
+    today = datetime.datetime.today()
+    rounds = challenge_mgr.get_all_round_info()["rounds"]
+    count = 0
+    for round_name in Prize.objects.values_list("round_name", flat=True).distinct():
+        if round_name in rounds and rounds[round_name]["start"] <= today:
+            refresh_leader_snapshot(round_name)
+            count += 1
+    return count
+
+
+def prize_leader(prize, team=None):
+    """Returns the current leader of the prize from the leader snapshot of its round.
+    The leaders of the individual_team and team_group prizes are the leaders of the team,
+    or of the group of the team."""
+    key = (prize.award_to, prize.competition_type)
+    snapshot = get_leader_snapshot(prize.round_name)
+    if not key in snapshot:
+        # the prize was added after the snapshot was computed.
+        snapshot = refresh_leader_snapshot(prize.round_name)
+
+    leader = snapshot[key]
+    if prize.competition_type == "points" and prize.award_to == "individual_team":
+        return leader.get(team.id) if team else None
+    elif prize.competition_type == "points" and prize.award_to == "team_group":
+        return leader.get(team.group_id) if team else None
+    return leader
+
+
+def _snapshot_cache_key(round_name):
+    """Returns the cache key of the leader snapshot of the round."""
+    return "prize_leaders-%s" % slugify(round_name)
+
+
+def _build_leader_snapshot(round_name):
+    """Computes the leaders of all the prizes of the round. The per team and per group
+    leaders are computed from one query each, instead of one query for each team."""
+    snapshot = {}
+    for prize in Prize.objects.filter(round_name=round_name):
+        key = (prize.award_to, prize.competition_type)
+        if key in snapshot:
+            continue
+        if prize.competition_type == "points" and prize.award_to == "individual_team":
+            snapshot[key] = _team_player_leaders(round_name)
+        elif prize.competition_type == "points" and prize.award_to == "team_group":
+            snapshot[key] = _group_team_leaders(round_name)
+        else:
+            snapshot[key] = prize.leader()
+    return snapshot
+
+
+def _team_player_leaders(round_name):
+    """Returns the individual points leader of each team in the round, as a dictionary of
+    Profile objects keyed by team id."""
+    leader_ids = {}
+    entries = ScoreboardEntry.objects.filter(
+        round_name=round_name, profile__team__isnull=False).order_by(
+        "profile__team", "-points", "-last_awarded_submission").values_list(
+        "profile__team", "profile")
+    for team_id, profile_id in entries:
+        leader_ids.setdefault(team_id, profile_id)
+
+    profiles = Profile.objects.in_bulk(leader_ids.values())
+    return dict((team_id, profiles[profile_id]) for team_id, profile_id in leader_ids.items())
+
+
+def _group_team_leaders(round_name):
+    """Returns the team points leader of each group in the round, as a dictionary of Team
+    objects keyed by group id."""
+    leaders = {}
+    entries = TeamScoreboardEntry.objects.filter(round_name=round_name).select_related(
+        "team").order_by("team__group", "-points", "-last_awarded_submission")
+    for entry in entries:
+        if not entry.team.group_id in leaders:
+            team = entry.team
+            team.points = entry.points
+            team.last = entry.last_awarded_submission
+            leaders[team.group_id] = team
+    return leaders
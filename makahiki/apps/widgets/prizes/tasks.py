@@ -0,0 +1,10 @@
+"""Celery Task definitions for prizes."""
+
+from celery.task import task
+from apps.widgets.prizes import prizes
+
+
+@task
+def refresh_prize_leaders():
+    """refresh the prize leader snapshots."""
+    prizes.refresh_leader_snapshots()
@@ -5,6 +5,7 @@ from django.contrib.auth.models import User
 from django.test import TransactionTestCase
 from apps.managers.team_mgr.models import Group, Team
 from apps.utils import test_utils
+from apps.widgets.prizes import prizes
 
 
 class DormTeamPrizeTests(TransactionTestCase):
@@ -84,6 +85,30 @@ class DormTeamPrizeTests(TransactionTestCase):
         self.assertEqual(self.prize.leader(profile1.team), profile1.team,
             "The leader in profile1's dorm is not profile1.")
 
+    def testLeaderSnapshot(self):
+        """
+        Tests that the leader snapshot matches the prize leaders and follows the points.
+        """
+        self.prize.round_name = "Round 1"
+        self.prize.save()
+
+        profile = self.users[0].get_profile()
+        profile.add_points(10, datetime.datetime.today(), "test")
+        profile1 = self.users[1].get_profile()
+        profile1.add_points(5, datetime.datetime.today(), "test")
+
+        for team in self.teams:
+            self.assertEqual(prizes.prize_leader(self.prize, team), self.prize.leader(team),
+                "The snapshot leader should be the prize leader of the team's dorm.")
+
+        profile2 = self.users[2].get_profile()
+        profile2.add_points(20, datetime.datetime.today(), "test")
+        prizes.refresh_leader_snapshot(self.prize.round_name)
+        self.assertEqual(prizes.prize_leader(self.prize, profile.team), profile2.team,
+            "The snapshot leader should follow the points once refreshed.")
+        self.assertEqual(prizes.prize_leader(self.prize, profile1.team), profile1.team,
+            "The leader in profile1's dorm should not change.")
+
     def tearDown(self):
         """
         Deletes the created image file in prizes.
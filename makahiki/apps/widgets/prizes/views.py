@@ -6,9 +6,14 @@ from django.shortcuts import render_to_response, get_object_or_404
 from django.template.context import RequestContext
 from django.views.decorators.cache import never_cache
 from apps.managers.challenge_mgr import challenge_mgr
+from apps.widgets.prizes import prizes as prize_leaders
 from apps.widgets.prizes.models import Prize
 
 
+SUPPLY_CONCURRENT = True
+"""The prizes and their leaders are only read, so they can be supplied concurrently."""
+
+
 def supply(request, page_name):
     """Supply view_object content, which is the prizes for this team."""
     _ = page_name
@@ -23,7 +28,8 @@ def supply(request, page_name):
 
 def _get_prizes(team):
     """Private method to process the prizes half of the page.
-       Takes the user's team and returns a dictionary to be used in the template."""
+       Takes the user's team and returns a dictionary to be used in the template.
+       The leaders are read from the leader snapshot of the round."""
 
     prize_dict = {}
     today = datetime.datetime.today()
@@ -42,9 +48,9 @@ def _get_prizes(team):
         else:
             # If we are in the middle of the round, display the current leader.
             if today < rounds[round_name]["end"]:
-                prize.current_leader = prize.leader(team)
+                prize.current_leader = prize_leaders.prize_leader(prize, team)
             else:
-                prize.winner = prize.leader(team)
+                prize.winner = prize_leaders.prize_leader(prize, team)
 
         prize_dict[round_name].append(prize)
 
@@ -1,5 +1,6 @@
 """Implements the quest widget."""
 from apps.managers.cache_mgr import cache_mgr
+from apps.utils import utils
 
 from apps.widgets.quests import MAX_AVAILABLE_QUESTS
 
@@ -30,13 +31,25 @@ def get_quests_from_cache(user):
     """
     get the quests for the user and store in cache.
     """
-    return_dict = cache_mgr.get_cache("get_quests-%s" % user.username)
+    return_dict = cache_mgr.get_cache("get_quests-%s" % user.username, namespace="smartgrid")
     if return_dict is None:
         return_dict = get_quests(user)
-        cache_mgr.set_cache("get_quests-%s" % user.username, return_dict, 1800)
+        cache_mgr.set_cache("get_quests-%s" % user.username, return_dict, 1800,
+                            namespace="smartgrid")
     return return_dict
 
 
+def invalidate_affected_quests(user, changes):
+    """Invalidates the cached quests of the user if the unlock or completion conditions of any
+    quest depend on the changed user state keys."""
+    for unlock_conditions, completion_conditions in Quest.objects.values_list(
+        "unlock_conditions", "completion_conditions"):
+        if utils.predicates_affected(unlock_conditions, changes) or \
+           utils.predicates_affected(completion_conditions, changes):
+            cache_mgr.delete("get_quests-%s" % user.username, namespace="smartgrid")
+            return
+
+
 def get_quests(user):
     """Loads the quests for the user.
        Returns a dictionary of two things:
@@ -10,6 +10,11 @@ from apps.widgets.quests.models import Quest, QuestMember
 from apps.widgets.quests.quests import get_quests
 
 
+SUPPLY_EAGER = True
+"""The supply completes the quests of the user and creates their notifications, which are
+shown by the notifications widget."""
+
+
 def supply(request, page_name):
     """supply the quest view_objects"""
 
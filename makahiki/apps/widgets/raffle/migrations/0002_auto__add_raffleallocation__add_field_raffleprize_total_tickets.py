@@ -0,0 +1,117 @@
+# encoding: utf-8
+import datetime
+from south.db import db
+from south.v2 import SchemaMigration
+from django.db import models
+from django.db.models import Count
+
+class Migration(SchemaMigration):
+
+    def forwards(self, orm):
+        
+        # Adding model 'RaffleAllocation'
+        db.create_table('raffle_raffleallocation', (
+            ('id', self.gf('django.db.models.fields.AutoField')(primary_key=True)),
+            ('user', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['auth.User'])),
+            ('raffle_prize', self.gf('django.db.models.fields.related.ForeignKey')(to=orm['raffle.RafflePrize'])),
+            ('tickets', self.gf('django.db.models.fields.IntegerField')(default=0)),
+        ))
+        db.send_create_signal('raffle', ['RaffleAllocation'])
+
+        # Adding unique constraint on 'RaffleAllocation', fields ['user', 'raffle_prize']
+        db.create_unique('raffle_raffleallocation', ['user_id', 'raffle_prize_id'])
+
+        # Adding field 'RafflePrize.total_tickets'
+        db.add_column('raffle_raffleprize', 'total_tickets', self.gf('django.db.models.fields.IntegerField')(default=0), keep_default=False)
+
+        # Initialize the ticket counters from the existing tickets.
+        if not db.dry_run:
+            allocations = orm['raffle.RaffleTicket'].objects.values(
+                'user', 'raffle_prize').annotate(tickets=Count('id'))
+            for allocation in allocations:
+                orm['raffle.RaffleAllocation'].objects.create(
+                    user_id=allocation['user'], raffle_prize_id=allocation['raffle_prize'],
+                    tickets=allocation['tickets'])
+            for prize in orm['raffle.RafflePrize'].objects.annotate(count=Count('raffleticket')):
+                orm['raffle.RafflePrize'].objects.filter(pk=prize.pk).update(
+                    total_tickets=prize.count)
+
+
+    def backwards(self, orm):
+        
+        # Removing unique constraint on 'RaffleAllocation', fields ['user', 'raffle_prize']
+        db.delete_unique('raffle_raffleallocation', ['user_id', 'raffle_prize_id'])
+
+        # Deleting model 'RaffleAllocation'
+        db.delete_table('raffle_raffleallocation')
+
+        # Deleting field 'RafflePrize.total_tickets'
+        db.delete_column('raffle_raffleprize', 'total_tickets')
+
+
+    models = {
+        'auth.group': {
+            'Meta': {'object_name': 'Group'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '80'}),
+            'permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'})
+        },
+        'auth.permission': {
+            'Meta': {'ordering': "('content_type__app_label', 'content_type__model', 'codename')", 'unique_together': "(('content_type', 'codename'),)", 'object_name': 'Permission'},
+            'codename': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'content_type': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['contenttypes.ContentType']"}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '50'})
+        },
+        'auth.user': {
+            'Meta': {'object_name': 'User'},
+            'date_joined': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime(2012, 4, 21, 1, 20, 6, 516678)'}),
+            'email': ('django.db.models.fields.EmailField', [], {'max_length': '75', 'blank': 'True'}),
+            'first_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'groups': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Group']", 'symmetrical': 'False', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'is_active': ('django.db.models.fields.BooleanField', [], {'default': 'True'}),
+            'is_staff': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'is_superuser': ('django.db.models.fields.BooleanField', [], {'default': 'False'}),
+            'last_login': ('django.db.models.fields.DateTimeField', [], {'default': 'datetime.datetime(2012, 4, 21, 1, 20, 6, 516505)'}),
+            'last_name': ('django.db.models.fields.CharField', [], {'max_length': '30', 'blank': 'True'}),
+            'password': ('django.db.models.fields.CharField', [], {'max_length': '128'}),
+            'user_permissions': ('django.db.models.fields.related.ManyToManyField', [], {'to': "orm['auth.Permission']", 'symmetrical': 'False', 'blank': 'True'}),
+            'username': ('django.db.models.fields.CharField', [], {'unique': 'True', 'max_length': '30'})
+        },
+        'contenttypes.contenttype': {
+            'Meta': {'ordering': "('name',)", 'unique_together': "(('app_label', 'model'),)", 'object_name': 'ContentType', 'db_table': "'django_content_type'"},
+            'app_label': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'model': ('django.db.models.fields.CharField', [], {'max_length': '100'}),
+            'name': ('django.db.models.fields.CharField', [], {'max_length': '100'})
+        },
+        'raffle.raffleallocation': {
+            'Meta': {'unique_together': "(('user', 'raffle_prize'),)", 'object_name': 'RaffleAllocation'},
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'raffle_prize': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['raffle.RafflePrize']"}),
+            'tickets': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.User']"})
+        },
+        'raffle.raffleprize': {
+            'Meta': {'object_name': 'RafflePrize'},
+            'description': ('django.db.models.fields.TextField', [], {}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'image': ('django.db.models.fields.files.ImageField', [], {'max_length': '1024', 'blank': 'True'}),
+            'round_name': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'title': ('django.db.models.fields.CharField', [], {'max_length': '50'}),
+            'total_tickets': ('django.db.models.fields.IntegerField', [], {'default': '0'}),
+            'value': ('django.db.models.fields.IntegerField', [], {}),
+            'winner': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.User']", 'null': 'True', 'blank': 'True'})
+        },
+        'raffle.raffleticket': {
+            'Meta': {'object_name': 'RaffleTicket'},
+            'created_at': ('django.db.models.fields.DateTimeField', [], {'auto_now_add': 'True', 'blank': 'True'}),
+            'id': ('django.db.models.fields.AutoField', [], {'primary_key': 'True'}),
+            'raffle_prize': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['raffle.RafflePrize']"}),
+            'updated_at': ('django.db.models.fields.DateTimeField', [], {'auto_now': 'True', 'blank': 'True'}),
+            'user': ('django.db.models.fields.related.ForeignKey', [], {'to': "orm['auth.User']"})
+        }
+    }
+
+    complete_apps = ['raffle']
@@ -1,7 +1,10 @@
 """Provides the model for the raffle widget."""
 
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models import F, Sum
+from django.db.models.signals import post_save, post_delete
 from django.contrib.auth.models import User
+from apps.managers.player_mgr.models import Profile
 from apps.utils.utils import media_file_path
 
 POINTS_PER_TICKET = 25
@@ -31,30 +34,58 @@ class RafflePrize(models.Model):
         verbose_name="Round"
     )
     winner = models.ForeignKey(User, null=True, blank=True)
+    total_tickets = models.IntegerField(
+        default=0, editable=False,
+        help_text="The number of tickets allocated to this prize.")
 
     def __unicode__(self):
         return "%s: %s" % (self.round_name, self.title)
 
+    def save(self, *args, **kwargs):
+        """Saves the prize. The total_tickets of an existing prize is maintained by the ticket
+        signals with atomic updates, so it is reloaded from the locked row instead of saving
+        the value of this instance, which may be stale. The row stays locked until the
+        transaction of the caller, such as the request transaction, is committed."""
+        if self.pk:
+            totals = RafflePrize.objects.select_for_update().filter(pk=self.pk).values_list(
+                "total_tickets", flat=True)
+            if totals:
+                self.total_tickets = totals[0]
+        super(RafflePrize, self).save(*args, **kwargs)
+
     def add_ticket(self, user):
-        """Adds a ticket from the user if they have one.
-          Throws an exception if they cannot add a ticket."""
+        """Adds a ticket from the user if they have one. Returns False if the user does not
+        have any available ticket. The user's profile is locked while checking the available
+        tickets, until the transaction of the caller is committed, so concurrent requests of
+        the same user can not over allocate."""
+        Profile.objects.select_for_update().get(user=user)
+        if RaffleTicket.available_tickets(user) <= 0:
+            return False
+
         ticket = RaffleTicket(raffle_prize=self, user=user)
         ticket.save()
+        return True
 
     def remove_ticket(self, user):
-        """Removes an allocated ticket."""
+        """Removes an allocated ticket. Returns False if the user has no ticket allocated to
+        this prize."""
+        Profile.objects.select_for_update().get(user=user)
         # Get the first ticket that matches the query.
-        ticket = RaffleTicket.objects.filter(raffle_prize=self, user=user)[0]
-        ticket.delete()
+        tickets = RaffleTicket.objects.filter(raffle_prize=self, user=user)[:1]
+        if not tickets:
+            return False
+
+        tickets[0].delete()
+        return True
 
     def allocated_tickets(self, user=None):
         """Returns the number of tickets allocated to this prize.
            Takes an optional argument to return the number of tickets allocated by the user."""
-        query = self.raffleticket_set
         if user:
-            query = query.filter(user=user)
+            allocations = RaffleAllocation.objects.filter(raffle_prize=self, user=user)
+            return allocations[0].tickets if allocations else 0
 
-        return query.count()
+        return RafflePrize.objects.filter(pk=self.pk).values_list("total_tickets", flat=True)[0]
 
 
 class RaffleTicket(models.Model):
@@ -70,13 +101,68 @@ class RaffleTicket(models.Model):
     @staticmethod
     def available_tickets(user):
         """Returns the number of raffle tickets the user has available."""
-        profile = user.get_profile()
-        total_tickets = profile.points() / POINTS_PER_TICKET
-        allocated_tickets = user.raffleticket_set.count()
+        return RaffleTicket.total_tickets(user) - RaffleTicket.allocated_tickets(user)
 
-        return total_tickets - allocated_tickets
+    @staticmethod
+    def allocated_tickets(user):
+        """Returns the number of raffle tickets the user has allocated to any prize."""
+        return RaffleAllocation.objects.filter(user=user).aggregate(
+            total=Sum("tickets"))["total"] or 0
 
     @staticmethod
     def total_tickets(user):
         """Return the total tickets available for this user."""
         return user.get_profile().points() / POINTS_PER_TICKET
+
+
+class RaffleAllocation(models.Model):
+    """The number of tickets a user allocated to a prize, maintained on ticket changes."""
+    user = models.ForeignKey(User)
+    raffle_prize = models.ForeignKey(RafflePrize)
+    tickets = models.IntegerField(default=0)
+
+    class Meta:
+        """Meta"""
+        unique_together = (("user", "raffle_prize"),)
+
+    def __unicode__(self):
+        return "%s : %s" % (self.user, self.raffle_prize)
+
+
+def _ticket_saved(sender, instance, created, **kwargs):
+    """Increases the ticket counters of the prize and the user's allocation."""
+    _ = sender
+    _ = kwargs
+    if created:
+        _update_ticket_counters(instance, 1)
+
+
+def _ticket_deleted(sender, instance, **kwargs):
+    """Decreases the ticket counters of the prize and the user's allocation."""
+    _ = sender
+    _ = kwargs
+    _update_ticket_counters(instance, -1)
+
+
+def _update_ticket_counters(ticket, delta):
+    """Atomically updates the ticket counters of the prize and the user's allocation."""
+    RafflePrize.objects.filter(pk=ticket.raffle_prize_id).update(
+        total_tickets=F("total_tickets") + delta)
+
+    allocations = RaffleAllocation.objects.filter(user=ticket.user_id,
+                                                  raffle_prize=ticket.raffle_prize_id)
+    if not allocations.update(tickets=F("tickets") + delta) and delta > 0:
+        sid = transaction.savepoint()
+        try:
+            RaffleAllocation.objects.create(user_id=ticket.user_id,
+                                            raffle_prize_id=ticket.raffle_prize_id,
+                                            tickets=delta)
+            transaction.savepoint_commit(sid)
+        except IntegrityError:
+            # created by a concurrent request.
+            transaction.savepoint_rollback(sid)
+            allocations.update(tickets=F("tickets") + delta)
+
+
+post_save.connect(_ticket_saved, sender=RaffleTicket)
+post_delete.connect(_ticket_deleted, sender=RaffleTicket)
@@ -2,6 +2,7 @@
 import os
 import datetime
 
+from django.db import transaction
 from django.test import TransactionTestCase
 from django.conf import settings
 from django.core.files.images import ImageFile
@@ -96,6 +97,78 @@ class RafflePrizeTests(TransactionTestCase):
         self.assertEqual(self.prize.allocated_tickets(user2), 1,
             "1 ticket should be allocated by this user to this prize.")
 
+    def testTicketCounters(self):
+        """
+        Tests that the ticket counters follow the tickets and a user can not over allocate.
+        """
+        self.prize.save()
+        self.assertFalse(self.prize.add_ticket(self.user),
+                         "User without points should not add a ticket.")
+
+        profile = self.user.get_profile()
+        profile.add_points(50, datetime.datetime.today(), "test")
+        profile.save()
+
+        self.assertTrue(self.prize.add_ticket(self.user))
+        self.assertTrue(self.prize.add_ticket(self.user))
+        self.assertFalse(self.prize.add_ticket(self.user),
+                         "User should not add more tickets than available.")
+        self.assertEqual(RaffleTicket.allocated_tickets(self.user), 2,
+                         "User should have allocated 2 tickets.")
+        self.assertEqual(RafflePrize.objects.get(pk=self.prize.pk).total_tickets, 2,
+                         "The prize counter should have 2 tickets.")
+
+        # Tickets deleted outside of the prize are also counted.
+        RaffleTicket.objects.filter(user=self.user)[0].delete()
+        self.assertEqual(self.prize.allocated_tickets(self.user), 1,
+                         "1 ticket should be allocated by this user to this prize.")
+        self.assertTrue(self.prize.remove_ticket(self.user))
+        self.assertFalse(self.prize.remove_ticket(self.user),
+                         "User without allocated tickets should not remove a ticket.")
+        self.assertEqual(self.prize.allocated_tickets(), 0,
+                         "No tickets should be allocated to this prize.")
+
+    def testSavePrizeAfterTickets(self):
+        """
+        Tests that saving a prize loaded before tickets were added keeps the ticket counter.
+        """
+        self.prize.save()
+        stale_prize = RafflePrize.objects.get(pk=self.prize.pk)
+
+        profile = self.user.get_profile()
+        profile.add_points(50, datetime.datetime.today(), "test")
+        profile.save()
+        self.assertTrue(self.prize.add_ticket(self.user))
+        self.assertTrue(self.prize.add_ticket(self.user))
+
+        stale_prize.title = "New title"
+        stale_prize.save()
+        prize = RafflePrize.objects.get(pk=self.prize.pk)
+        self.assertEqual(prize.title, "New title", "The prize should be saved.")
+        self.assertEqual(prize.total_tickets, 2,
+                         "Saving the stale prize should keep the 2 tickets.")
+        self.assertEqual(stale_prize.total_tickets, 2,
+                         "The saved prize should have the current ticket counter.")
+
+    def testSavePrizeInTransaction(self):
+        """
+        Tests that saving a prize does not commit the transaction of the caller.
+        """
+        self.prize.save()
+        transaction.enter_transaction_management()
+        transaction.managed(True)
+        try:
+            prize = RafflePrize.objects.get(pk=self.prize.pk)
+            prize.title = "Rolled back"
+            prize.save()
+            transaction.rollback()
+        finally:
+            transaction.leave_transaction_management()
+
+        prize = RafflePrize.objects.get(pk=self.prize.pk)
+        self.assertNotEqual(prize.title, "Rolled back",
+                            "The prize should be rolled back with the caller's transaction.")
+
     def tearDown(self):
         """
         Deletes the created image file in prizes.
@@ -1,7 +1,6 @@
 """Handle rendering of the raffle widget."""
 import datetime
 import random
-from django.db.models.aggregates import Count
 
 from django.http import HttpResponseRedirect, Http404
 from django.shortcuts import render_to_response, get_object_or_404
@@ -13,7 +12,8 @@ from django.template.context import RequestContext
 
 from apps.managers.challenge_mgr import  challenge_mgr
 from apps.widgets.notifications.models import NoticeTemplate, UserNotification
-from apps.widgets.raffle.models import  RafflePrize, RaffleTicket, POINTS_PER_TICKET
+from apps.widgets.raffle.models import  RafflePrize, RaffleTicket, RaffleAllocation, \
+    POINTS_PER_TICKET
 
 
 def supply(request, page_name):
@@ -28,25 +28,21 @@ def supply(request, page_name):
     deadline = current_round_info["end"]
     today = datetime.datetime.today()
 
-    # Get the user's tickets.
+    # Get the user's tickets, from the allocation counters.
     total_tickets = RaffleTicket.total_tickets(user)
-
-    user_tickets = RaffleTicket.objects.filter(user=user).select_related("raffle_prize")
-    allocated_tickets = user_tickets.count()
+    user_tickets = dict(RaffleAllocation.objects.filter(user=user).values_list(
+        "raffle_prize_id", "tickets"))
+    allocated_tickets = sum(user_tickets.values())
     available_tickets = total_tickets - allocated_tickets
 
     prizes = None
     if today < deadline:
         # Get the prizes for the raffle.
-        prizes = RafflePrize.objects.filter(
-            round_name=current_round_info["name"]).annotate(
-            total_tickets=Count("raffleticket")).order_by("-value")
+        prizes = list(RafflePrize.objects.filter(
+            round_name=current_round_info["name"]).order_by("-value"))
 
         for prize in prizes:
-            prize.user_tickets = 0
-            for ticket in user_tickets:
-                if ticket.raffle_prize == prize:
-                    prize.user_tickets += 1
+            prize.user_tickets = user_tickets.get(prize.id, 0)
 
     return {
         "round_name": current_round_info["name"],
@@ -72,15 +68,11 @@ def add_ticket(request, prize_id):
         deadline = current_round_info["end"]
         in_deadline = datetime.datetime.today() <= deadline
 
-        if RaffleTicket.available_tickets(user) > 0 and in_deadline:
-            prize.add_ticket(user)
-            return HttpResponseRedirect(reverse("win_index"))
-        elif not in_deadline:
+        if not in_deadline:
             messages.error(request, "The raffle for this round is over.")
-            return HttpResponseRedirect(reverse("win_index"))
-        else:
+        elif not prize.add_ticket(user):
             messages.error(request, "Sorry, but you do not have any more tickets.")
-            return HttpResponseRedirect(reverse("win_index"))
+        return HttpResponseRedirect(reverse("win_index"))
 
     raise Http404
 
@@ -90,13 +82,9 @@ def remove_ticket(request, prize_id):
     """Removes a user's raffle ticket from the prize."""
     if request.method == "POST":
         prize = get_object_or_404(RafflePrize, id=prize_id)
-        if prize.allocated_tickets(request.user) > 0:
-            prize.remove_ticket(request.user)
-            return HttpResponseRedirect(reverse("win_index"))
-
-        else:
+        if not prize.remove_ticket(request.user):
             messages.error(request, "Sorry, but you do not have any tickets for this prize.")
-            return HttpResponseRedirect(reverse("win_index"))
+        return HttpResponseRedirect(reverse("win_index"))
 
     raise Http404
 
@@ -1 +1,5 @@
 """Implements the widgets for resource goal games (energy, water, etc.)"""
+
+# importing resource_goal connects the signals maintaining the ResourceGoalRoundTotal.
+from apps.widgets.resource_goal import resource_goal
+_ = resource_goal
@@ -0,0 +1,21 @@
+"""Invocation:  python manage.py rebuild_round_totals
+
+Rebuilds the round totals of the resource usages and of the resource goals met of all teams,
+for all the rounds. The totals are also rebuilt whenever the rounds change. Until the totals of
+a round are built, the resource scoreboards aggregate them on each view."""
+
+from apps.managers.challenge_mgr.challenge_mgr import MakahikiBaseCommand
+from apps.managers.resource_mgr import resource_mgr
+from apps.widgets.resource_goal import resource_goal
+
+
+class Command(MakahikiBaseCommand):
+    """command"""
+    help = 'Rebuild the resource and resource goal round totals of all teams.'
+
+    def handle(self, *args, **options):
+        """rebuild the round totals."""
+        count = resource_mgr.rebuild_all_round_totals()
+        self.stdout.write("%d resource round totals rebuilt.\n" % count)
+        count = resource_goal.rebuild_all_goal_round_totals()
+        self.stdout.write("%d resource goal round totals rebuilt.\n" % count)
@@ -50,6 +50,28 @@ class WaterGoal(ResourceGoal):
     pass
 
 
+class ResourceGoalRoundTotal(models.Model):
+    """The goals met by a team up to the end of a round. It is the materialized aggregate
+    of the goals, maintained by resource_goal."""
+    resource = models.CharField(
+        max_length=20,
+        help_text="The name of the resource.")
+    team = models.ForeignKey(Team)
+    round_name = models.CharField(
+        max_length="30",
+        help_text="The name of the round")
+    completions = models.IntegerField(
+        default=0,
+        help_text="The number of goals met up to the end of the round.")
+    total_reduction = models.IntegerField(
+        default=0,
+        help_text="The sum of the percentages of reduction of the goals met.")
+
+    class Meta:
+        """Meta"""
+        unique_together = (("resource", "team", "round_name"),)
+
+
 class ResourceGoalSetting(models.Model):
     """Team Resource Goal Setting Model"""
 
@@ -1,16 +1,19 @@
 """Implements the Daily Energy (or Water) Goal Game."""
 
 import datetime
-from django.db.models.aggregates import Count, Avg
-from django.template.defaultfilters import slugify
-import requests
+from django.db.models import F
+from django.db.models.aggregates import Count, Sum
+from django.db.models.signals import pre_save, post_save, post_delete
 from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr import challenge_mgr
+from apps.managers.challenge_mgr.models import RoundSetting
 from apps.managers.resource_mgr import resource_mgr
+from apps.managers.resource_mgr.models import RoundTotalBuild
+from apps.managers.score_mgr import score_mgr
 from apps.managers.team_mgr.models import Team
 from apps.widgets.resource_goal.models import EnergyGoal, WaterGoal, WaterGoalSetting, \
     EnergyGoalSetting, EnergyBaselineDaily, WaterBaselineDaily, EnergyBaselineHourly, \
-    WaterBaselineHourly
+    WaterBaselineHourly, ResourceGoalRoundTotal
 
 
 def team_goal_settings(team, resource):
@@ -68,11 +71,17 @@ def team_daily_goal_usage(date, team, resource, goal_settings):
     return usage
 
 
-def _get_baseline_date(date):
-    """Returns a non-blackout date that is one weeks prior."""
+def _get_baseline_date(date, blackout_dates=None):
+    """Returns a non-blackout date that is one weeks prior.
+    blackout_dates, if given, is the set of blackout dates to check against."""
     baseline_date = date - datetime.timedelta(days=7)
-    if resource_mgr.is_blackout(baseline_date):
-        return _get_baseline_date(baseline_date)
+    if blackout_dates is None:
+        is_blackout = resource_mgr.is_blackout(baseline_date)
+    else:
+        is_blackout = baseline_date in blackout_dates
+
+    if is_blackout:
+        return _get_baseline_date(baseline_date, blackout_dates)
     else:
         return baseline_date
 
@@ -114,16 +123,17 @@ def team_hourly_resource_baseline(date, team, resource):
 
 def update_energy_baseline(end_date, weeks, method):
     """calculate the energy baseline from the specified end_date and week period."""
-    session = requests.session()
+    teams = Team.objects.filter(energygoalsetting__baseline_method=method)
+    cal_energy_baseline(teams, method, end_date, weeks)
 
-    for team in Team.objects.all():
-        goal_settings = team_goal_settings(team, "energy")
-        if goal_settings.baseline_method == method:
-            cal_energy_baseline(session, team, method, end_date, weeks)
 
-
-def cal_energy_baseline(session, team, method, end_date, weeks):
-    """calculate the fixed energy baseline from the specified end_date and week period."""
+def cal_energy_baseline(teams, method, end_date, weeks):
+    """calculate the energy baseline of the teams from the specified end_date and week period.
+    The history is read from the local rollups of resource_mgr, and the history missing
+    locally is fetched from WattDepot in a single concurrent pass for all the teams. The
+    daily and hourly baselines are computed in memory and then replaced in bulk. The
+    baselines of a team and day whose history could not be fetched completely are skipped,
+    and their existing baselines are kept."""
 
     # energy daily
     if method == "Fixed":
@@ -131,48 +141,153 @@ def cal_energy_baseline(session, team, method, end_date, weeks):
     else:
         day_range = 1
 
-    date = end_date
-    for day in range(0, day_range):
-        date -= datetime.timedelta(days=day)
-        usage = get_energy_baseline_usage(session, team, date, weeks, None)
-        baseline, _ = EnergyBaselineDaily.objects.get_or_create(team=team, day=date.weekday())
-        baseline.usage = usage
-        baseline.save()
-
-    # energy hourly
-    date = end_date
-    for day in range(0, day_range):
-        date -= datetime.timedelta(days=day)
-        for hour in range(1, 25):
-            usage = get_energy_baseline_usage(session, team, date, weeks, hour)
-            baseline, _ = EnergyBaselineHourly.objects.get_or_create(team=team,
-                                                                     day=date.weekday(),
-                                                                     hour=hour)
-            baseline.usage = usage
-            baseline.save()
-
-    print 'team %s energy baseline usage updated.' % team
-
-
-def get_energy_baseline_usage(session, team, end_date, weeks, hour):
-    """Returns the daily or hourly energy baseline usage from the history data."""
-    usage = 0
-    count = 0
-    date = end_date
-    for week in range(0, weeks):
-        _ = week
-        date = _get_baseline_date(date)
-        start_time = date.strftime("%Y-%m-%dT00:00:00")
-        if hour:
-            end_time = date.strftime("%Y-%m-%dT") + "%.2d:00:00" % hour
-        else:
-            end_time = (date + datetime.timedelta(days=1)).strftime("%Y-%m-%dT00:00:00")
+    teams = list(teams)
+    if not teams:
+        return
+
+    dates = [end_date - datetime.timedelta(days=day) for day in range(0, day_range)]
+    history = get_energy_baseline_history(teams, dates, weeks)
+
+    daily_baselines = []
+    hourly_baselines = []
+    computed_days = {}
+    for team in teams:
+        for date in dates:
+            if not _is_history_complete(team, date, history):
+                print 'team %s energy baseline of %s skipped, the history is incomplete.' % (
+                    team, date.strftime("%A"))
+                continue
+
+            computed_days.setdefault(team, []).append(date.weekday())
+            daily, hourly = _compute_day_baselines(team, date, history)
+            daily_baselines.append(daily)
+            hourly_baselines.extend(hourly)
 
-        session.params = {'startTime': start_time, 'endTime': end_time}
-        usage += resource_mgr.get_energy_usage(session, team.name)
-        if usage:
-            count += 1
-    return usage / count
+    _replace_energy_baselines(computed_days, daily_baselines, hourly_baselines)
+
+
+def _replace_energy_baselines(computed_days, daily_baselines, hourly_baselines):
+    """Replaces the baselines of the days recomputed for each team, a dict of team to the
+    list of weekdays, with the daily and hourly baselines."""
+    for team, days in computed_days.items():
+        EnergyBaselineDaily.objects.filter(team=team, day__in=days).delete()
+        EnergyBaselineHourly.objects.filter(team=team, day__in=days).delete()
+    EnergyBaselineDaily.objects.bulk_create(daily_baselines)
+    EnergyBaselineHourly.objects.bulk_create(hourly_baselines)
+
+    for team in computed_days:
+        print 'team %s energy baseline usage updated.' % team
+
+
+def _is_history_complete(team, date, history):
+    """Returns True if every usage of the history of the team and date has been fetched."""
+    for hour in range(1, 25):
+        if None in history[(team.name, date, hour)]:
+            return False
+    return True
+
+
+def _compute_day_baselines(team, date, history):
+    """Returns the daily baseline and the list of hourly baselines of the team for the
+    weekday of the date, computed from the history of get_energy_baseline_history."""
+    day = date.weekday()
+    hourly_baselines = []
+    for hour in range(1, 25):
+        usage = _average_baseline_usage(history[(team.name, date, hour)])
+        hourly_baselines.append(EnergyBaselineHourly(team=team, day=day, hour=hour,
+                                                     usage=usage))
+    # the daily baseline is the usage of the whole day.
+    daily_baseline = EnergyBaselineDaily(team=team, day=day, usage=hourly_baselines[-1].usage)
+    return daily_baseline, hourly_baselines
+
+
+def get_energy_baseline_history(teams, dates, weeks):
+    """Returns the history energy usage the baselines of the dates are computed from.
+    Returns a dict of (team name, date, hour) to the list of the cumulative usages up to
+    that hour, for each of the baseline weeks. The hour 24 is the usage of the whole day.
+    The usages which could not be fetched from WattDepot are None."""
+    baseline_dates = _get_baseline_dates(dates, weeks)
+
+    samples = {}
+    for team in teams:
+        for date in dates:
+            for baseline_date in baseline_dates[date]:
+                for hour in range(1, 25):
+                    samples.setdefault((team.name, baseline_date, hour), []).append(
+                        (team.name, date, hour))
+
+    usages = _get_local_baseline_usages(teams, baseline_dates)
+    usages.update(_fetch_baseline_usages(
+        [sample for sample in samples if sample not in usages]))
+
+    history = {}
+    for sample, keys in samples.items():
+        for key in keys:
+            history.setdefault(key, []).append(usages.get(sample))
+    return history
+
+
+def _get_baseline_dates(dates, weeks):
+    """Returns a dict of each date to the dates of the baseline weeks it is computed from,
+    skipping the blackout dates."""
+    blackout_dates = resource_mgr.get_blackout_dates()
+
+    baseline_dates = {}
+    for date in dates:
+        baseline_dates[date] = []
+        baseline_date = date
+        for _ in range(0, weeks):
+            baseline_date = _get_baseline_date(baseline_date, blackout_dates)
+            baseline_dates[date].append(baseline_date)
+    return baseline_dates
+
+
+def _fetch_baseline_usages(samples):
+    """Returns a dict of (team name, date, hour) to the energy usage up to the hour fetched
+    from WattDepot, for the samples which could be fetched."""
+    windows = {}
+    for sample in samples:
+        name, baseline_date, hour = sample
+        midnight = datetime.datetime.combine(baseline_date, datetime.time())
+        windows[(name, midnight.strftime("%Y-%m-%dT%H:%M:%S"),
+                 (midnight + datetime.timedelta(hours=hour)).strftime(
+                     "%Y-%m-%dT%H:%M:%S"))] = sample
+
+    # there can be thousands of windows, wait for all of them rather than the
+    # budget of a regular energy usage update.
+    usages = {}
+    for window, (usage, _) in resource_mgr.fetch_energy_windows(
+        windows.keys(), time_budget=None).items():
+        if usage is not None:
+            usages[windows[window]] = usage
+    return usages
+
+
+def _get_local_baseline_usages(teams, baseline_dates):
+    """Returns a dict of (team name, date, hour) to the energy usage up to the hour from the
+    local rollups, for the baseline dates available locally."""
+    all_dates = [date for dates in baseline_dates.values() for date in dates]
+    start = datetime.datetime.combine(min(all_dates), datetime.time())
+    end = datetime.datetime.combine(max(all_dates), datetime.time()) + \
+          datetime.timedelta(days=1)
+
+    usages = {}
+    for (name, hour_start), usage in resource_mgr.get_usage_rollups(
+        "energy", teams, start, end, "hourly").items():
+        usages[(name, hour_start.date(), hour_start.hour + 1)] = usage
+    for (name, day_start), usage in resource_mgr.get_usage_rollups(
+        "energy", teams, start, end, "daily").items():
+        usages[(name, day_start.date(), 24)] = usage
+    return usages
+
+
+def _average_baseline_usage(usages):
+    """Returns the average of the baseline week usages, ignoring the weeks without data."""
+    usages = [usage for usage in usages if usage]
+    if usages:
+        return sum(usages) / len(usages)
+    else:
+        return 0
 
 
 def _adjust_goal_percent(date, team, resource, goal_settings, goal):
@@ -234,19 +349,16 @@ def check_daily_resource_goal(team, resource):
 
                 # Award points to the members of the team.
                 goal_points = goal_settings.goal_points
-                for profile in team.profile_set.all():
-                    if profile.setup_complete:
-                        today = datetime.datetime.today()
-                        # Hack to get around executing this script at midnight.  We want to award
-                        # points earlier to ensure they are within the round they were completed.
-                        if today.hour == 0:
-                            today = today - datetime.timedelta(hours=1)
-
-                        date = "%d/%d/%d" % (today.month, today.day, today.year)
-                        profile.add_points(goal_points, today,
-                                           "Team %s Goal for %s" % (resource, date), goal)
-                        profile.save()
-                        count += 1
+                today = datetime.datetime.today()
+                # Hack to get around executing this script at midnight.  We want to award
+                # points earlier to ensure they are within the round they were completed.
+                if today.hour == 0:
+                    today = today - datetime.timedelta(hours=1)
+
+                date = "%d/%d/%d" % (today.month, today.day, today.year)
+                profiles = team.profile_set.filter(setup_complete=True).select_related("user")
+                count = score_mgr.bulk_add_points(profiles, goal_points, today,
+                                                  "Team %s Goal for %s" % (resource, date), goal)
         else:
             goal.goal_status = "Over the goal"
     else:
@@ -276,40 +388,178 @@ def check_all_daily_resource_goals(resource):
 
 def resource_goal_ranks(resource, round_name=None):
     """Generate the scoreboard for resource goals."""
-    cache_key = "%s_goal_ranks-%s" % (resource, slugify(round_name))
-    goal_ranks = cache_mgr.get_cache(cache_key)
-    if goal_ranks is None:
-        goal_ranks = []
-        goal = _get_resource_goal(resource)
-
-        round_info = challenge_mgr.get_round_info(round_name)
-        if not round_info:
-            return None
-
-        ranks = goal.objects.filter(
-            goal_status="Below the goal",
-            date__lte=round_info["end"].date).values("team__name").annotate(
-                completions=Count("team"),
-                average_reduction=Avg("percent_reduction")).order_by(
-                    "-completions", "-average_reduction")
-
-        for rank in ranks:
-            goal_ranks.append(rank)
-
-        total_count = Team.objects.count()
-        if len(goal_ranks) != total_count:
-            for t in Team.objects.all():
-                if not t.name in goal_ranks:
-                    rank = {"team__name": t.name,
-                            "completions": 0,
-                            "average_reduction": 0}
-                    goal_ranks.append(rank)
-                    if len(goal_ranks) == total_count:
-                        break
-        cache_mgr.set_cache(cache_key, goal_ranks, 3600 * 24)
+    round_info = challenge_mgr.get_round_info(round_name)
+    if not round_info:
+        return None
+
+    goal_ranks = []
+    for team_name, completions, total_reduction in _get_goal_round_totals(
+        resource, round_info["name"]):
+        goal_ranks.append({"team__name": team_name,
+                           "completions": completions,
+                           "average_reduction": float(total_reduction) / completions})
+    goal_ranks.sort(key=lambda rank: (rank["completions"], rank["average_reduction"]),
+                    reverse=True)
+
+    ranked_teams = set(rank["team__name"] for rank in goal_ranks)
+    for name in Team.objects.values_list("name", flat=True):
+        if not name in ranked_teams:
+            goal_ranks.append({"team__name": name,
+                               "completions": 0,
+                               "average_reduction": 0})
     return goal_ranks
 
 
+def _get_goal_round_totals(resource, round_name):
+    """Returns the list of (team name, completions, total reduction) of the teams which met
+    the resource goal up to the end of the round. The totals of a round which are not built
+    yet are aggregated from the goal table, without being stored."""
+    if resource_mgr.is_round_total_built(_goal_totals_name(resource), round_name):
+        return list(ResourceGoalRoundTotal.objects.filter(
+            resource=resource, round_name=round_name, completions__gt=0).values_list(
+            "team__name", "completions", "total_reduction"))
+
+    return [(goal_total["team__name"], goal_total["completions"],
+             goal_total["total_reduction"] or 0)
+            for goal_total in _aggregate_goal_round_totals(resource, round_name)]
+
+
+def _goal_totals_name(resource):
+    """Returns the name of the goal round totals of the resource."""
+    return "%s_goal" % resource
+
+
+def _aggregate_goal_round_totals(resource, round_name):
+    """Returns the goals met by all teams up to the end of the round, aggregated from the
+    goal table."""
+    goal = _get_resource_goal(resource)
+    round_end = challenge_mgr.get_all_round_info_from_cache()["rounds"][round_name]["end"]
+    # the default ordering of the goals would split the totals by date.
+    return goal.objects.filter(
+        goal_status="Below the goal",
+        date__lte=round_end.date()).values("team", "team__name").annotate(
+            completions=Count("team"), total_reduction=Sum("percent_reduction")).order_by()
+
+
+def rebuild_goal_round_totals(resource, round_name):
+    """Rebuilds the goals met by all teams up to the end of the round, from the goal table,
+    and marks them built. Returns the number of totals created."""
+    name = _goal_totals_name(resource)
+    RoundTotalBuild.objects.filter(name=name, round_name=round_name).delete()
+    resource_mgr.claim_round_total_build(name, round_name)
+    return _build_goal_round_totals(resource, round_name)
+
+
+def rebuild_all_goal_round_totals():
+    """Rebuilds the goal round totals of all the resources for all the rounds.
+    Returns the number of totals created."""
+    count = 0
+    for round_name in challenge_mgr.get_all_round_info_from_cache()["rounds"]:
+        for resource in ("energy", "water"):
+            count += rebuild_goal_round_totals(resource, round_name)
+    return count
+
+
+def _build_goal_round_totals(resource, round_name):
+    """Replaces the goal round totals of the resource with the aggregated totals."""
+    goal_totals = list(_aggregate_goal_round_totals(resource, round_name))
+    totals = [ResourceGoalRoundTotal(resource=resource, team_id=goal_total["team"],
+                                     round_name=round_name,
+                                     completions=goal_total["completions"],
+                                     total_reduction=goal_total["total_reduction"] or 0)
+              for goal_total in goal_totals]
+
+    ResourceGoalRoundTotal.objects.filter(resource=resource, round_name=round_name).delete()
+    ResourceGoalRoundTotal.objects.bulk_create(totals)
+    return len(goal_totals)
+
+
+def _update_goal_round_totals(resource, changes):
+    """Applies the changes, a list of (team_id, date, completions delta, reduction delta),
+    to the goals met of the rounds ending on or after the date. The totals of a round which
+    have not been built yet are built from the current goal table instead."""
+    rounds = challenge_mgr.get_all_round_info_from_cache()["rounds"]
+    name = _goal_totals_name(resource)
+    for round_name, round_info in rounds.items():
+        if not resource_mgr.is_round_total_built(name, round_name):
+            if resource_mgr.claim_round_total_build(name, round_name):
+                _build_goal_round_totals(resource, round_name)
+            continue
+
+        for team_id, date, completions, reduction in changes:
+            if completions and date <= round_info["end"].date():
+                if not ResourceGoalRoundTotal.objects.filter(
+                    resource=resource, team=team_id, round_name=round_name).update(
+                    completions=F("completions") + completions,
+                    total_reduction=F("total_reduction") + reduction):
+                    ResourceGoalRoundTotal.objects.create(
+                        resource=resource, team_id=team_id, round_name=round_name,
+                        completions=completions, total_reduction=reduction)
+
+    # the resource goal leaders may have changed, once the changes are committed.
+    cache_mgr.invalidate_namespace_on_commit("leaders")
+
+
+def _goal_resource(sender):
+    """Returns the resource name of the goal model."""
+    return {EnergyGoal: "energy", WaterGoal: "water"}[sender]
+
+
+def _goal_change(goal, sign):
+    """Returns the (team_id, date, completions delta, reduction delta) change of adding
+    (sign 1) or removing (sign -1) the goal from the totals."""
+    if goal.goal_status == "Below the goal":
+        return goal.team_id, goal.date, sign, sign * goal.percent_reduction
+    else:
+        return goal.team_id, goal.date, 0, 0
+
+
+def _goal_pre_save(sender, instance=None, **kwargs):
+    """Remembers the previous state of the goal being saved."""
+    _ = kwargs
+    instance.previous_goal = None
+    if instance.pk:
+        previous = sender.objects.filter(pk=instance.pk)
+        if previous:
+            instance.previous_goal = previous[0]
+
+
+def _goal_saved(sender, instance=None, **kwargs):
+    """Moves the goals met by the team from the previous state to the saved goal."""
+    _ = kwargs
+    changes = []
+    if instance.previous_goal:
+        changes.append(_goal_change(instance.previous_goal, -1))
+    changes.append(_goal_change(instance, 1))
+    _update_goal_round_totals(_goal_resource(sender), changes)
+
+
+def _goal_deleted(sender, instance=None, **kwargs):
+    """Removes the deleted goal from the goals met by the team."""
+    _ = kwargs
+    _update_goal_round_totals(_goal_resource(sender), [_goal_change(instance, -1)])
+
+
+def _round_setting_changed(sender, **kwargs):
+    """Rebuilds the goal round totals with the new rounds."""
+    _ = sender
+    _ = kwargs
+    # the signal is sent before RoundSetting.save clears the cached rounds.
+    cache_mgr.delete("rounds")
+    ResourceGoalRoundTotal.objects.all().delete()
+    RoundTotalBuild.objects.filter(name__endswith="_goal").delete()
+    if RoundSetting.objects.exists():
+        rebuild_all_goal_round_totals()
+
+
+for goal_model in (EnergyGoal, WaterGoal):
+    pre_save.connect(_goal_pre_save, sender=goal_model)
+    post_save.connect(_goal_saved, sender=goal_model)
+    post_delete.connect(_goal_deleted, sender=goal_model)
+post_save.connect(_round_setting_changed, sender=RoundSetting)
+post_delete.connect(_round_setting_changed, sender=RoundSetting)
+
+
 def resource_goal_leader(name, round_name=None):
     """Returns the leader (team name) of the resource use."""
     ranks = resource_goal_ranks(name, round_name)
@@ -10,7 +10,9 @@ from django.contrib.auth.models import User
 from apps.managers.team_mgr.models import Team
 from apps.utils import test_utils
 from apps.widgets.resource_goal import resource_goal
-from apps.widgets.resource_goal.models import EnergyGoalSetting, EnergyBaselineDaily
+from apps.widgets.resource_goal.models import EnergyGoalSetting, EnergyBaselineDaily, \
+    EnergyBaselineHourly
+from apps.managers.resource_mgr import resource_mgr
 from apps.managers.resource_mgr.models import EnergyUsage
 
 
@@ -84,3 +86,61 @@ class TeamEnergyGoalTest(TransactionTestCase):
         profile = Profile.objects.get(user__username="user")
         self.assertEqual(profile.points(), points + goal_settings.goal_points,
             "User that setup their profile should be awarded points.")
+
+    def testFixedEnergyBaseline(self):
+        """Test computing the fixed energy baselines from the history data."""
+        def fetch_energy_windows(windows, **kwargs):
+            """Return 10 kWh per hour up to the end time of each window."""
+            _ = kwargs
+            return dict((window, (int(window[2][11:13]) * 10 or 240, 0.1))
+                        for window in windows)
+
+        fetch = resource_mgr.fetch_energy_windows
+        resource_mgr.fetch_energy_windows = fetch_energy_windows
+        try:
+            resource_goal.cal_energy_baseline([self.team], "Fixed", datetime.date.today(), 2)
+        finally:
+            resource_mgr.fetch_energy_windows = fetch
+
+        self.assertEqual(EnergyBaselineDaily.objects.filter(team=self.team).count(), 7,
+                         "There should be a daily baseline for each day of the week.")
+        self.assertEqual(EnergyBaselineHourly.objects.filter(team=self.team).count(), 7 * 24,
+                         "There should be an hourly baseline for each hour of the week.")
+        self.assertEqual(EnergyBaselineDaily.objects.get(team=self.team, day=0).usage, 240,
+                         "The daily baseline should be the usage of the whole day.")
+        self.assertEqual(
+            EnergyBaselineHourly.objects.get(team=self.team, day=0, hour=5).usage, 50,
+            "The hourly baseline should be the usage up to the hour.")
+
+    def testFailedEnergyBaseline(self):
+        """Test that the baselines are kept when their history can not be fetched."""
+        EnergyBaselineDaily.objects.create(team=self.team, day=0, usage=240)
+        EnergyBaselineDaily.objects.create(team=self.team, day=1, usage=240)
+        failed_date = datetime.date.today()
+        while failed_date.weekday() != 0:
+            failed_date -= datetime.timedelta(days=1)
+
+        def fetch_energy_windows(windows, **kwargs):
+            """Fail the windows of Mondays, return 5 kWh per hour for the other days."""
+            _ = kwargs
+            results = {}
+            for window in windows:
+                if datetime.datetime.strptime(window[1][:10], "%Y-%m-%d").weekday() == 0:
+                    results[window] = (None, 0.1)
+                else:
+                    results[window] = (int(window[2][11:13]) * 5 or 120, 0.1)
+            return results
+
+        fetch = resource_mgr.fetch_energy_windows
+        resource_mgr.fetch_energy_windows = fetch_energy_windows
+        try:
+            resource_goal.cal_energy_baseline([self.team], "Fixed", failed_date, 2)
+        finally:
+            resource_mgr.fetch_energy_windows = fetch
+
+        self.assertEqual(EnergyBaselineDaily.objects.get(team=self.team, day=0).usage, 240,
+                         "The baseline of the failed day should be kept.")
+        self.assertEqual(EnergyBaselineHourly.objects.filter(team=self.team, day=0).count(), 0,
+                         "There should not be any hourly baseline for the failed day.")
+        self.assertEqual(EnergyBaselineDaily.objects.get(team=self.team, day=1).usage, 120,
+                         "The baseline of the other days should be replaced.")
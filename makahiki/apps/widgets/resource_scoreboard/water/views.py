@@ -2,6 +2,10 @@
 from apps.widgets.resource_scoreboard.views import resource_supply
 
 
+SUPPLY_CONCURRENT = True
+"""The water ranks are only read, so they can be supplied concurrently."""
+
+
 def supply(request, page_name):
     """Supply the view_objects content."""
     _ = request
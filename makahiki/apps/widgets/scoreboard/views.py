@@ -4,6 +4,10 @@ from apps.managers.player_mgr import player_mgr
 from apps.managers.team_mgr import team_mgr
 
 
+SUPPLY_CONCURRENT = True
+"""The standings are only read, so they can be supplied concurrently."""
+
+
 def supply(request, page_name):
     """Supply the view_objects content for this widget, which is all the scoreboard data."""
 
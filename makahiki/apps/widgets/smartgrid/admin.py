@@ -1,7 +1,6 @@
 """Admin definition for Smart Grid Game widget."""
 from django.db import models
 from django.http import HttpResponseRedirect
-from apps.managers.cache_mgr import cache_mgr
 from apps.managers.challenge_mgr import challenge_mgr
 from apps.utils import utils
 from apps.widgets.smartgrid.models import ActionMember, Activity, Category, Event, \
@@ -155,7 +154,6 @@ class ActivityAdminForm(forms.ModelForm):
         activity = super(ActivityAdminForm, self).save(*args, **kwargs)
         activity.type = "activity"
         activity.save()
-        cache_mgr.clear()
 
         # If the activity's confirmation type is text, make sure to save the questions.
         if self.cleaned_data.get("confirm_type") == "text":
@@ -238,8 +236,6 @@ class EventAdminForm(forms.ModelForm):
             event.type = "event"
         event.save()
 
-        cache_mgr.clear()
-
         # Generate confirmation codes if needed.
         if self.cleaned_data.get("num_codes") > 0:
             ConfirmationCode.generate_codes_for_activity(event,
@@ -264,7 +260,6 @@ class CommitmentAdminForm(forms.ModelForm):
         commitment = super(CommitmentAdminForm, self).save(*args, **kwargs)
         commitment.type = "commitment"
         commitment.save()
-        cache_mgr.clear()
 
         return commitment
 
@@ -282,7 +277,6 @@ class FillerAdminForm(forms.ModelForm):
         filler.unlock_condition_text = "This cell is here only to fill out the grid. " \
                                        "There is no action associated with it."
         filler.save()
-        cache_mgr.clear()
 
         return filler
 
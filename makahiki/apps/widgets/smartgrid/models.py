@@ -1,10 +1,9 @@
 """Smart Grid Game model definition."""
 
 import datetime
-import random
 from django.core.exceptions import ObjectDoesNotExist
 
-from django.db import models, IntegrityError
+from django.db import models
 from django.contrib.auth.models import User
 from django.contrib.contenttypes import generic
 from django.core.urlresolvers import reverse
@@ -17,9 +16,11 @@ from apps.managers.challenge_mgr import challenge_mgr
 from apps.managers.score_mgr import score_mgr
 from apps.managers.score_mgr.models import PointsTransaction
 from apps.managers.team_mgr.models import Post
+from apps.utils import utils
 from apps.utils.utils import media_file_path
 from apps.widgets.badges import badges
 from apps.widgets.notifications.models import UserNotification
+from apps.widgets.quests import quests
 from apps.managers.cache_mgr import cache_mgr
 from apps.widgets.smartgrid import NOSHOW_PENALTY_DAYS, SETUP_WIZARD_ACTIVITY
 
@@ -64,7 +65,7 @@ class Level(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method to set fields."""
         super(Level, self).save(args, kwargs)
-        cache_mgr.clear()
+        cache_mgr.invalidate_namespace("smartgrid")
 
 
 class Category(models.Model):
@@ -89,7 +90,7 @@ class Category(models.Model):
     def save(self, *args, **kwargs):
         """Custom save method to set fields."""
         super(Category, self).save(args, kwargs)
-        cache_mgr.clear()
+        cache_mgr.invalidate_namespace("smartgrid")
 
 
 class TextPromptQuestion(models.Model):
@@ -128,34 +129,23 @@ class ConfirmationCode(models.Model):
 
     @staticmethod
     def generate_codes_for_activity(event, num_codes):
-        """Generates a set of random codes for the activity."""
-        values = 'abcdefghijkmnpqrstuvwxyz234789'
-
+        """Generates a set of random codes for the activity. Returns the list of codes."""
         # Use the first non-dash component of the slug.
         components = event.slug.split('-')
         header = components[0]
         # Need to see if there are other codes with this header.
+        other_codes = [code.lower() for code in ConfirmationCode.objects.filter(
+            code__istartswith=header).exclude(action=event).values_list("code", flat=True)]
         index = 1
-        while ConfirmationCode.objects.filter(code__istartswith=header).exclude(
-            action=event).count() > 0 and index < len(components):
+        while index < len(components) and [code for code in other_codes
+                                            if code.startswith(header.lower())]:
             header += components[index]
             index += 1
 
         header += "-"
-        for _ in range(0, num_codes):
-            code = ConfirmationCode(action=event, code=header)
-            valid = False
-            while not valid:
-                for value in random.sample(values, 5):
-                    code.code += value
-                try:
-                    # print code.code
-                    # Throws exception if the code is a duplicate.
-                    code.save()
-                    valid = True
-                except IntegrityError:
-                    # Try again.
-                    code.code = header
+        return utils.bulk_create_codes(
+            ConfirmationCode, header, num_codes,
+            lambda code: ConfirmationCode(action=event, code=code))
 
 
 class Action(models.Model):
@@ -269,6 +259,20 @@ class Action(models.Model):
         """Returns the concrete action object by type."""
         return action_type.objects.get(action_ptr=self.pk)
 
+    def save(self, *args, **kwargs):
+        """Custom save method to invalidate the smartgrid caches and the supplied view objects
+        of the widgets listing the actions."""
+        super(Action, self).save(*args, **kwargs)
+        cache_mgr.invalidate_namespace("smartgrid")
+        cache_mgr.invalidate_namespace("supply")
+
+    def delete(self, *args, **kwargs):
+        """Custom delete method to invalidate the smartgrid caches and the supplied view
+        objects of the widgets listing the actions."""
+        super(Action, self).delete(*args, **kwargs)
+        cache_mgr.invalidate_namespace("smartgrid")
+        cache_mgr.invalidate_namespace("supply")
+
     class Meta:
         """Meta"""
         ordering = ("level", "category", "priority")
@@ -535,8 +539,9 @@ class ActionMember(models.Model):
                 self._handle_activity_notification(self.approval_status)
 
         self.post_to_wall()
-        self.invalidate_cache()
-        badges.award_possible_badges(self.user.get_profile())
+        changes = self.get_state_changes()
+        self.invalidate_cache(changes)
+        badges.award_possible_badges(self.user.get_profile(), changes)
 
     def _award_points(self):
         """Custom save method to award points."""
@@ -716,20 +721,38 @@ class ActionMember(models.Model):
                         style_class="system_post")
             post.save()
 
-    def invalidate_cache(self):
-        """Invalidate the categories cache."""
+    def get_state_changes(self):
+        """Returns the user state keys changed by this action member."""
+        from apps.widgets.smartgrid import smartgrid
+        return smartgrid.get_member_changes(self)
+
+    def invalidate_cache(self, changes=None):
+        """Invalidate the categories cache. If changes is given, only the unlock conditions and
+        quests depending on the changed user state keys are re-evaluated."""
+        from apps.widgets.smartgrid import smartgrid
+
         username = self.user.username
-        cache_mgr.delete('smartgrid-levels-%s' % username)
-        cache_mgr.delete('smartgrid-completed-%s' % username)
-        cache_mgr.delete('user_events-%s' % username)
-        cache_mgr.delete('get_quests-%s' % username)
-        cache_mgr.delete('golow_actions-%s' % username)
+        keys = ['smartgrid-completed-%s' % username,
+                'smartgrid-state-%s' % username,
+                'user_events-%s' % username,
+                'golow_actions-%s' % username]
+        if changes is None:
+            keys += ['smartgrid-overlay-%s' % username,
+                     'get_quests-%s' % username]
+        cache_mgr.delete_many(keys, namespace="smartgrid")
 
         team = self.user.get_profile().team
         if team:
             cache_mgr.invalidate_template_cache("team_avatar", self.action.id, team.id)
-        cache_mgr.invalidate_template_cache("commitments", username)
-        cache_mgr.invalidate_template_cache("smartgrid", username)
+        generation = cache_mgr.namespace_generation("smartgrid")
+        cache_mgr.invalidate_template_cache("commitments", username, generation)
+        cache_mgr.invalidate_template_cache("smartgrid", username, generation)
+
+        utils.clear_predicate_memo(self.user)
+
+        if changes is not None:
+            smartgrid.update_unlock_overlay(self.user, changes)
+            quests.invalidate_affected_quests(self.user, changes)
 
     def delete(self, using=None):
         """Custom delete method to remove the points for completed action."""
@@ -751,10 +774,11 @@ class ActionMember(models.Model):
                         style_class="system_post")
             post.save()
 
-        self.invalidate_cache()
-
+        changes = self.get_state_changes()
         super(ActionMember, self).delete()
 
+        self.invalidate_cache(changes)
+
 
 class Reminder(models.Model):
     """
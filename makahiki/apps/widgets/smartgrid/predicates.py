@@ -1,9 +1,9 @@
 """Predicates indicating if a level or cell should be unlocked."""
 
 from datetime import datetime, timedelta
-from django.db.models.query_utils import Q
+from apps.utils import utils
 from apps.widgets.smartgrid import smartgrid
-from apps.widgets.smartgrid.models import Action, Event
+from apps.widgets.smartgrid.models import Event
 
 
 def completed_action(user, slug):
@@ -11,31 +11,40 @@ def completed_action(user, slug):
     return slug in smartgrid.get_completed_actions(user)
 
 
-def completed_all_of(user, category_slug=None, action_type=None, resource=None, level_name=None):
-    """Returns true if completed all of the specified type."""
-
+def _state_key(category_slug=None, action_type=None, resource=None, level_name=None):
+    """Returns the action state key of the specified type, in the order of precedence."""
     if category_slug:
-        count = Action.objects.filter(category__slug=category_slug).count()
-        return not count and \
-               user.actionmember_set.filter(action__category__slug=category_slug).count() == count
-
+        return ("category", category_slug)
     if action_type:
-        count = Action.objects.filter(type=action_type).count()
-        return not count and \
-               user.actionmember_set.filter(action__type=action_type).count() == count
-
+        return ("type", action_type)
     if resource:
-        count = Action.objects.filter(related_resource=resource).count()
-        return not count and \
-               user.actionmember_set.filter(action__related_resource=resource).count() == count
-
+        return ("resource", resource)
     if level_name:
-        count = Action.objects.filter(level__name=level_name).count()
-        return not count and \
-               user.actionmember_set.filter(action__level__name=level_name).count() == count
+        return ("level", level_name)
+    return ("all", None)
+
+
+def get_dependency_keys(name, callargs):
+    """Returns the action state keys the predicate call depends on, given the name of the
+    predicate and its arguments. The keys are the ones of smartgrid.action_state_keys, plus
+    ("action", slug), ("social_bonus", None) and utils.TIME_STATE_KEY."""
+    if name in ("completed_action", "approved_action"):
+        return [("action", callargs["slug"])]
+    if name == "completed_level":
+        return [("level_task", callargs["lvl"])]
+    if name == "social_bonus_count":
+        return [("social_bonus", None)]
+    if name in ("unlock_on_date", "unlock_on_event"):
+        return [utils.TIME_STATE_KEY]
+    return [_state_key(callargs.get("category_slug"), callargs.get("action_type"),
+                       callargs.get("resource"), callargs.get("level_name"))]
+
 
-    count = Action.objects.all().count()
-    return not count and user.actionmember_set.all().count() == count
+def completed_all_of(user, category_slug=None, action_type=None, resource=None, level_name=None):
+    """Returns true if completed all of the specified type."""
+    key = _state_key(category_slug, action_type, resource, level_name)
+    count = smartgrid.get_action_totals().get(key, 0)
+    return not count and smartgrid.get_action_state(user)["completed"].get(key, 0) == count
 
 
 def completed_some_of_level(user, some=1, level_name=None):
@@ -47,30 +56,16 @@ def completed_some_of(user, some=1, category_slug=None, action_type=None, resour
                       level_name=None):
     """Returns true if completed some of the specified type.
     some is default to 1 if not specified."""
-    if category_slug:
-        return user.actionmember_set.filter(action__category__slug=category_slug).count() >= some
-
-    if action_type:
-        return user.actionmember_set.filter(action__type=action_type).count() >= some
-
-    if resource:
-        return user.actionmember_set.filter(action__related_resource=resource).count() >= some
-
-    if level_name:
-        return user.actionmember_set.filter(action__level__name=level_name).count() >= some
-
-    return user.actionmember_set.all().count() >= some
+    key = _state_key(category_slug, action_type, resource, level_name)
+    return smartgrid.get_action_state(user)["completed"].get(key, 0) >= some
 
 
 def completed_level(user, lvl=1):
     """Returns true if the user has performed all activities successfully, and
       attempted all commitments."""
-    num_completed = user.actionmember_set.filter(
-        Q(action__type='activity') | Q(action__type='commitment'),
-        action__level__priority=lvl).count()
-    num_level = Action.objects.filter(
-        Q(type='activity') | Q(type='commitment'),
-        level__priority=lvl).count()
+    key = ("level_task", lvl)
+    num_completed = smartgrid.get_action_state(user)["completed"].get(key, 0)
+    num_level = smartgrid.get_action_totals().get(key, 0)
 
     # check if there is any activity or commitment
     if not num_level:
@@ -103,59 +98,23 @@ def unlock_on_event(user, event_slug, days=0):
 
 def approved_action(user, slug):
     """Returns true if the action is approved."""
-    return user.actionmember_set.filter(action__slug=slug, approval_status="approved").count() > 0
+    return slug in smartgrid.get_action_state(user)["approved_slugs"]
 
 
 def approved_some_of(user, some=1, category_slug=None, action_type=None, resource=None,
                      level_name=None):
     """Returns true if some actions of the specified type is approved."""
-
-    if category_slug:
-        return user.actionmember_set.filter(action__category__slug=category_slug,
-                                            approval_status="approved").count() >= some
-
-    if action_type:
-        return user.actionmember_set.filter(action__type=action_type,
-                                            approval_status="approved").count() >= some
-
-    if resource:
-        return user.actionmember_set.filter(action__related_resource=resource,
-                                            approval_status="approved").count() >= some
-
-    if level_name:
-        return user.actionmember_set.filter(action__level__name=level_name,
-                                            approval_status="approved").count() >= some
-
-    return user.actionmember_set.filter(approval_status="approved").count() >= some
+    key = _state_key(category_slug, action_type, resource, level_name)
+    return smartgrid.get_action_state(user)["approved"].get(key, 0) >= some
 
 
 def approved_all_of(user, category_slug=None, action_type=None, resource=None, level_name=None):
     """Returns true if all actions of the specified type is approved."""
-
-    if category_slug:
-        count = Action.objects.filter(category__slug=category_slug).count()
-        return not count and user.actionmember_set.filter(action__category__slug=category_slug,
-                                            approval_status="approved").count() == count
-
-    if action_type:
-        count = Action.objects.filter(type=action_type).count()
-        return not count and user.actionmember_set.filter(action__type=action_type,
-                                            approval_status="approved").count() == count
-
-    if resource:
-        count = Action.objects.filter(related_resource=resource).count()
-        return not count and user.actionmember_set.filter(action__related_resource=resource,
-                                            approval_status="approved").count() == count
-
-    if level_name:
-        count = Action.objects.filter(level__name=level_name).count()
-        return not count and user.actionmember_set.filter(action__level__name=level_name,
-                                            approval_status="approved").count() == count
-
-    count = Action.objects.all().count()
-    return not count and user.actionmember_set.filter(approval_status="approved").count() == count
+    key = _state_key(category_slug, action_type, resource, level_name)
+    count = smartgrid.get_action_totals().get(key, 0)
+    return not count and smartgrid.get_action_state(user)["approved"].get(key, 0) == count
 
 
 def social_bonus_count(user, count):
     """Returns True if the number of social bonus the user received equals to count."""
-    return user.actionmember_set.filter(social_bonus_awarded=True).count() >= count
+    return smartgrid.get_action_state(user)["social_bonus"] >= count
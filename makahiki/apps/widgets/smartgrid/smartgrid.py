@@ -4,7 +4,6 @@ import datetime
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.exceptions import ObjectDoesNotExist
-from django.core.mail.message import EmailMultiAlternatives
 from django.core.urlresolvers import reverse
 from django.db.models import  Count
 from django.db.models.query_utils import Q
@@ -17,7 +16,7 @@ from apps.widgets.notifications.models import NoticeTemplate, UserNotification
 from apps.widgets.smartgrid import NUM_GOLOW_ACTIONS, SETUP_WIZARD_ACTIVITY, NOSHOW_PENALTY_DAYS
 from apps.widgets.smartgrid.models import Action, ActionMember, Level, EmailReminder, \
     TextReminder
-from apps.widgets.smartgrid.models import Event
+from apps.widgets.smartgrid.models import Event, Activity
 from apps.widgets.smartgrid import  MAX_COMMITMENTS
 
 
@@ -93,7 +92,7 @@ def get_action_members(action):
 def get_completed_actions(user):
     """returns the completed action for the user. It is stored as a dict of action slugs and
     its member status."""
-    actions = cache_mgr.get_cache('smartgrid-completed-%s' % user.username)
+    actions = cache_mgr.get_cache('smartgrid-completed-%s' % user.username, namespace="smartgrid")
     if actions is None:
         actions = {}
         for member in ActionMember.objects.filter(
@@ -106,59 +105,228 @@ def get_completed_actions(user):
                 actions[slug] = {"days_left": member.days_left(),
                                  "award_date": member.award_date,
                                  }
-        cache_mgr.set_cache('smartgrid-completed-%s' % user, actions, 1800)
+        cache_mgr.set_cache('smartgrid-completed-%s' % user, actions, 1800, namespace="smartgrid")
     return actions
 
 
-def get_level_actions(user):
-    """Return the level list with the action info in categories"""
-    levels = cache_mgr.get_cache('smartgrid-levels-%s' % user.username)
-
-    if levels is None:
-        completed_actions = get_completed_actions(user)
-        levels = []
+def get_action_state(user):
+    """Returns the action state snapshot of the user, loaded in one query. It is a dict of:
+      completed: the number of the user's action members, keyed by the state key.
+      approved: the number of the user's approved action members, keyed by the state key.
+      approved_slugs: the set of the slugs of the approved actions.
+      social_bonus: the number of the action members awarded with social bonus.
+    The state key is one of ("all", None), ("category", slug), ("type", type),
+    ("resource", resource), ("level", name) and ("level_task", priority), see action_state_keys.
+    """
+    state = cache_mgr.get_cache('smartgrid-state-%s' % user.username, namespace="smartgrid")
+    if state is None:
+        state = {"completed": {}, "approved": {}, "approved_slugs": set(), "social_bonus": 0}
+        members = ActionMember.objects.filter(user=user).values_list(
+            "action__slug", "action__type", "action__category__slug", "action__related_resource",
+            "action__level__name", "action__level__priority", "approval_status",
+            "social_bonus_awarded")
+        for member in members:
+            slug, approval_status, social_bonus_awarded = member[0], member[6], member[7]
+            keys = action_state_keys(*member[1:6])
+            _count_keys(state["completed"], keys)
+            if approval_status == "approved":
+                _count_keys(state["approved"], keys)
+                state["approved_slugs"].add(slug)
+            if social_bonus_awarded:
+                state["social_bonus"] += 1
+        cache_mgr.set_cache('smartgrid-state-%s' % user.username, state, 1800,
+                            namespace="smartgrid")
+    return state
+
+
+def get_action_totals():
+    """Returns the number of actions keyed by the state key, loaded in one query.
+    See get_action_state for the state keys."""
+    totals = cache_mgr.get_cache('smartgrid-action-totals', namespace="smartgrid")
+    if totals is None:
+        totals = {}
+        actions = Action.objects.values_list("type", "category__slug", "related_resource",
+                                             "level__name", "level__priority")
+        for action_type, category_slug, resource, level_name, level_priority in actions:
+            _count_keys(totals, action_state_keys(action_type, category_slug, resource,
+                                                  level_name, level_priority))
+        cache_mgr.set_cache('smartgrid-action-totals', totals, 1800, namespace="smartgrid")
+    return totals
+
+
+def action_state_keys(action_type, category_slug, resource, level_name, level_priority):
+    """Returns the state keys an action is counted in."""
+    keys = [("all", None), ("type", action_type)]
+    if category_slug:
+        keys.append(("category", category_slug))
+    if resource:
+        keys.append(("resource", resource))
+    if level_name:
+        keys.append(("level", level_name))
+    if action_type in ("activity", "commitment"):
+        keys.append(("level_task", level_priority))
+    return keys
+
+
+def _count_keys(counts, keys):
+    """Increase the count of each of the keys."""
+    for key in keys:
+        counts[key] = counts.get(key, 0) + 1
+
+
+def get_grid_skeleton():
+    """Returns the smart grid content shared by all users. It is a list of the levels, each a dict
+    of the level fields and its categories, each a dict of the category name and its actions,
+    each a dict of the action fields rendered in the grid. The skeleton holds plain values only
+    and is cached once per version of the smartgrid content."""
+    skeleton = cache_mgr.get_cache('smartgrid-skeleton', namespace="smartgrid")
+    if skeleton is None:
+        point_range_ends = dict(Activity.objects.values_list("id", "point_range_end"))
+        event_dates = dict(Event.objects.values_list("id", "event_date"))
+
+        skeleton = []
         for level in Level.objects.all():
-            level.is_unlock = utils.eval_predicates(level.unlock_condition, user)
-            if level.is_unlock:
-                level.is_complete = True
-                categories = []
-                action_list = None
-                category = None
-                for action in level.action_set.all().select_related("category"):
-                    if action.slug in completed_actions:
-                        action.member = completed_actions[action.slug]
-                        action.is_unlock = True
-                        action.completed = True
-                    else:
-                        action.is_unlock = is_unlock(user, action)
-                        action.completed = False
-
-                    # if there is one action is not completed, set the level to in-completed
-                    if not action.completed:
-                        level.is_complete = False
-
-                    # the action are ordered by level and category
-                    if category != action.category:
-                        if category:
-                            # a new category
-                            category.task_list = action_list
-                            categories.append(category)
-
-                        action_list = []
-                        category = action.category
+            categories = []
+            category = None
+            for action in level.action_set.all().select_related("category"):
+                # the action are ordered by level and category
+                if category is None or category["id"] != action.category_id:
+                    category = {"id": action.category_id,
+                                "name": action.category.name if action.category else "",
+                                "actions": []}
+                    categories.append(category)
 
-                    action_list.append(action)
+                category["actions"].append({
+                    "id": action.id,
+                    "slug": action.slug,
+                    "name": action.name,
+                    "type": action.type,
+                    "point_value": action.point_value,
+                    "point_range_end": point_range_ends.get(action.id),
+                    "event_date": event_dates.get(action.id),
+                    "unlock_condition": action.unlock_condition,
+                    "unlock_condition_text": action.unlock_condition_text,
+                    })
+
+            skeleton.append({"id": level.id,
+                             "name": level.name,
+                             "priority": level.priority,
+                             "unlock_condition": level.unlock_condition,
+                             "unlock_condition_text": level.unlock_condition_text,
+                             "categories": categories,
+                             })
+
+        cache_mgr.set_cache('smartgrid-skeleton', skeleton, 1800, namespace="smartgrid")
+    return skeleton
+
+
+def get_unlock_overlay(user):
+    """Returns the unlock state of the smart grid for the user. It is a dict of:
+      levels: the set of the ids of the unlocked levels.
+      actions: the set of the ids of the unlocked actions in the unlocked levels.
+    The completion state of the actions comes from get_completed_actions."""
+    overlay = cache_mgr.get_cache('smartgrid-overlay-%s' % user.username, namespace="smartgrid")
+    if overlay is None:
+        overlay = {"levels": set(), "actions": set()}
+        _evaluate_unlock_overlay(user, overlay)
+
+        # Cache the overlay for 30 minutes (or until they are invalidated)
+        cache_mgr.set_cache('smartgrid-overlay-%s' % user.username, overlay, 1800,
+                            namespace="smartgrid")
+    return overlay
+
+
+def update_unlock_overlay(user, changes):
+    """Re-evaluates only the unlock conditions of the user depending on the changed state keys,
+    and patches the cached unlock overlay. It is a no-op if the overlay is not cached."""
+    overlay = cache_mgr.get_cache('smartgrid-overlay-%s' % user.username, namespace="smartgrid")
+    if overlay is not None:
+        _evaluate_unlock_overlay(user, overlay, changes)
+        cache_mgr.set_cache('smartgrid-overlay-%s' % user.username, overlay, 1800,
+                            namespace="smartgrid")
+
+
+def _evaluate_unlock_overlay(user, overlay, changes=None):
+    """Evaluates the unlock conditions of the levels and actions into the overlay. If changes
+    is given, only the conditions depending on the changed state keys, the actions of the
+    changed slugs and the actions in the newly unlocked levels are evaluated."""
+    completed_actions = get_completed_actions(user)
+    for level in get_grid_skeleton():
+        was_unlock = level["id"] in overlay["levels"]
+        if changes is None or utils.predicates_affected(level["unlock_condition"], changes):
+            is_level_unlock = utils.eval_predicates(level["unlock_condition"], user)
+        else:
+            is_level_unlock = was_unlock
+
+        if not is_level_unlock:
+            overlay["levels"].discard(level["id"])
+            for category in level["categories"]:
+                for action in category["actions"]:
+                    overlay["actions"].discard(action["id"])
+            continue
+
+        overlay["levels"].add(level["id"])
+        for category in level["categories"]:
+            for action in category["actions"]:
+                if action["slug"] in completed_actions:
+                    overlay["actions"].add(action["id"])
+                elif changes is None or not was_unlock or \
+                     ("action", action["slug"]) in changes or \
+                     utils.predicates_affected(action["unlock_condition"], changes):
+                    if _eval_unlock_condition(user, action["unlock_condition"]):
+                        overlay["actions"].add(action["id"])
+                    else:
+                        overlay["actions"].discard(action["id"])
+
+
+def get_member_changes(member):
+    """Returns the set of the user state keys changed by saving or deleting the action member,
+    see utils.get_predicate_dependencies."""
+    action = member.action
+    level = action.level
+    changes = set(action_state_keys(action.type,
+                                    action.category.slug if action.category else None,
+                                    action.related_resource,
+                                    level.name if level else None,
+                                    level.priority if level else None))
+    changes.add(("action", action.slug))
+    changes.add(utils.PLAYER_STATE_KEY)
+    if member.social_bonus_awarded:
+        changes.add(("social_bonus", None))
+    return changes
 
-                if category:
-                    # last category
-                    category.task_list = action_list
-                    categories.append(category)
 
-                level.cat_list = categories
-            levels.append(level)
+def get_level_actions(user):
+    """Return the level list with the action info in categories, rendered from the shared grid
+    skeleton and the unlock overlay and completed actions of the user."""
+    completed_actions = get_completed_actions(user)
+    overlay = get_unlock_overlay(user)
+    now = datetime.datetime.today()
+
+    levels = []
+    for level_skeleton in get_grid_skeleton():
+        level = dict(level_skeleton)
+        level["is_unlock"] = level["id"] in overlay["levels"]
+        if level["is_unlock"]:
+            level["is_complete"] = True
+            level["cat_list"] = []
+            for category_skeleton in level_skeleton["categories"]:
+                task_list = []
+                for action_skeleton in category_skeleton["actions"]:
+                    action = dict(action_skeleton)
+                    action["member"] = completed_actions.get(action["slug"])
+                    action["completed"] = action["member"] is not None
+                    action["is_unlock"] = action["id"] in overlay["actions"]
+                    action["is_event_completed"] = action["event_date"] is not None and \
+                                                   action["event_date"] <= now
 
-        # Cache the categories for 30 minutes (or until they are invalidated)
-        cache_mgr.set_cache('smartgrid-levels-%s' % user, levels, 1800)
+                    # if there is one action is not completed, set the level to in-completed
+                    if not action["completed"]:
+                        level["is_complete"] = False
+                    task_list.append(action)
+                level["cat_list"].append({"name": category_skeleton["name"],
+                                          "task_list": task_list})
+        levels.append(level)
 
     return levels
 
@@ -199,7 +367,7 @@ def get_current_commitment_members(user):
 def get_available_golow_actions(user, related_resource):
     """Retrieves only the golow activities that a user can participate in."""
 
-    golow_actions = cache_mgr.get_cache('golow_actions-%s' % user.username)
+    golow_actions = cache_mgr.get_cache('golow_actions-%s' % user.username, namespace="smartgrid")
     if golow_actions is None:
         actions = Action.objects.exclude(
             actionmember__user=user,
@@ -222,7 +390,8 @@ def get_available_golow_actions(user, related_resource):
 
                 if len(golow_actions) == NUM_GOLOW_ACTIONS:
                     break
-        cache_mgr.set_cache('golow_actions-%s' % user.username, golow_actions, 1800)
+        cache_mgr.set_cache('golow_actions-%s' % user.username, golow_actions, 1800,
+                            namespace="smartgrid")
 
     return golow_actions
 
@@ -239,24 +408,20 @@ def afterPublished(user, action_slug):
 
 def is_unlock(user, action):
     """Returns the unlock status of the user action."""
-    levels = cache_mgr.get_cache('smartgrid-levels-%s' % user.username)
-    if levels is None:
+    overlay = cache_mgr.get_cache('smartgrid-overlay-%s' % user.username, namespace="smartgrid")
+    if overlay is None:
         return eval_unlock(user, action)
 
-    for level in levels:
-        if hasattr(level, "cat_list"):
-            for cat in level.cat_list:
-                if cat.id == action.category_id:
-                    for t in cat.task_list:
-                        if t.id == action.id:
-                            return t.is_unlock
-
-    return False
+    return action.id in overlay["actions"]
 
 
 def eval_unlock(user, action):
     """Determine the unlock status of a task by dependency expression"""
-    predicates = action.unlock_condition
+    return _eval_unlock_condition(user, action.unlock_condition)
+
+
+def _eval_unlock_condition(user, predicates):
+    """Evaluates the unlock condition of an action."""
     if not predicates:
         return False
 
@@ -287,7 +452,7 @@ def can_complete_commitment(user, commitment):
 def get_available_events(user):
     """Retrieves only the events that a user can participate in."""
 
-    events = cache_mgr.get_cache('user_events-%s' % user.username)
+    events = cache_mgr.get_cache('user_events-%s' % user.username, namespace="smartgrid")
     if events is None:
         events = Event.objects.filter(
             Q(expire_date__isnull=True) | Q(expire_date__gte=datetime.date.today()),
@@ -302,7 +467,7 @@ def get_available_events(user):
 
         events = unlock_events
         # Cache the user_event
-        cache_mgr.set_cache('user_events-%s' % user.username, events, 1800)
+        cache_mgr.set_cache('user_events-%s' % user.username, events, 1800, namespace="smartgrid")
 
     return events
 
@@ -370,9 +535,8 @@ def notify_round_started():
         template = NoticeTemplate.objects.get(notice_type="round-transition")
         message = template.render({"PREVIOUS_ROUND": previous_round,
                                    "CURRENT_ROUND": current_round, })
-        for user in User.objects.all():
-            UserNotification.create_info_notification(user, message,
-                                                      display_alert=True, )
+        UserNotification.create_broadcast_notification(User.objects.all(), message,
+                                                       display_alert=True)
 
 
 def notify_commitment_end():
@@ -528,9 +692,9 @@ def check_new_submissions():
 
                 if challenge.email_enabled and challenge.contact_email:
                     print "Sending new submission notification to %s" % challenge.contact_email
-                    mail = EmailMultiAlternatives(subject, message, challenge.contact_email,
-                        [challenge.contact_email, ])
-                    mail.send()
+                    UserNotification.create_email_notification(
+                        challenge.contact_email, subject, message,
+                        from_email=challenge.contact_email)
         except ObjectDoesNotExist:
             pass
 
@@ -554,6 +718,5 @@ def check_daily_submissions():
 
         if challenge.email_enabled and challenge.contact_email:
             print "Sending new submission notification to %s" % challenge.contact_email
-            mail = EmailMultiAlternatives(subject, message, challenge.contact_email,
-                [challenge.contact_email, ])
-            mail.send()
+            UserNotification.create_email_notification(challenge.contact_email, subject, message,
+                                                       from_email=challenge.contact_email)
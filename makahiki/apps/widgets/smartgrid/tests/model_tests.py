@@ -8,7 +8,7 @@ from apps.managers.score_mgr import score_mgr
 from apps.utils import test_utils
 
 from apps.widgets.smartgrid.models import  EmailReminder, TextReminder, \
-                                           ActionMember, Commitment
+                                           ActionMember, Commitment, Level, Category, Activity
 from apps.widgets.notifications.models import UserNotification
 from apps.widgets.smartgrid import smartgrid
 
@@ -55,6 +55,118 @@ class ActivitiesTest(TransactionTestCase):
         if self.event.id != events[0].id:
             self.fail("Event is not listed in the events list.")
 
+    def testActionState(self):
+        """Test that the action state snapshot follows the action members of the user."""
+        state = smartgrid.get_action_state(self.user)
+        self.assertEqual(state["completed"].get(("all", None), 0), 0)
+        self.assertEqual(smartgrid.get_action_totals()[("type", "activity")], 1)
+
+        member = ActionMember(user=self.user, action=self.activity)
+        member.save()
+        state = smartgrid.get_action_state(self.user)
+        self.assertEqual(state["completed"][("type", "activity")], 1)
+        self.assertFalse(self.activity.slug in state["approved_slugs"])
+
+        member.approval_status = "approved"
+        member.save()
+        state = smartgrid.get_action_state(self.user)
+        self.assertEqual(state["approved"][("all", None)], 1)
+        self.assertTrue(self.activity.slug in state["approved_slugs"])
+
+        member.delete()
+        state = smartgrid.get_action_state(self.user)
+        self.assertFalse(self.activity.slug in state["approved_slugs"])
+        self.assertEqual(state["completed"].get(("all", None), 0), 0)
+
+    def testLevelActions(self):
+        """Test that the grid is rendered from the shared skeleton and the user overlay."""
+        level = Level(name="Level 1", priority=1, unlock_condition="True")
+        level.save()
+        category = Category(name="Category 1", slug="category-1")
+        category.save()
+        self.activity.level = level
+        self.activity.category = category
+        self.activity.unlock_condition = "True"
+        self.activity.save()
+
+        levels = smartgrid.get_level_actions(self.user)
+        self.assertTrue(levels[0]["is_unlock"], "The level should be unlocked.")
+        task = levels[0]["cat_list"][0]["task_list"][0]
+        self.assertEqual(task["slug"], self.activity.slug)
+        self.assertTrue(task["is_unlock"], "The activity should be unlocked.")
+        self.assertFalse(task["completed"], "The activity should not be completed.")
+        self.assertTrue(smartgrid.is_unlock(self.user, self.activity))
+
+        member = ActionMember(user=self.user, action=self.activity, approval_status="approved")
+        member.save()
+        levels = smartgrid.get_level_actions(self.user)
+        task = levels[0]["cat_list"][0]["task_list"][0]
+        self.assertTrue(task["completed"], "The activity should be completed.")
+        self.assertEqual(task["member"]["approval_status"], "approved")
+        self.assertTrue(levels[0]["is_complete"], "The level should be completed.")
+
+        other = User.objects.create_user('other', 'other@test.com')
+        levels = smartgrid.get_level_actions(other)
+        task = levels[0]["cat_list"][0]["task_list"][0]
+        self.assertFalse(task["completed"], "The activity should not be completed for others.")
+
+    def testPatchedUnlockOverlay(self):
+        """Test that the unlock overlay patched with the state changes of the action members
+        equals the overlay evaluated from scratch."""
+        level1 = Level(name="Level 1", priority=1, unlock_condition="True")
+        level1.save()
+        level2 = Level(name="Level 2", priority=2,
+                       unlock_condition="completed_action('%s')" % self.activity.slug)
+        level2.save()
+        self.activity.level = level1
+        self.activity.unlock_condition = "True"
+        self.activity.save()
+        self.event.level = level1
+        self.event.unlock_condition = "completed_action('%s')" % self.activity.slug
+        self.event.save()
+        activity2 = Activity.objects.create(
+            title="Test activity 2", description="Testing!", slug="test-activity-2",
+            duration=10, point_value=10, pub_date=datetime.datetime.today(),
+            expire_date=datetime.datetime.today() + datetime.timedelta(days=7),
+            confirm_type="text", type="activity", level=level2, unlock_condition="True")
+        activity3 = Activity.objects.create(
+            title="Test activity 3", description="Testing!", slug="test-activity-3",
+            duration=10, point_value=10, pub_date=datetime.datetime.today(),
+            expire_date=datetime.datetime.today() + datetime.timedelta(days=7),
+            confirm_type="text", type="activity", level=level1,
+            unlock_condition="unlock_on_date('01/01/12')")
+
+        def check_patched(overlay, changes, message):
+            """patch the overlay and compare it to the overlay evaluated from scratch."""
+            smartgrid._evaluate_unlock_overlay(self.user, overlay, changes)
+            expected = {"levels": set(), "actions": set()}
+            smartgrid._evaluate_unlock_overlay(self.user, expected)
+            self.assertEqual(overlay, expected, message)
+
+        overlay = {"levels": set(), "actions": set()}
+        smartgrid._evaluate_unlock_overlay(self.user, overlay)
+        self.assertEqual(overlay["levels"], set([level1.id]), "Only level 1 should be unlocked.")
+
+        member = ActionMember(user=self.user, action=self.activity, approval_status="approved")
+        member.save()
+        check_patched(overlay, member.get_state_changes(),
+                      "The overlay should be patched when the activity is completed.")
+        self.assertTrue(level2.id in overlay["levels"], "Level 2 should be unlocked.")
+        self.assertTrue(activity2.id in overlay["actions"],
+                        "The action of the newly unlocked level should be unlocked.")
+        self.assertTrue(self.event.id in overlay["actions"], "The event should be unlocked.")
+
+        changes = member.get_state_changes()
+        member.delete()
+        check_patched(overlay, changes,
+                      "The overlay should be patched when the activity is uncompleted.")
+        self.assertEqual(overlay["levels"], set([level1.id]), "Level 2 should be locked again.")
+
+        # an overlay evaluated before the unlock date of the time based action.
+        overlay["actions"].discard(activity3.id)
+        check_patched(overlay, set([("action", "unrelated")]),
+                      "The time based conditions should be re-evaluated on any patch.")
+
     def testApproveAddsPoints(self):
         """Test for verifying that approving a user awards them points."""
         points = self.user.get_profile().points()
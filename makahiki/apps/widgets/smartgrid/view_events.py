@@ -13,6 +13,7 @@ from django.views.decorators.cache import never_cache
 from django.contrib import messages
 from apps.managers.player_mgr import player_mgr
 from apps.managers.score_mgr import score_mgr
+from apps.utils import utils
 
 from apps.widgets.smartgrid.models import  ActionMember, \
     Action, Event, ConfirmationCode
@@ -140,15 +141,13 @@ def view_codes(request, action_type, slug):
         per_page = int(request.GET['rows'])
 
     event = get_object_or_404(Event, slug=slug)
-    codes = ConfirmationCode.objects.filter(action=event)
-    if len(codes) == 0:
+    codes = ConfirmationCode.objects.filter(action=event).order_by('pk')
+    if not codes.exists():
         raise Http404
 
-    return render_to_response("view_codes.html", {
+    return utils.render_code_pages(request, "view_codes.html", codes, per_page, {
         "activity": event,
-        "codes": codes,
-        "per_page": per_page,
-        }, context_instance=RequestContext(request))
+        })
 
 
 @never_cache
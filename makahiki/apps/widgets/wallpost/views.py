@@ -4,6 +4,7 @@ from django.contrib.auth.decorators import login_required
 from django.http import Http404, HttpResponse
 from django.template.context import RequestContext
 from django.template.loader import render_to_string
+from apps.managers.team_mgr import team_mgr
 from apps.managers.team_mgr.models import Post, CanopyPost
 from apps.widgets.wallpost.forms import WallForm
 import simplejson as json
@@ -27,39 +28,28 @@ def super_supply(request, page_name, agent):
     user = request.user
     team = user.get_profile().team
 
+    last_post = int(request.GET["last_post"]) if "last_post" in request.GET else None
+
+    # fetch one more post than displayed to find out if there are more posts.
     if page_name == "advanced":
-        if "last_post" in request.GET:
-            posts = CanopyPost.objects.filter(
-                style_class=agent_post,
-                id__lt=int(request.GET["last_post"])).select_related(
-                'user__profile').order_by("-id")
-        else:
-            posts = CanopyPost.objects.filter(
-              style_class=agent_post
-              ).select_related('user__profile').order_by("-id")
+        posts = CanopyPost.objects.filter(
+            style_class=agent_post).select_related('user__profile').order_by("-id")
+        if last_post is not None:
+            posts = posts.filter(id__lt=last_post)
+        posts = list(posts[:DEFAULT_POST_COUNT + 1])
 
         title = "Canopy News Feed"
         description = "Share with your fellow canopy members:"
 
     else:
-        if "last_post" in request.GET:
-            posts = Post.objects.filter(
-                        style_class=agent_post,
-                        team=team,
-                        id__lt=int(request.GET["last_post"])).select_related(
-                            'user__profile').order_by("-id")
-        else:
-            posts = Post.objects.filter(
-                style_class=agent_post,
-                team=team
-            ).select_related('user__profile').order_by("-id")
+        posts = team_mgr.get_team_posts(team, agent_post, DEFAULT_POST_COUNT + 1,
+                                        last_post=last_post)
 
         title = "Team News Feed"
         description = ""
 
-    post_count = posts.count()
+    is_more_posts = len(posts) > DEFAULT_POST_COUNT
     posts = posts[:DEFAULT_POST_COUNT]
-    is_more_posts = True if post_count > DEFAULT_POST_COUNT else False
 
     wall_form = WallForm(initial={"page_name": page_name})
 
@@ -0,0 +1,13 @@
+"""The gunicorn configuration of Makahiki, used with: manage.py run_gunicorn -c gunicorn_conf.py"""
+
+
+def post_fork(server, worker):
+    """Precompiles the templates in the worker, before it serves its first request."""
+    _ = server
+    _ = worker
+    from django.db import connection
+    from apps.managers.challenge_mgr import challenge_mgr
+
+    challenge_mgr.warm_template_cache()
+    # the worker opens its own connection for its first request.
+    connection.close()
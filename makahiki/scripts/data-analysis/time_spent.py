@@ -26,9 +26,9 @@ setup_environ(settings_mod)
 sys.path.insert(0, join(settings.PROJECT_ROOT, "apps"))
 
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import connection
 
-from components.analytics.models import MakahikiLog
+from apps.managers.log_mgr.models import MakahikiLog
 
 MIN_SESSION = 60  # Assume user spends 60 seconds on a single page.
 
@@ -53,357 +53,277 @@ SESSION_HEADER = 'user id,a_21_visits_0-5,a_22_visits_5-10,' \
                  'a_25_visits_30-60,a_26_visits_60+\n'
 
 
-def calculate_days_spent():
-    users_file = open('days_spent.csv', 'w')
-    users = User.objects.filter(profile__points__gt=0,
-                                profile__team__isnull=False).order_by(
-        '-profile__points', 'id')
-    counter = 1
-    user_count = users.count()
-    users_file.write(DAYS_HEADER)
-    start_date = datetime.datetime(2011, 10, 17)
-    end_date = datetime.datetime(2011, 11, 7)
-
-    for user in users:
-        logs = MakahikiLog.objects.filter(remote_user=user.username,
-                                          request_time__lt=end_date,
-                                          request_time__gt=start_date)\
-        .order_by(
-            'request_time')
-        sys.stdout.write('Processing %d logs for %s (%d/%d)\n' % (
-        logs.count(), user.username, counter, user_count))
-        days = _days_spent(logs)
-        home = _days_spent(logs, path='/home')
-        activities = _days_spent(logs, path='/activities')
-        energy = _days_spent(logs, path='/energy')
-        prizes = _days_spent(logs, path='/prizes')
-        news = _days_spent(logs, path='/news')
-        profile = _days_spent(logs, path='/profile')
-        help = _days_spent(logs, path='/help')
-        canopy = _days_spent(logs, path='/canopy')
-
-        contents = '%d,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % (
-        user.id, days, home, activities, energy, prizes, news, profile, help,
-        canopy)
-        sys.stdout.write('contents ' + contents)
-        users_file.write(contents)
-        counter += 1
-
-    users_file.close()
-
-
-def calculate_sessions():
-    users_file = open('sessions.csv', 'w')
-    users = User.objects.filter(profile__points__gt=0,
-                                profile__team__isnull=False).order_by(
-        '-profile__points', 'id')
-    counter = 1
-    user_count = users.count()
-    users_file.write(SESSION_HEADER)
-    start_date = datetime.datetime(2011, 10, 17)
-    end_date = datetime.datetime(2011, 11, 7)
-
-    for user in users:
-        logs = MakahikiLog.objects.filter(
-            remote_user=user.username,
-            request_time__lt=end_date,
-            request_time__gt=start_date
-        ).order_by('request_time')
-
-        sys.stdout.write('Processing %d logs for %s (%d/%d)\n' % (
-        logs.count(), user.username, counter, user_count))
-        sessions = _sessions(logs)
-
-        contents = '%d,%d,%d,%d,%d,%d,%d\n' % (
-            user.id,
-            sessions.get('0-5', 0),
-            sessions.get('5-10', 0),
-            sessions.get('10-15', 0),
-            sessions.get('15-30', 0),
-            sessions.get('30-60', 0),
-            sessions.get('60+', 0)
-            )
-        sys.stdout.write('contents ' + contents)
-        users_file.write(contents)
-        counter += 1
-
-    users_file.close()
-
-
-def calculate_user_time():
-    users_file = open('time_spent_users.csv', 'w')
-    lounge_file = open('time_spent_lounge.csv', 'w')
-    users = User.objects.filter(profile__points__gt=0,
-                                profile__team__isnull=False).order_by(
-        '-profile__points', 'id')
-    lounges = {}
-    counter = 1
-    user_count = users.count()
-    users_file.write(USER_HEADER)
-    lounge_file.write(LOUNGE_HEADER)
-
-    for user in users:
-        logs = MakahikiLog.objects.filter(remote_user=user.username).order_by(
-            'request_time')
-        sys.stdout.write('Processing %d logs for %s (%d/%d)\n' % (
-        logs.count(), user.username, counter, user_count))
-        total = _time_spent(logs)
-        home_time = _page_time('/home', logs)
-        activity_time = _page_time('/activities', logs)
-        energy_time = _page_time('/energy', logs)
-        prize_time = _page_time('/prizes', logs)
-        news_time = _page_time('/news', logs)
-        profile_time = _page_time('/profile', logs)
-        help_time = _page_time('/help', logs)
-        canopy_time = _page_time('/canopy', logs)
-
-        users_file.write('%d,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % (
-        user.id, total, home_time, activity_time, energy_time,
-        prize_time, news_time, profile_time, help_time, canopy_time))
-        lounge = str(user.get_profile().team)
-        lounges[lounge] = lounges.get(lounge, {})
-        lounges[lounge]['total'] = lounges[lounge].get('total', 0) + total
-        lounges[lounge]['home'] = lounges[lounge].get('home', 0) + home_time
-        lounges[lounge]['activities'] = lounges[lounge].get('activities',
-                                                            0) + activity_time
-        lounges[lounge]['energy'] = lounges[lounge].get('energy',
-                                                        0) + energy_time
-        lounges[lounge]['prizes'] = lounges[lounge].get('prizes',
-                                                        0) + prize_time
-        lounges[lounge]['news'] = lounges[lounge].get('news', 0) + news_time
-        lounges[lounge]['profile'] = lounges[lounge].get('profile',
-                                                         0) + profile_time
-        lounges[lounge]['help'] = lounges[lounge].get('help', 0) + help_time
-        lounges[lounge]['canopy'] = lounges[lounge].get('canopy',
-                                                        0) + canopy_time
-        counter += 1
-
-    for lounge, items in lounges.iteritems():
-        lounge_file.write('%s,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % (
-        lounge, items['total'], items['home'], items['activities'],
-        items['energy'], items['prizes'], items['news'], items['profile'],
-        items['help'], items['canopy']))
-
-    lounge_file.close()
-    users_file.close()
-
-
-def _time_spent(logs, start_date=None):
-    # Iterate over the logs and track previous time and time spent.
-    query = logs
-    if start_date:
-        query = query.filter(request_time__gt=start_date)
-
-    if query.count() > 0:
-        prev = datetime.datetime.strptime(query[0].request_time,
-                                          "%Y-%m-%d %H:%M:%S")
-        cur_session = total = 0
-        for log in query[1:]:
-            current = datetime.datetime.strptime(log.request_time,
-                                                 "%Y-%m-%d %H:%M:%S")
-            diff = current - prev
+SESSION_GAP = 60 * 30  # A gap of more than 30 minutes starts a new session.
+
+PAGES = ('/home', '/activities', '/energy', '/prizes', '/news', '/profile',
+         '/help', '/canopy')
+"""Url prefixes of the pages reported on, in CSV column order."""
+
+AJAX_PREFIXES = ('/log', '/slog', '/notifications', '/quests')
+"""AJAX interactions are excluded from the page time."""
+
+ADMIN_PREFIX = '/admin/activities/activitymember'
+
+# Days visited and sessions are only reported within this window.
+WINDOW_START = datetime.datetime(2011, 10, 17)
+WINDOW_END = datetime.datetime(2011, 11, 7)
+
+ITERATOR_SIZE = 10000
+"""Rows fetched per round trip from the server-side cursor."""
+
+
+def _session_bucket(seconds):
+    """Returns the session length bucket of the given session."""
+    minutes = seconds / 60
+    if minutes > 60:
+        return '60+'
+    elif minutes > 30:
+        return '30-60'
+    elif minutes > 15:
+        return '15-30'
+    elif minutes > 10:
+        return '10-15'
+    elif minutes > 5:
+        return '5-10'
+    return '0-5'
+
+
+class SessionTimer(object):
+    """Accumulates the session time of a stream of request times."""
+
+    def __init__(self):
+        self.prev = None
+        self.cur_session = 0
+        self.total = 0
+        self.sessions = {}
+
+    def add(self, current):
+        """Adds the request at time current."""
+        if self.prev is not None:
+            diff = (current - self.prev).total_seconds()
             # Start a new interval if 30 minutes have passed.
-            if diff.total_seconds() > (60 * 30):
-                if cur_session == 0:
-                    total += MIN_SESSION
-                else:
-                    total += cur_session
-                cur_session = 0
+            if diff > SESSION_GAP:
+                self._close(self.cur_session or MIN_SESSION)
+                self.total += self.cur_session or MIN_SESSION
+                self.cur_session = 0
             else:
-                cur_session += diff.total_seconds()
-
-            prev = current
-
-        # Append any session that was in progress.
-        total += cur_session
-        return total
-
-    return 0
-
-
-def _days_spent(logs, path=None, start_date=None):
-    query = logs
-    if start_date:
-        query = query.filter(request_time__gt=start_date)
-    if path:
-        query = query.filter(url__startswith=path)
-
-    # Iterate over the logs and track current date and days.
-    days = 0
-    cur_date = None
-    for log in query:
-        # Only concerned with the date portion of the timestamp.
-        date = datetime.datetime.strptime(log.request_time,
-                                          "%Y-%m-%d %H:%M:%S").date()
-        if not cur_date:
-            cur_date = date
-            days += 1
-        elif cur_date < date:
-            cur_date = date
-            days += 1
-
-    return days
-
-
-def _sessions(logs, start_date=None):
-    return_dict = {}
-
-    # Iterate over the logs and track previous time and time spent.
-    query = logs
-    if start_date:
-        query = query.filter(request_time__gt=start_date)
-
-    if query.count() > 0:
-        prev = datetime.datetime.strptime(query[0].request_time,
-                                          "%Y-%m-%d %H:%M:%S")
-        cur_session = total = 0
-        for log in query[1:]:
-            current = datetime.datetime.strptime(log.request_time,
-                                                 "%Y-%m-%d %H:%M:%S")
-            diff = current - prev
-            # Start a new interval if 30 minutes have passed.
-            if diff.total_seconds() > (60 * 30):
-                if cur_session == 0:
-                    minutes = MIN_SESSION / 60
-                else:
-                    minutes = cur_session / 60
-
-                if minutes > 60:
-                    return_dict['60+'] = return_dict.get('60+', 0) + 1
-                elif minutes > 30:
-                    return_dict['30-60'] = return_dict.get('30-60', 0) + 1
-                elif minutes > 15:
-                    return_dict['15-30'] = return_dict.get('15-30', 0) + 1
-                elif minutes > 10:
-                    return_dict['10-15'] = return_dict.get('10-15', 0) + 1
-                elif minutes > 5:
-                    return_dict['5-10'] = return_dict.get('5-10', 0) + 1
-                else:
-                    return_dict['0-5'] = return_dict.get('0-5', 0) + 1
+                self.cur_session += diff
+        self.prev = current
 
-                cur_session = 0
-            else:
-                cur_session += diff.total_seconds()
-
-            prev = current
-
-        # Append any session that was in progress.
-        if cur_session == 0:
-            minutes = MIN_SESSION / 60
-        else:
-            minutes = cur_session / 60
-
-        if minutes > 60:
-            return_dict['60+'] = return_dict.get('60+', 0) + 1
-        elif minutes > 30:
-            return_dict['30-60'] = return_dict.get('30-60', 0) + 1
-        elif minutes > 15:
-            return_dict['15-30'] = return_dict.get('15-30', 0) + 1
-        elif minutes > 10:
-            return_dict['10-15'] = return_dict.get('10-15', 0) + 1
-        elif minutes > 5:
-            return_dict['5-10'] = return_dict.get('5-10', 0) + 1
-        else:
-            return_dict['0-5'] = return_dict.get('0-5', 0) + 1
-
-    return return_dict
-
-
-def _page_time(url_prefix, logs, start_date=None):
-    start = prev = None
-    total = cur_session = 0
-    # Need to filter out AJAX interactions.
-    query = logs.exclude(
-        Q(url__startswith='/log') | Q(url__startswith='/slog') | Q(
-            url__startswith='/notifications') | Q(url__startswith='/quests'))
-    if start_date:
-        query = logs.filter(request_time__gt=start_date)
-    for log in query:
-        current = datetime.datetime.strptime(log.request_time,
-                                             "%Y-%m-%d %H:%M:%S")
+    def _close(self, session):
+        """Counts the session in its length bucket."""
+        bucket = _session_bucket(session)
+        self.sessions[bucket] = self.sessions.get(bucket, 0) + 1
+
+    def finish(self):
+        """Appends any session that was in progress."""
+        if self.prev is not None:
+            self.total += self.cur_session
+            self._close(self.cur_session or MIN_SESSION)
+
+
+class DayCounter(object):
+    """Counts the distinct days in a stream of ordered request times."""
+
+    def __init__(self):
+        self.cur_date = None
+        self.days = 0
+
+    def add(self, current):
+        """Adds the request at time current."""
+        date = current.date()
+        if self.cur_date is None or self.cur_date < date:
+            self.cur_date = date
+            self.days += 1
+
+
+class PageTimer(object):
+    """Accumulates the time spent on the pages under a url prefix."""
+
+    def __init__(self, url_prefix):
+        self.url_prefix = url_prefix
+        self.start = self.prev = None
+        self.total = self.cur_session = 0
+
+    def add(self, current, url):
+        """Adds the request for url at time current."""
+        on_page = url.startswith(self.url_prefix)
         # Check if we are starting a session
-        if log.url.startswith(url_prefix) and not start:
-            start = current
-            cur_session = 0
+        if on_page and not self.start:
+            self.start = current
+            self.cur_session = 0
 
         # Check if we are within a session.
-        elif start and prev:
-            diff = current - prev
-            if log.url.startswith(url_prefix) and diff.total_seconds() < (
-            60 * 30):
+        elif self.start and self.prev:
+            diff = (current - self.prev).total_seconds()
+            if on_page and diff < SESSION_GAP:
                 # Append to current session.
-                cur_session += diff.total_seconds()
-            elif diff.total_seconds() >= (60 * 30):
+                self.cur_session += diff
+            elif diff >= SESSION_GAP:
                 # Break in session.  Close the previous and start a new one.
-                if cur_session == 0:
-                    # Assume user spent a minute.
-                    cur_session = MIN_SESSION
-
-                total += cur_session
-                cur_session = 0
-                if log.url.startswith(url_prefix):
-                    start = current
-                else:
-                    start = None
+                self.total += self.cur_session or MIN_SESSION
+                self.cur_session = 0
+                self.start = current if on_page else None
             else:
                 # Person navigated away.  Close the session.
-                cur_session += diff.total_seconds()
-                if cur_session == 0:
-                    # Assume user spent a minute.
-                    cur_session = MIN_SESSION
-
-                total += cur_session
-                cur_session = 0
-                start = None
-
-        prev = current
-
-    return total
-
-
-def calculate_admin_time():
-    admin_file = open('time_spent_admin.csv', 'w')
-    users = User.objects.filter(is_staff=True)
-    for user in users:
-        logs = MakahikiLog.objects.\
-        filter(remote_user=user.username,
-               url__startswith='/admin/activities/activitymember').\
-        order_by('request_time')
-        answers = logs.filter(request='POST').count()
-        sys.stdout.write(
-            'Processing %d logs for %s\n' % (logs.count(), user.username))
-        if logs.count() > 0:
-            # Iterate over the logs and track previous time and time spent.
-            prev = datetime.datetime.strptime(logs[0].request_time,
-                                              "%Y-%m-%d %H:%M:%S")
-            cur_session = total = 0
-            for log in logs[1:]:
-                current = datetime.datetime.strptime(log.request_time,
-                                                     "%Y-%m-%d %H:%M:%S")
-                diff = current - prev
-                # Start a new interval if 30 minutes have passed.
-                if diff.total_seconds() > (60 * 30):
-                    if cur_session == 0:
-                        total += 60  # Assume they spent a minute viewing a
-                        # single page.
-                    else:
-                        total += cur_session
-                    cur_session = 0
+                self.cur_session += diff
+                self.total += self.cur_session or MIN_SESSION
+                self.cur_session = 0
+                self.start = None
+
+        self.prev = current
+
+
+class UserStats(object):
+    """All the per-user accumulators, fed one log entry at a time."""
+
+    def __init__(self):
+        self.time = SessionTimer()
+        self.pages = [PageTimer(prefix) for prefix in PAGES]
+        self.window_sessions = SessionTimer()
+        self.days = DayCounter()
+        self.page_days = [DayCounter() for _ in PAGES]
+        self.admin = SessionTimer()
+        self.admin_logs = 0
+        self.answers = 0
+
+    def add(self, current, url, method):
+        """Adds a single log entry."""
+        self.time.add(current)
+
+        if not url.startswith(AJAX_PREFIXES):
+            for timer in self.pages:
+                timer.add(current, url)
+
+        if WINDOW_START < current < WINDOW_END:
+            self.window_sessions.add(current)
+            self.days.add(current)
+            for prefix, counter in zip(PAGES, self.page_days):
+                if url.startswith(prefix):
+                    counter.add(current)
+
+        if url.startswith(ADMIN_PREFIX):
+            self.admin.add(current)
+            self.admin_logs += 1
+            if method == 'POST':
+                self.answers += 1
+
+    def finish(self):
+        """Closes any session in progress."""
+        self.time.finish()
+        self.window_sessions.finish()
+        self.admin.finish()
+
+
+def _iterate_logs():
+    """Yields (remote_user, request_time, request_url, request_method) for all
+    the logs, ordered by user and time.
+
+    On PostgreSQL the rows are streamed through a named (server-side) cursor,
+    otherwise through the regular queryset iterator."""
+    if connection.vendor == 'postgresql':
+        # make sure the underlying connection is open.
+        connection.cursor()
+        cursor = connection.connection.cursor(name='time_spent')
+        cursor.itersize = ITERATOR_SIZE
+        cursor.execute(
+            'SELECT remote_user, request_time, request_url, request_method '
+            'FROM %s ORDER BY remote_user, request_time' %
+            MakahikiLog._meta.db_table)
+        for row in cursor:
+            yield row
+        cursor.close()
+    else:
+        logs = MakahikiLog.objects.order_by('remote_user', 'request_time')
+        for row in logs.values_list('remote_user', 'request_time',
+                                    'request_url', 'request_method').iterator():
+            yield row
+
+
+class TimeSpentReport(object):
+    """Writes the time spent CSV files from a single pass over the logs."""
+
+    def __init__(self):
+        self.players = dict((user.username, (user.id, str(user.get_profile().team)))
+            for user in User.objects.filter(
+                profile__scoreboardentry__points__gt=0,
+                profile__team__isnull=False).select_related(
+                    'profile__team').distinct())
+        self.staff = set(User.objects.filter(is_staff=True).values_list(
+            'username', flat=True))
+        self.lounges = {}
+        self.processed = 0
+
+        self.users_file = open('time_spent_users.csv', 'w')
+        self.lounge_file = open('time_spent_lounge.csv', 'w')
+        self.days_file = open('days_spent.csv', 'w')
+        self.sessions_file = open('sessions.csv', 'w')
+        self.admin_file = open('time_spent_admin.csv', 'w')
+        self.users_file.write(USER_HEADER)
+        self.lounge_file.write(LOUNGE_HEADER)
+        self.days_file.write(DAYS_HEADER)
+        self.sessions_file.write(SESSION_HEADER)
+
+    def run(self):
+        """Streams the logs, writing each user's rows as soon as the user
+        changes, then writes the lounge totals."""
+        username = stats = None
+        for remote_user, request_time, url, method in _iterate_logs():
+            if remote_user != username:
+                self._write_user(username, stats)
+                username = remote_user
+                if remote_user in self.players or remote_user in self.staff:
+                    stats = UserStats()
                 else:
-                    cur_session += diff.total_seconds()
-
-                prev = current
-
-            # Append any session that was in progress.
-            total += cur_session
-            admin_file.write('%s,%d,%d\n' % (user.username, total, answers))
-
-    admin_file.close()
+                    stats = None
+            if stats:
+                stats.add(request_time, url, method)
+        self._write_user(username, stats)
+
+        for lounge, items in self.lounges.iteritems():
+            self.lounge_file.write('%s,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % (
+                (lounge,) + tuple(items)))
+
+        for output in (self.users_file, self.lounge_file, self.days_file,
+                       self.sessions_file, self.admin_file):
+            output.close()
+
+    def _write_user(self, username, stats):
+        """Writes the rows of a user whose logs have all been read."""
+        if not stats:
+            return
+        stats.finish()
+        self.processed += 1
+        sys.stdout.write('Processed %s (%d)\n' % (username, self.processed))
+
+        if username in self.players:
+            user_id, lounge = self.players[username]
+            times = [stats.time.total] + [timer.total for timer in stats.pages]
+            self.users_file.write('%d,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % tuple(
+                [user_id] + times))
+
+            totals = self.lounges.setdefault(lounge, [0] * len(times))
+            for index, value in enumerate(times):
+                totals[index] += value
+
+            days = [stats.days.days] + [c.days for c in stats.page_days]
+            self.days_file.write('%d,%d,%d,%d,%d,%d,%d,%d,%d,%d\n' % tuple(
+                [user_id] + days))
+
+            sessions = stats.window_sessions.sessions
+            self.sessions_file.write('%d,%d,%d,%d,%d,%d,%d\n' % (
+                user_id,
+                sessions.get('0-5', 0),
+                sessions.get('5-10', 0),
+                sessions.get('10-15', 0),
+                sessions.get('15-30', 0),
+                sessions.get('30-60', 0),
+                sessions.get('60+', 0)))
+
+        if username in self.staff and stats.admin_logs > 0:
+            self.admin_file.write('%s,%d,%d\n' % (
+                username, stats.admin.total, stats.answers))
 
 
 if __name__ == "__main__":
-    calculate_user_time()
-    # calculate_admin_time()
-    # calculate_canopy_time()
-    # calculate_days_spent()
-    # calculate_sessions()
+    TimeSpentReport().run()
@@ -66,6 +66,7 @@ MIDDLEWARE_CLASSES = (
     'django.middleware.gzip.GZipMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
+    'apps.managers.cache_mgr.middleware.DeferredInvalidationMiddleware',
     'django.middleware.transaction.TransactionMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.middleware.doc.XViewMiddleware',
@@ -76,6 +77,7 @@ MIDDLEWARE_CLASSES = (
     #'debug_toolbar.middleware.DebugToolbarMiddleware',
 
     'apps.lib.django_cas.middleware.CASMiddleware',
+    'apps.utils.middleware.PredicateMemoMiddleware',
     'apps.managers.player_mgr.middleware.LoginMiddleware',
     'apps.managers.log_mgr.middleware.LoggingMiddleware',
 
@@ -285,6 +287,15 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': False,
             },
+        'makahiki_logger': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            },
+        'makahiki.supply': {
+            'handlers': ['null'] if "test" in sys.argv else ['console'],
+            'level': 'INFO',
+            'propagate': False,
+            },
     }
 }
 
@@ -387,6 +398,11 @@ if MAKAHIKI_EMAIL_INFO:
     EMAIL_HOST_USER = email_info[0]
     EMAIL_HOST_PASSWORD = email_info[1]
 
+MAKAHIKI_EMAIL_QUEUE = env('MAKAHIKI_EMAIL_QUEUE', 'true').lower() == "true" and \
+                       not "test" in sys.argv
+"""[Optional] if "true" (the default), the emails are queued in the outbox and sent in batches
+by the send_emails command. Always false when running the tests."""
+
 # DEBUG settings
 MAKAHIKI_DEBUG = env('MAKAHIKI_DEBUG', '').lower() == "true"
 """[Optional]  If "true", enable debug mode, with better error messages.
@@ -394,6 +410,34 @@ Otherwise use production mode."""
 DEBUG = MAKAHIKI_DEBUG
 TEMPLATE_DEBUG = MAKAHIKI_DEBUG
 
+MAKAHIKI_TEMPLATE_CACHE = env('MAKAHIKI_TEMPLATE_CACHE', 'true').lower() == "true" and \
+                          not MAKAHIKI_DEBUG
+"""[Optional] if "true" (the default), the compiled templates are kept in memory by the cached
+template loader, and the page and widget templates are precompiled when a worker starts, by
+the post_fork hook of gunicorn_conf.py or by the WSGI script. Always false in debug mode, so
+that template changes are picked up without a restart."""
+if MAKAHIKI_TEMPLATE_CACHE:
+    TEMPLATE_LOADERS = (
+        ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+        )
+
+MAKAHIKI_PARALLEL_SUPPLY = env('MAKAHIKI_PARALLEL_SUPPLY', '').lower() == "true" and \
+                           not "test" in sys.argv
+"""[Optional] if "true", the view objects of the widgets of a page which declare
+SUPPLY_CONCURRENT are supplied concurrently by a pool of threads, within the
+MAKAHIKI_SUPPLY_TIME_BUDGET. A widget which misses the time budget is replaced by a
+placeholder. The other widgets are supplied in the request thread. Always false when running
+the tests."""
+
+MAKAHIKI_SUPPLY_WORKERS = int(env('MAKAHIKI_SUPPLY_WORKERS', '4'))
+"""[Optional] The number of threads of the pool supplying the widgets concurrently, shared by
+the requests of a process. Default to 4. Each worker thread uses its own database
+connection."""
+
+MAKAHIKI_SUPPLY_TIME_BUDGET = float(env('MAKAHIKI_SUPPLY_TIME_BUDGET', '2'))
+"""[Optional] The seconds a page may spend supplying the view objects of its widgets when
+MAKAHIKI_PARALLEL_SUPPLY is true. Default to 2."""
+
 # CACHE settings
 MAKAHIKI_USE_MEMCACHED = env('MAKAHIKI_USE_MEMCACHED', '').lower() == "true"
 """[Optional] If "true", use memcache. Otherwise no caching is used."""
@@ -500,3 +544,8 @@ if MAKAHIKI_USE_LOGFILE:
         'filename': LOG_FILE,
         'formatter': 'simple',
         }
+
+MAKAHIKI_LOG_WRITE_BEHIND = env('MAKAHIKI_LOG_WRITE_BEHIND', 'true').lower() == "true" and \
+                            not "test" in sys.argv
+"""[Optional] if "true" (the default), the application logs are queued and written to the
+database in batches by a background thread. Always false when running the tests."""